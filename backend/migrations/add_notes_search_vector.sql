@@ -0,0 +1,35 @@
+-- 数据库迁移脚本：为 notes 添加全文检索生成列 search_vector 及其GIN索引
+-- 添加生成列会在 ACCESS EXCLUSIVE 锁下重写整个 notes 表（期间笔记读写全部阻塞），请在维护窗口执行；
+-- 笔记数不超过 TEXT_SEARCH_VECTOR_AUTO_ADD_MAX_ROWS 的数据库由应用启动时自动添加，无需执行本脚本
+-- 用 psql 执行（CREATE INDEX CONCURRENTLY 不能在事务中运行，不要加 -1/--single-transaction）
+
+-- 安装了 zhparser 时使用中文分词配置 chinese_zh（与应用的 TEXT_SEARCH_CONFIG=auto 一致），否则 simple
+DO $$
+DECLARE
+    cfg text := 'simple';
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'zhparser') THEN
+        CREATE EXTENSION IF NOT EXISTS zhparser;
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'chinese_zh') THEN
+            CREATE TEXT SEARCH CONFIGURATION chinese_zh (PARSER = zhparser);
+            ALTER TEXT SEARCH CONFIGURATION chinese_zh ADD MAPPING FOR n,v,a,i,e,l,j WITH simple;
+        END IF;
+        cfg := 'chinese_zh';
+    END IF;
+
+    EXECUTE format(
+        'ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ('
+        'setweight(to_tsvector(%L::regconfig, coalesce(title, %L)), %L) || '
+        'setweight(to_tsvector(%L::regconfig, coalesce(content, %L)), %L)) STORED',
+        cfg, '', 'A', cfg, '', 'B'
+    );
+END $$;
+
+-- 上次创建中断留下的无效索引需要先删除（应用启动时也会自动删除并重建），索引本身 CONCURRENTLY 创建，不阻塞读写
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_index WHERE indexrelid = to_regclass('idx_notes_search_vector') AND NOT indisvalid) THEN
+        RAISE NOTICE 'idx_notes_search_vector 无效，请先执行 DROP INDEX CONCURRENTLY idx_notes_search_vector';
+    END IF;
+END $$;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_notes_search_vector ON notes USING gin (search_vector);
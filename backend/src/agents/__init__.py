@@ -1,3 +1,4 @@
-from .supervisor import graph
+from .supervisor import build_graph
+from .runtime import agent_runtime
 
-__all__ = ["graph"]
+__all__ = ["build_graph", "agent_runtime"]
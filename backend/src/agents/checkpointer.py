@@ -0,0 +1,525 @@
+"""
+Supervisor Graph的异步checkpointer
+基于 AsyncPostgresSaver + AsyncConnectionPool，checkpoint写入不阻塞事件循环，
+并统计每次写入（aput / aput_writes）的耗时
+
+checkpoint策略：
+- 只在配置的节点边界（CHECKPOINT_NODES，如execute之后）和一轮对话结束时写入checkpoint，
+  被跳过的checkpoint的通道版本合并到下一次写入中，保证落库的checkpoint可以完整恢复状态
+- 子graph（子agent）的checkpoint默认不落库
+- 后台压缩任务为每个线程只保留最近N个checkpoint，并清理长期不活跃的线程
+- 统计每轮对话的写入量
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+except ImportError as e:
+    logger.warning("Could not import AsyncPostgresSaver: %s", e)
+    AsyncPostgresSaver = None
+
+
+class CheckpointWriteStats:
+    """checkpoint写入耗时统计（保留最近N次写入用于计算分位数）"""
+
+    def __init__(self, window: int = 1000):
+        self._samples: Dict[str, deque] = {
+            "aput": deque(maxlen=window),
+            "aput_writes": deque(maxlen=window),
+        }
+        self._counters: Dict[str, Dict[str, float]] = {
+            name: {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0}
+            for name in self._samples
+        }
+
+    def record(self, operation: str, elapsed_ms: float, ok: bool = True) -> None:
+        """记录一次写入"""
+        counters = self._counters[operation]
+        counters["count"] += 1
+        counters["total_ms"] += elapsed_ms
+        counters["max_ms"] = max(counters["max_ms"], elapsed_ms)
+        if not ok:
+            counters["errors"] += 1
+        self._samples[operation].append(elapsed_ms)
+
+    @staticmethod
+    def _percentile(samples: Sequence[float], percentile: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(percentile * (len(ordered) - 1))))
+        return round(ordered[index], 2)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入耗时统计"""
+        stats = {}
+        for name, counters in self._counters.items():
+            samples = list(self._samples[name])
+            count = counters["count"]
+            stats[name] = {
+                "count": int(count),
+                "errors": int(counters["errors"]),
+                "avg_ms": round(counters["total_ms"] / count, 2) if count else 0.0,
+                "p50_ms": self._percentile(samples, 0.5),
+                "p95_ms": self._percentile(samples, 0.95),
+                "max_ms": round(counters["max_ms"], 2),
+            }
+        return stats
+
+
+# 全局checkpoint写入统计
+checkpoint_stats = CheckpointWriteStats()
+
+
+# checkpoint策略配置
+CHECKPOINT_POLICY_ENABLED = os.getenv("CHECKPOINT_POLICY_ENABLED", "true").lower() == "true"
+# 在这些节点执行完后写入checkpoint（逗号分隔），一轮对话的最终状态总是会写入
+CHECKPOINT_NODES = os.getenv("CHECKPOINT_NODES", "execute")
+# 子graph（子agent内部）的checkpoint是否落库
+CHECKPOINT_SUBGRAPHS = os.getenv("CHECKPOINT_SUBGRAPHS", "false").lower() == "true"
+# 每个线程保留的checkpoint数量
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", "3"))
+# 线程最后一次写入超过该时间（秒）视为已废弃，由后台压缩任务删除
+CHECKPOINT_THREAD_TTL_SECONDS = float(os.getenv("CHECKPOINT_THREAD_TTL_SECONDS", "86400"))
+# 运行进度超过该时间（秒）仍未结束视为异常中断，由后台压缩任务清理（取消/失败的运行由聊天接口直接清理）
+CHECKPOINT_PROGRESS_TTL_SECONDS = float(os.getenv("CHECKPOINT_PROGRESS_TTL_SECONDS", "1800"))
+# 后台压缩任务的执行间隔（秒）
+CHECKPOINT_COMPACT_INTERVAL_SECONDS = float(os.getenv("CHECKPOINT_COMPACT_INTERVAL_SECONDS", "300"))
+
+# 条件边/普通边触发下游节点时写入的通道前缀
+_BRANCH_PREFIX = "branch:to:"
+_TASKS_CHANNEL = "__pregel_tasks"
+
+
+class _TurnProgress:
+    """一轮对话（一次graph运行）在某个线程上的checkpoint进度"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.pending_versions: Dict[str, Dict[str, Any]] = {}  # checkpoint_ns -> 被跳过的通道版本
+        self.last_saved_id: Dict[str, str] = {}  # checkpoint_ns -> 最近落库的checkpoint id
+        self.versions_seen: Dict[str, Dict[str, Any]] = {}  # checkpoint_ns -> 上一个checkpoint的versions_seen
+        self.skipped_ids: Set[str] = set()
+        self.counters = {
+            "checkpoints_written": 0,
+            "checkpoints_skipped": 0,
+            "writes_written": 0,
+            "writes_skipped": 0,
+            "bytes_written": 0,
+        }
+
+
+class CheckpointPolicy:
+    """checkpoint写入策略：决定哪些checkpoint / 中间写入需要落库，并统计每轮对话的写入量"""
+
+    def __init__(
+        self,
+        enabled: bool = CHECKPOINT_POLICY_ENABLED,
+        boundary_nodes: Sequence[str] = tuple(n.strip() for n in CHECKPOINT_NODES.split(",") if n.strip()),
+        persist_subgraphs: bool = CHECKPOINT_SUBGRAPHS,
+    ):
+        self.enabled = enabled
+        self.boundary_nodes = set(boundary_nodes)
+        self.persist_subgraphs = persist_subgraphs
+        self._progress: Dict[str, _TurnProgress] = {}
+        # _dump_blobs/_dump_writes在线程池中执行，统计时需要加锁
+        self._lock = threading.Lock()
+        self._totals = {
+            "turns": 0,
+            "turns_aborted": 0,
+            "checkpoints_written": 0,
+            "checkpoints_skipped": 0,
+            "writes_written": 0,
+            "writes_skipped": 0,
+            "bytes_written": 0,
+        }
+        self.last_turn: Optional[Dict[str, Any]] = None
+        # 本轮结束、等待压缩任务裁剪旧checkpoint的线程
+        self.dirty_threads: Set[str] = set()
+
+    @staticmethod
+    def finished_nodes(
+        checkpoint: Dict[str, Any],
+        new_versions: Dict[str, Any],
+        previous_seen: Optional[Dict[str, Any]] = None,
+    ) -> Set[str]:
+        """本步执行完成的节点
+
+        有上一个checkpoint时比较versions_seen（节点执行后会记录其看到的触发通道版本）；
+        否则退化为：触发通道在本步被消费（版本更新）且没有被重新写入的节点
+        """
+        if previous_seen is not None:
+            return {
+                node for node, seen in checkpoint.get("versions_seen", {}).items()
+                if not node.startswith("__") and previous_seen.get(node) != seen
+            }
+        updated = set(checkpoint.get("updated_channels") or ())
+        return {
+            channel[len(_BRANCH_PREFIX):]
+            for channel in new_versions
+            if channel.startswith(_BRANCH_PREFIX) and channel not in updated
+        }
+
+    @staticmethod
+    def is_final(checkpoint: Dict[str, Any]) -> bool:
+        """本步之后没有待执行的节点（graph运行结束）"""
+        updated = checkpoint.get("updated_channels")
+        if updated is None:
+            return True
+        return not any(channel.startswith(_BRANCH_PREFIX) or channel == _TASKS_CHANNEL for channel in updated)
+
+    def before_put(
+        self,
+        config: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+        metadata: Dict[str, Any],
+        new_versions: Dict[str, Any],
+    ) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """决定checkpoint是否落库
+
+        Returns:
+            需要落库时返回 (config, new_versions)（已合并被跳过的通道版本），跳过时返回None
+        """
+        if not self.enabled:
+            return config, new_versions
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        final = metadata.get("source") == "loop" and self.is_final(checkpoint)
+
+        with self._lock:
+            progress = self._progress.setdefault(thread_id, _TurnProgress())
+            previous_seen = progress.versions_seen.get(checkpoint_ns)
+            progress.versions_seen[checkpoint_ns] = checkpoint.get("versions_seen", {})
+            if checkpoint_ns and not self.persist_subgraphs:
+                save = False
+            elif metadata.get("source") in ("update", "fork"):
+                save = True
+            else:
+                save = final or (
+                    metadata.get("source") == "loop"
+                    and bool(self.finished_nodes(checkpoint, new_versions, previous_seen) & self.boundary_nodes)
+                )
+
+            pending = progress.pending_versions.setdefault(checkpoint_ns, {})
+            if not save:
+                pending.update(new_versions)
+                progress.skipped_ids.add(checkpoint["id"])
+                progress.counters["checkpoints_skipped"] += 1
+                return None
+
+            # 被跳过的checkpoint中更新过的通道，按当前版本一并写入blob
+            channel_versions = checkpoint.get("channel_versions", {})
+            merged = {channel: channel_versions.get(channel, version) for channel, version in pending.items()}
+            merged.update(new_versions)
+            progress.pending_versions[checkpoint_ns] = {}
+
+            # 父checkpoint被跳过时，改为指向最近落库的checkpoint
+            parent_id = configurable.get("checkpoint_id")
+            if parent_id in progress.skipped_ids:
+                configurable = {k: v for k, v in configurable.items() if k != "checkpoint_id"}
+                if checkpoint_ns in progress.last_saved_id:
+                    configurable["checkpoint_id"] = progress.last_saved_id[checkpoint_ns]
+                config = {**config, "configurable": configurable}
+            progress.last_saved_id[checkpoint_ns] = checkpoint["id"]
+            progress.counters["checkpoints_written"] += 1
+
+            if final and not checkpoint_ns:
+                self._finish_turn(thread_id)
+        return config, merged
+
+    def before_put_writes(self, config: Dict[str, Any], writes: Sequence[Tuple[str, Any]]) -> bool:
+        """决定中间写入是否落库（关联的checkpoint被跳过时丢弃）"""
+        if not self.enabled:
+            return True
+        configurable = config["configurable"]
+        with self._lock:
+            progress = self._progress.get(str(configurable["thread_id"]))
+            if progress is None:
+                return True
+            skip = (
+                (configurable.get("checkpoint_ns") and not self.persist_subgraphs)
+                or configurable.get("checkpoint_id") in progress.skipped_ids
+            )
+            progress.counters["writes_skipped" if skip else "writes_written"] += len(writes)
+            return not skip
+
+    def record_bytes(self, thread_id: str, size: int) -> None:
+        """记录序列化后写入数据库的字节数"""
+        with self._lock:
+            progress = self._progress.get(str(thread_id))
+            if progress is not None:
+                progress.counters["bytes_written"] += size
+            else:
+                self._totals["bytes_written"] += size
+
+    def _finish_turn(self, thread_id: str) -> None:
+        """一轮对话结束：汇总写入量（调用方已持有锁）"""
+        progress = self._progress.pop(thread_id)
+        self._totals["turns"] += 1
+        for key, value in progress.counters.items():
+            self._totals[key] += value
+        self.last_turn = {
+            "thread_id": thread_id,
+            **progress.counters,
+            "duration_ms": round((time.monotonic() - progress.started_at) * 1000, 2),
+        }
+        self.dirty_threads.add(thread_id)
+        counters = progress.counters
+        logger.debug(
+            "checkpoint写入量 thread=%s: checkpoint 写入%s/跳过%s, 中间写入 写入%s/跳过%s, 约%s字节",
+            thread_id, counters['checkpoints_written'], counters['checkpoints_skipped'],
+            counters['writes_written'], counters['writes_skipped'], counters['bytes_written'],
+        )
+
+    def abort_turn(self, thread_id: str) -> bool:
+        """运行被取消或失败、没有写入最终checkpoint时丢弃运行进度；已正常结束时不做处理"""
+        with self._lock:
+            progress = self._progress.pop(str(thread_id), None)
+            if progress is None:
+                return False
+            self._totals["turns_aborted"] += 1
+            for key, value in progress.counters.items():
+                self._totals[key] += value
+            # 中断前可能已在边界节点落库，交给压缩任务裁剪
+            if progress.counters["checkpoints_written"]:
+                self.dirty_threads.add(str(thread_id))
+        return True
+
+    def active_threads(self) -> Set[str]:
+        """正在运行中的线程"""
+        with self._lock:
+            return set(self._progress)
+
+    def drop_stale_progress(self, max_age_seconds: float) -> int:
+        """清理异常中断、未能正常结束的运行进度"""
+        now = time.monotonic()
+        with self._lock:
+            stale = [tid for tid, p in self._progress.items() if now - p.started_at > max_age_seconds]
+            for thread_id in stale:
+                del self._progress[thread_id]
+        return len(stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入量统计"""
+        with self._lock:
+            # 中断的运行也计入写入量，平均值按全部运行计算
+            turns = self._totals["turns"] + self._totals["turns_aborted"]
+            return {
+                "enabled": self.enabled,
+                "boundary_nodes": sorted(self.boundary_nodes),
+                "persist_subgraphs": self.persist_subgraphs,
+                "totals": dict(self._totals),
+                "per_turn_avg": {
+                    key: round(value / turns, 2)
+                    for key, value in self._totals.items() if key not in ("turns", "turns_aborted")
+                } if turns else {},
+                "last_turn": self.last_turn,
+                "in_flight_threads": len(self._progress),
+            }
+
+
+# 全局checkpoint策略
+checkpoint_policy = CheckpointPolicy()
+
+
+class CheckpointPolicyMixin:
+    """按CheckpointPolicy过滤checkpoint写入的saver混入类（放在具体saver之前）"""
+
+    checkpoint_policy: CheckpointPolicy = checkpoint_policy
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        decision = self.checkpoint_policy.before_put(config, checkpoint, metadata, new_versions)
+        if decision is None:
+            configurable = config["configurable"]
+            return {
+                "configurable": {
+                    "thread_id": configurable["thread_id"],
+                    "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                    "checkpoint_id": checkpoint["id"],
+                }
+            }
+        config, new_versions = decision
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = ""):
+        if not self.checkpoint_policy.before_put_writes(config, writes):
+            return None
+        return await super().aput_writes(config, writes, task_id, task_path)
+
+
+if AsyncPostgresSaver is not None:
+    class InstrumentedAsyncPostgresSaver(AsyncPostgresSaver):
+        """记录写入耗时的AsyncPostgresSaver"""
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = await super().aput(config, checkpoint, metadata, new_versions)
+                ok = True
+                return result
+            finally:
+                checkpoint_stats.record("aput", (time.perf_counter() - start) * 1000, ok)
+
+        async def aput_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = ""):
+            start = time.perf_counter()
+            ok = False
+            try:
+                result = await super().aput_writes(config, writes, task_id, task_path)
+                ok = True
+                return result
+            finally:
+                checkpoint_stats.record("aput_writes", (time.perf_counter() - start) * 1000, ok)
+
+        def _dump_blobs(self, thread_id, checkpoint_ns, values, versions):
+            rows = super()._dump_blobs(thread_id, checkpoint_ns, values, versions)
+            checkpoint_policy.record_bytes(thread_id, sum(len(row[-1] or b"") for row in rows))
+            return rows
+
+        def _dump_writes(self, thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, writes):
+            rows = super()._dump_writes(thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, writes)
+            checkpoint_policy.record_bytes(thread_id, sum(len(row[-1] or b"") for row in rows))
+            return rows
+
+    class PolicyAsyncPostgresSaver(CheckpointPolicyMixin, InstrumentedAsyncPostgresSaver):
+        """按checkpoint策略写入、并记录写入耗时的AsyncPostgresSaver"""
+else:
+    InstrumentedAsyncPostgresSaver = None
+    PolicyAsyncPostgresSaver = None
+
+
+class CheckpointCompactor:
+    """后台checkpoint压缩任务
+
+    - 本轮已结束的线程只保留最近 keep_last 个checkpoint（连同不再被引用的blob和中间写入）
+    - 删除最后一次写入早于 thread_ttl_seconds 的线程
+    """
+
+    _TRIM_CHECKPOINTS_SQL = """
+        DELETE FROM checkpoints c
+        WHERE c.thread_id = %(thread_id)s
+          AND c.checkpoint_id NOT IN (
+              SELECT k.checkpoint_id FROM checkpoints k
+              WHERE k.thread_id = c.thread_id AND k.checkpoint_ns = c.checkpoint_ns
+              ORDER BY k.checkpoint_id DESC
+              LIMIT %(keep_last)s
+          )
+    """
+    _TRIM_WRITES_SQL = """
+        DELETE FROM checkpoint_writes w
+        WHERE w.thread_id = %(thread_id)s
+          AND NOT EXISTS (
+              SELECT 1 FROM checkpoints c
+              WHERE c.thread_id = w.thread_id AND c.checkpoint_ns = w.checkpoint_ns
+                AND c.checkpoint_id = w.checkpoint_id
+          )
+    """
+    _TRIM_BLOBS_SQL = """
+        DELETE FROM checkpoint_blobs b
+        WHERE b.thread_id = %(thread_id)s
+          AND NOT EXISTS (
+              SELECT 1 FROM checkpoints c
+              WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+                AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+          )
+    """
+    _ABANDONED_THREADS_SQL = """
+        SELECT thread_id FROM checkpoints
+        GROUP BY thread_id
+        HAVING max((checkpoint ->> 'ts')::timestamptz) < now() - make_interval(secs => %(ttl)s)
+        LIMIT %(limit)s
+    """
+
+    def __init__(
+        self,
+        saver: Any,
+        policy: CheckpointPolicy = checkpoint_policy,
+        keep_last: int = CHECKPOINT_KEEP_LAST,
+        thread_ttl_seconds: float = CHECKPOINT_THREAD_TTL_SECONDS,
+        progress_ttl_seconds: float = CHECKPOINT_PROGRESS_TTL_SECONDS,
+        interval_seconds: float = CHECKPOINT_COMPACT_INTERVAL_SECONDS,
+        batch_size: int = 500,
+    ):
+        self.saver = saver
+        self.policy = policy
+        self.keep_last = max(1, keep_last)
+        self.thread_ttl_seconds = thread_ttl_seconds
+        self.progress_ttl_seconds = progress_ttl_seconds
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"runs": 0, "errors": 0, "threads_trimmed": 0, "threads_deleted": 0, "last_run_ms": 0.0}
+
+    def start(self) -> None:
+        """启动后台压缩任务（需在事件循环中调用）"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """停止后台压缩任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._stats["errors"] += 1
+                logger.warning("checkpoint压缩失败: %s", e)
+
+    async def run_once(self) -> Dict[str, int]:
+        """执行一次压缩"""
+        start = time.perf_counter()
+        # 仍在运行中的线程不裁剪（避免删掉刚写入、尚未被checkpoint引用的blob）
+        active = self.policy.active_threads()
+        dirty = [tid for tid in self.policy.dirty_threads if tid not in active]
+        self.policy.dirty_threads.difference_update(dirty)
+
+        async with self.saver._cursor() as cur:
+            for thread_id in dirty:
+                params = {"thread_id": thread_id, "keep_last": self.keep_last}
+                await cur.execute(self._TRIM_CHECKPOINTS_SQL, params)
+                await cur.execute(self._TRIM_WRITES_SQL, params)
+                await cur.execute(self._TRIM_BLOBS_SQL, params)
+
+            await cur.execute(self._ABANDONED_THREADS_SQL, {"ttl": self.thread_ttl_seconds, "limit": self.batch_size})
+            abandoned = [row["thread_id"] for row in await cur.fetchall() if row["thread_id"] not in active]
+            if abandoned:
+                for table in ("checkpoint_writes", "checkpoint_blobs", "checkpoints"):
+                    await cur.execute(f"DELETE FROM {table} WHERE thread_id = ANY(%s)", (abandoned,))
+
+        self.policy.drop_stale_progress(self.progress_ttl_seconds)
+        self._stats["runs"] += 1
+        self._stats["threads_trimmed"] += len(dirty)
+        self._stats["threads_deleted"] += len(abandoned)
+        self._stats["last_run_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        if dirty or abandoned:
+            logger.debug("checkpoint压缩: 裁剪%s个线程，删除%s个废弃线程", len(dirty), len(abandoned))
+        return {"threads_trimmed": len(dirty), "threads_deleted": len(abandoned)}
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取压缩统计"""
+        return {
+            **self._stats,
+            "keep_last": self.keep_last,
+            "thread_ttl_seconds": self.thread_ttl_seconds,
+            "interval_seconds": self.interval_seconds,
+            "running": self._task is not None,
+        }
@@ -1,20 +1,13 @@
 """
 PostgreSQL配置模块
 提供PostgreSQL连接、store和checkpointer的配置功能
+store和checkpointer的连接都来自连接池管理器（connection_pool.py）：
+checkpointer使用异步的checkpoint连接池，store使用同步的store连接池
 """
 import os
 import uuid
-try:
-    from langchain_postgres import PostgresChatMessageHistory
-except ImportError as e:
-    print(f"Warning: Could not import PostgreSQL store: {e}")
-    PostgresChatMessageHistory = None
-
-try:
-    from langgraph.checkpoint.postgres import PostgresSaver
-except ImportError as e:
-    print(f"Warning: Could not import PostgreSQL checkpointer: {e}")
-    PostgresSaver = None
+from ..connection_pool import pool_manager
+from .checkpointer import PolicyAsyncPostgresSaver
 
 
 def get_postgres_connection_string():
@@ -32,14 +25,16 @@ def get_postgres_connection_string():
 
 
 def get_postgres_store():
-    """获取PostgreSQL store"""
-    if PostgresChatMessageHistory is None:
+    """获取PostgreSQL store（langchain_postgres在首次创建store时才导入）"""
+    try:
+        from langchain_postgres import PostgresChatMessageHistory
+    except ImportError as e:
+        print(f"Warning: Could not import PostgreSQL store: {e}")
         print("PostgresChatMessageHistory 不可用")
         return None
     try:
-        import psycopg
-        # 创建同步连接
-        sync_connection = psycopg.connect(get_postgres_connection_string())
+        # 从共享连接池中取出一个连接（store长期持有该连接，计入store连接池配额）
+        sync_connection = pool_manager.get_store_pool().getconn()
         store = PostgresChatMessageHistory(
             "message_store",
             str(uuid.uuid4()),
@@ -51,19 +46,16 @@ def get_postgres_store():
         return None
 
 
-def get_postgres_checkpointer(connection_string: str = None) -> PostgresSaver:
-    """获取官方的 PostgreSQL checkpointer
-    
-    Args:
-        connection_string: PostgreSQL连接字符串，如果为None则使用默认连接字符串
+async def get_async_postgres_checkpointer() -> PolicyAsyncPostgresSaver:
+    """获取异步PostgreSQL checkpointer（使用共享的异步checkpoint连接池，需在事件循环中调用）
+
+    写入按 checkpointer.CheckpointPolicy 过滤，只在配置的节点边界和运行结束时落库
     """
-    if PostgresSaver is None:
-        raise ImportError("PostgresSaver 不可用，请安装 langgraph[postgres]")
-    
-    if connection_string is None:
-        connection_string = get_postgres_connection_string()
-    
-    checkpointer = PostgresSaver.from_conn_string(connection_string)
+    if PolicyAsyncPostgresSaver is None:
+        raise ImportError("AsyncPostgresSaver 不可用，请安装 langgraph[postgres]")
+
+    pool = await pool_manager.open_checkpoint_pool()
+    checkpointer = PolicyAsyncPostgresSaver(pool)
     # 设置数据库表
-    checkpointer.setup()
+    await checkpointer.setup()
     return checkpointer
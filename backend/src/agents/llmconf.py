@@ -1,67 +1,420 @@
 """
 LLM配置模块
 提供多种LLM提供商的配置和初始化功能
+
+进程内的LLM实例统一由 llm_registry 提供：
+- 所有OpenAI兼容提供商的模型共用一个调优过的 httpx.AsyncClient（keep-alive、可选HTTP/2、连接数上限）
+- 按角色选择模型（intent / plan / response / agent），相同模型只创建一个实例
+- 通过共享信号量限制同时进行的LLM请求数，突发流量不会向提供商打开大量TLS连接
+- 单飞合并：并发的相同请求（模型、消息、参数都相同）只向提供商发起一次调用，结果短暂缓存
 """
+import asyncio
+import hashlib
+import importlib.util
+import json
+import logging
 import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import generate_from_stream
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
 from langchain_openai import ChatOpenAI
+from pydantic import Field
+
+logger = logging.getLogger(__name__)
+
+
+# LLM HTTP连接池配置
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "true").lower() == "true"
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "60"))
+# 同时进行的LLM请求数上限（超出的请求排队等待）
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# 单飞合并：并发的相同请求共享一次上游调用；完成的结果缓存 LLM_COALESCE_TTL_SECONDS 秒
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() == "true"
+LLM_COALESCE_TTL_SECONDS = float(os.getenv("LLM_COALESCE_TTL_SECONDS", "10"))
+LLM_COALESCE_MAX_ENTRIES = int(os.getenv("LLM_COALESCE_MAX_ENTRIES", "256"))
 
+# 模型角色：每个角色可通过 LLM_MODEL_<ROLE> 指定模型，未配置时使用提供商默认模型
+# intent：意图分类（可用便宜的小模型）；plan：执行计划；response：汇总和简单回复；agent：子agent工具调用
+LLM_ROLES = ("intent", "plan", "response", "agent")
+
+
+def _openai_compatible_config(model: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """OpenAI兼容提供商的ChatOpenAI参数
+
+    Args:
+        model: 覆盖提供商默认模型（Azure下为部署名）
 
-def get_llm() -> ChatOpenAI:
-    """初始化 LLM
-    
     Returns:
-        ChatOpenAI: 配置好的LLM实例
+        ChatOpenAI参数；配置的是非OpenAI兼容提供商（Anthropic）时返回None
     """
     # 支持多种 LLM 提供商
     if os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT"):
         # Azure OpenAI 配置
-        return ChatOpenAI(
-            model=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini"),
-            temperature=0.1,
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            base_url=f"{os.getenv('AZURE_OPENAI_ENDPOINT')}openai/deployments/{os.getenv('AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-4o-mini')}/",
-            default_query={"api-version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")}
-        )
+        deployment = model or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4o-mini")
+        return {
+            "model": deployment,
+            "api_key": os.getenv("AZURE_OPENAI_API_KEY"),
+            "base_url": f"{os.getenv('AZURE_OPENAI_ENDPOINT')}openai/deployments/{deployment}/",
+            "default_query": {"api-version": os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview")}
+        }
     elif os.getenv("SILICONFLOW_API_KEY"):
         # 硅基流动 API 配置
-        return ChatOpenAI(
-            model=os.getenv("SILICONFLOW_MODEL", "deepseek-chat"),
-            temperature=0.1,
-            api_key=os.getenv("SILICONFLOW_API_KEY"),
-            base_url=os.getenv("SILICONFLOW_BASE_URL", "https://api.siliconflow.cn/v1")
-        )
+        return {
+            "model": model or os.getenv("SILICONFLOW_MODEL", "deepseek-chat"),
+            "api_key": os.getenv("SILICONFLOW_API_KEY"),
+            "base_url": os.getenv("SILICONFLOW_BASE_URL", "https://api.siliconflow.cn/v1")
+        }
     elif os.getenv("OPENAI_API_KEY"):
         # 标准 OpenAI API
-        return ChatOpenAI(
-            model="gpt-3.5-turbo",
-            temperature=0.1,
-            api_key=os.getenv("OPENAI_API_KEY")
-        )
+        return {
+            "model": model or "gpt-3.5-turbo",
+            "api_key": os.getenv("OPENAI_API_KEY")
+        }
     elif os.getenv("ANTHROPIC_API_KEY"):
+        return None
+    else:
+        # 使用模拟响应模式（当无法访问外部API时）
+        return {
+            "model": model or "local-simulator",
+            "api_key": "dummy-key"  # 将使用模拟响应
+        }
+
+
+def get_llm(model: Optional[str] = None) -> ChatOpenAI:
+    """初始化 LLM（独立实例，不共享连接池；应用内请使用 llm_registry.get()）
+
+    Args:
+        model: 覆盖提供商默认模型
+
+    Returns:
+        ChatOpenAI: 配置好的LLM实例
+    """
+    config = _openai_compatible_config(model)
+    if config is None:
         from langchain_anthropic import ChatAnthropic
         return ChatAnthropic(
-            model="claude-3-sonnet-20240229",
+            model=model or "claude-3-sonnet-20240229",
             temperature=0.1,
             api_key=os.getenv("ANTHROPIC_API_KEY")
         )
-    else:
-        # 使用模拟响应模式（当无法访问外部API时）
-        return ChatOpenAI(
-            model="local-simulator",
-            temperature=0.1,
-            api_key="dummy-key"  # 将使用模拟响应
-        )
+    return ChatOpenAI(temperature=0.1, **config)
 
 
 def is_llm_available() -> bool:
     """检查 LLM 是否可用
-    
+
     Returns:
         bool: LLM是否可用
     """
     return bool(
         os.getenv("AZURE_OPENAI_API_KEY") and os.getenv("AZURE_OPENAI_ENDPOINT") or
         os.getenv("SILICONFLOW_API_KEY") or
-        os.getenv("OPENAI_API_KEY") or 
+        os.getenv("OPENAI_API_KEY") or
         os.getenv("ANTHROPIC_API_KEY")
     )
+
+
+class LLMConcurrencyLimiter:
+    """进程级LLM并发限制（所有角色的模型共用）"""
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.max_concurrency = max(1, max_concurrency)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.queued = 0  # 需要排队等待的请求数
+        self.total_wait_ms = 0.0
+
+    @asynccontextmanager
+    async def acquire(self):
+        """获取一个并发名额"""
+        if self._semaphore.locked():
+            self.queued += 1
+        start = time.perf_counter()
+        async with self._semaphore:
+            self.total_wait_ms += (time.perf_counter() - start) * 1000
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取并发统计"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests,
+            "queued": self.queued,
+            "avg_wait_ms": round(self.total_wait_ms / self.requests, 2) if self.requests else 0.0,
+        }
+
+
+class LLMSingleFlight:
+    """LLM请求单飞合并与短期结果缓存（进程级，所有模型共用，键中包含模型名）
+
+    同一个键同时只有一个调用（leader）访问提供商，其他调用等待其结果；leader被取消
+    （如客户端断开）时等待者自行调用，不会被连带取消
+    """
+
+    def __init__(self, ttl: float = LLM_COALESCE_TTL_SECONDS, max_entries: int = LLM_COALESCE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max(0, max_entries)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._cache: "OrderedDict[str, Any]" = OrderedDict()  # 键 -> (过期时间, ChatResult)
+        self.leaders = 0  # 实际发往提供商的调用
+        self.coalesced = 0  # 等待进行中调用的请求
+        self.cache_hits = 0
+        self.abandoned = 0  # leader失败或取消的次数
+
+    @staticmethod
+    def make_key(model_name: str, temperature: Any, messages: List[Any], stop: Any, params: Dict[str, Any]) -> str:
+        """根据模型、消息和调用参数生成请求键"""
+        payload = {
+            "model": model_name,
+            "temperature": temperature,
+            "stop": stop,
+            "params": params,
+            "messages": [
+                [message.type, message.content, getattr(message, "tool_call_id", None), getattr(message, "tool_calls", None)]
+                for message in messages
+            ],
+        }
+        raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get_cached(self, key: str) -> Optional[ChatResult]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at < time.monotonic():
+            del self._cache[key]
+            return None
+        self.cache_hits += 1
+        return self._detached(result)
+
+    async def wait(self, key: str) -> Optional[ChatResult]:
+        """等待进行中的相同请求；没有进行中的请求或leader未完成时返回None"""
+        future = self._inflight.get(key)
+        if future is None:
+            return None
+        self.coalesced += 1
+        result = await asyncio.shield(future)
+        return self._detached(result) if result is not None else None
+
+    @staticmethod
+    def _detached(result: ChatResult) -> ChatResult:
+        """共享结果的副本；去掉消息id，由调用方的运行重新分配"""
+        result = result.model_copy(deep=True)
+        for generation in result.generations:
+            generation.message.id = None
+        return result
+
+    def begin(self, key: str) -> None:
+        """成为该键的leader"""
+        self.leaders += 1
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+
+    def complete(self, key: str, result: ChatResult) -> None:
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+        if self.ttl > 0 and self.max_entries > 0:
+            self._cache[key] = (time.monotonic() + self.ttl, result)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def abandon(self, key: str) -> None:
+        """leader失败或被取消：唤醒等待者，由它们各自重新调用"""
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            self.abandoned += 1
+            future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        requests = self.leaders + self.coalesced + self.cache_hits
+        return {
+            "ttl_seconds": self.ttl,
+            "upstream_calls": self.leaders,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._inflight),
+            "cached_entries": len(self._cache),
+            "saved_ratio": round((self.coalesced + self.cache_hits) / requests, 4) if requests else 0.0,
+        }
+
+
+class PooledChatOpenAI(ChatOpenAI):
+    """共享HTTP连接池、受并发限制、相同请求单飞合并的ChatOpenAI"""
+
+    limiter: Optional[Any] = Field(default=None, exclude=True)
+    single_flight: Optional[Any] = Field(default=None, exclude=True)
+
+    def _coalesce_key(self, messages: List[Any], stop: Any, kwargs: Dict[str, Any]) -> Optional[str]:
+        """单飞合并的请求键；绑定了工具的调用（子agent）不合并"""
+        if self.single_flight is None or kwargs.get("tools") or kwargs.get("functions"):
+            return None
+        params = {key: value for key, value in kwargs.items() if key not in ("stream", "run_manager")}
+        return self.single_flight.make_key(self.model_name, self.temperature, messages, stop, params)
+
+    async def _shared_result(self, key: str) -> Optional[ChatResult]:
+        """从缓存或进行中的相同请求获取结果"""
+        result = self.single_flight.get_cached(key)
+        if result is None:
+            result = await self.single_flight.wait(key)
+        return result
+
+    async def _limited_agenerate(self, *args, **kwargs):
+        if self.limiter is None:
+            return await super()._agenerate(*args, **kwargs)
+        async with self.limiter.acquire():
+            return await super()._agenerate(*args, **kwargs)
+
+    async def _limited_astream(self, *args, **kwargs):
+        if self.limiter is None:
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+            return
+        async with self.limiter.acquire():
+            async for chunk in super()._astream(*args, **kwargs):
+                yield chunk
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._coalesce_key(messages, stop, kwargs)
+        if key is None:
+            return await self._limited_agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        result = await self._shared_result(key)
+        if result is not None:
+            return result
+
+        self.single_flight.begin(key)
+        try:
+            result = await self._limited_agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        except BaseException:
+            self.single_flight.abandon(key)
+            raise
+        self.single_flight.complete(key, result)
+        return result
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._coalesce_key(messages, stop, kwargs)
+        if key is None:
+            async for chunk in self._limited_astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                yield chunk
+            return
+        result = await self._shared_result(key)
+        if result is not None:
+            # 共享的结果作为一个chunk输出
+            message = result.generations[0].message
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=message.content, response_metadata=message.response_metadata
+            ))
+            return
+
+        self.single_flight.begin(key)
+        chunks = []
+        try:
+            async for chunk in self._limited_astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                chunks.append(chunk)
+                yield chunk
+        except BaseException:
+            # 包括调用方提前停止读取（GeneratorExit）
+            self.single_flight.abandon(key)
+            raise
+        if chunks:
+            self.single_flight.complete(key, generate_from_stream(iter(chunks)))
+        else:
+            self.single_flight.abandon(key)
+
+
+class LLMRegistry:
+    """进程级LLM客户端注册表"""
+
+    def __init__(self):
+        self.limiter = LLMConcurrencyLimiter()
+        self.single_flight = LLMSingleFlight() if LLM_COALESCE_ENABLED else None
+        self.http2 = LLM_HTTP2 and importlib.util.find_spec("h2") is not None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._models: Dict[str, Any] = {}  # 模型名 -> LLM实例
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """获取共享的httpx异步客户端"""
+        if self._http_client is None:
+            if LLM_HTTP2 and not self.http2:
+                logger.warning("未安装h2，LLM客户端使用HTTP/1.1（pip install h2 启用HTTP/2）")
+            self._http_client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+                ),
+                timeout=httpx.Timeout(LLM_REQUEST_TIMEOUT, connect=10.0),
+            )
+        return self._http_client
+
+    @staticmethod
+    def role_model(role: str) -> Optional[str]:
+        """角色配置的模型（未配置时返回None，使用提供商默认模型）"""
+        return os.getenv(f"LLM_MODEL_{role.upper()}") or None
+
+    def get(self, role: Optional[str] = None) -> Any:
+        """获取指定角色的LLM实例（相同模型的角色共用一个实例）"""
+        model = self.role_model(role) if role else None
+        key = model or "__default__"
+        if key not in self._models:
+            self._models[key] = self._create(model)
+        return self._models[key]
+
+    def _create(self, model: Optional[str]) -> Any:
+        config = _openai_compatible_config(model)
+        if config is None:
+            # 非OpenAI兼容提供商不共享连接池
+            return get_llm(model)
+        logger.debug("LLM注册表: 创建模型 %s（共享连接池，HTTP/2=%s）", config['model'], self.http2)
+        return PooledChatOpenAI(
+            temperature=0.1,
+            http_async_client=self._get_http_client(),
+            limiter=self.limiter,
+            single_flight=self.single_flight,
+            **config
+        )
+
+    async def aclose(self) -> None:
+        """关闭共享的HTTP连接池（应用关闭时调用）"""
+        self._models.clear()
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取模型分配和并发统计"""
+        return {
+            "http2": self.http2,
+            "max_connections": LLM_MAX_CONNECTIONS,
+            "max_keepalive_connections": LLM_MAX_KEEPALIVE_CONNECTIONS,
+            "roles": {role: self.role_model(role) or "default" for role in LLM_ROLES},
+            "models": sorted(getattr(llm, "model_name", key) for key, llm in self._models.items()),
+            "concurrency": self.limiter.get_stats(),
+            "single_flight": self.single_flight.get_stats() if self.single_flight else None,
+        }
+
+
+# 全局LLM注册表
+llm_registry = LLMRegistry()
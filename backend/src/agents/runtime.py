@@ -0,0 +1,148 @@
+"""
+Agent运行时
+Supervisor Graph、子Agent Graph、LLM实例（来自llm_registry）、store和checkpointer都在应用lifespan中
+由 agent_runtime.start_in_background() 构建，导入模块时不再连接数据库或创建LLM客户端
+
+启动过程按阶段计时并记录日志；全部阶段完成前 ready 为 False，聊天接口据此返回503。
+lifespan 通过 start_in_background() 在后台构建（失败时按指数退避重试），
+应用先开始接收请求，构建期间 /api/ready 和聊天接口返回503 + Retry-After
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+from .llmconf import llm_registry, LLM_ROLES
+from .dbconf import get_postgres_store, get_async_postgres_checkpointer
+from .checkpointer import CheckpointCompactor
+from .supervisor.graph import build_graph
+
+logger = logging.getLogger(__name__)
+
+
+# 后台构建失败时的重试配置（最多尝试次数，0表示一直重试；首次重试间隔，之后翻倍直到上限）
+AGENT_RUNTIME_START_MAX_ATTEMPTS = int(os.getenv("AGENT_RUNTIME_START_MAX_ATTEMPTS", "0"))
+AGENT_RUNTIME_START_BACKOFF_SECONDS = float(os.getenv("AGENT_RUNTIME_START_BACKOFF_SECONDS", "2"))
+AGENT_RUNTIME_START_MAX_BACKOFF_SECONDS = float(os.getenv("AGENT_RUNTIME_START_MAX_BACKOFF_SECONDS", "60"))
+
+
+class AgentRuntime:
+    """进程级Agent运行时（graph、LLM、checkpointer的唯一持有者）"""
+
+    def __init__(self):
+        self.graph: Any = None
+        self.llm: Any = None
+        self.compactor: Optional[CheckpointCompactor] = None
+        self.ready = False
+        self.error: Optional[str] = None
+        self.startup_phases: Dict[str, float] = {}  # 启动阶段 -> 耗时（毫秒）
+        self.start_attempts = 0
+        self._start_task: Optional[asyncio.Task] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个启动阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 2)
+            self.startup_phases[name] = elapsed_ms
+            logger.info("启动阶段 %s 耗时 %.1fms", name, elapsed_ms)
+
+    def start_in_background(self) -> None:
+        """在后台任务中构建运行时，失败时按指数退避重试"""
+        if self._start_task is None or self._start_task.done():
+            self._start_task = asyncio.create_task(self._start_with_retry())
+
+    async def _start_with_retry(self) -> None:
+        backoff = AGENT_RUNTIME_START_BACKOFF_SECONDS
+        while not await self.start():
+            if AGENT_RUNTIME_START_MAX_ATTEMPTS and self.start_attempts >= AGENT_RUNTIME_START_MAX_ATTEMPTS:
+                logger.error("Agent运行时初始化失败 %s 次，停止重试", self.start_attempts)
+                return
+            logger.warning("Agent运行时将在 %gs 后重试初始化（第 %s 次失败）", backoff, self.start_attempts)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, AGENT_RUNTIME_START_MAX_BACKOFF_SECONDS)
+
+    async def start(self) -> bool:
+        """构建graph并初始化store/checkpointer，返回是否就绪
+
+        store和checkpointer初始化失败时graph以无状态模式运行；graph构建失败时保持未就绪
+        """
+        self.start_attempts += 1
+        try:
+            with self.phase("llm"):
+                # 所有角色的模型共用一个HTTP连接池和并发限制，相同模型共用一个实例
+                self.llm = llm_registry.get()
+                role_llms = {role: llm_registry.get(role) for role in LLM_ROLES}
+
+            with self.phase("store"):
+                try:
+                    # 同步连接放到线程中建立，不阻塞事件循环
+                    store = await asyncio.to_thread(get_postgres_store)
+                    if store:
+                        logger.info("Supervisor Graph store 初始化成功")
+                    else:
+                        logger.warning("Supervisor Graph store 初始化失败，将使用内存模式")
+                except Exception as e:
+                    logger.warning("Supervisor Graph store 初始化失败: %s", e)
+                    store = None
+
+            with self.phase("graph"):
+                self.graph = build_graph(self.llm, store, role_llms)
+
+            with self.phase("checkpointer"):
+                try:
+                    self.graph.checkpointer = await get_async_postgres_checkpointer()
+                    logger.info("Supervisor Graph checkpointer 初始化成功")
+                    # 后台压缩任务：裁剪旧checkpoint、清理废弃线程
+                    self.compactor = CheckpointCompactor(self.graph.checkpointer)
+                    self.compactor.start()
+                except Exception as e:
+                    logger.warning("Supervisor Graph checkpointer 初始化失败: %s", e)
+                    self.graph.checkpointer = None
+
+            self.ready = True
+            self.error = None
+            total_ms = sum(self.startup_phases.values())
+            logger.info("Agent运行时就绪（启动阶段合计 %.1fms）", total_ms)
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("Agent运行时初始化失败: %s", e)
+        return self.ready
+
+    async def stop(self) -> None:
+        """停止后台任务并关闭LLM连接池（数据库连接池由连接池管理器统一关闭）"""
+        self.ready = False
+        if self._start_task is not None and not self._start_task.done():
+            self._start_task.cancel()
+            try:
+                await self._start_task
+            except asyncio.CancelledError:
+                pass
+        self._start_task = None
+        if self.compactor is not None:
+            await self.compactor.stop()
+            self.compactor = None
+        if self.graph is not None:
+            self.graph.checkpointer = None
+        await llm_registry.aclose()
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取就绪状态和启动阶段耗时"""
+        return {
+            "ready": self.ready,
+            "error": self.error,
+            "start_attempts": self.start_attempts,
+            "checkpointer": self.graph is not None and self.graph.checkpointer is not None,
+            "store": self.graph is not None and self.graph.store is not None,
+            "startup_phases_ms": dict(self.startup_phases),
+        }
+
+
+# 全局Agent运行时实例
+agent_runtime = AgentRuntime()
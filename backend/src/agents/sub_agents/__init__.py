@@ -3,12 +3,12 @@
 包含Task、Schedule、Note三个资源型子Agent
 """
 
-from .task import graph as task_graph
-from .schedule import graph as schedule_graph
-from .note import graph as note_graph
+from .task import build_graph as build_task_graph
+from .schedule import build_graph as build_schedule_graph
+from .note import build_graph as build_note_graph
 
 __all__ = [
-    "task_graph",
-    "schedule_graph",
-    "note_graph"
+    "build_task_graph",
+    "build_schedule_graph",
+    "build_note_graph"
 ]
@@ -3,8 +3,8 @@ Note子Agent模块
 包含笔记管理相关的Graph和工具
 """
 
-from .graph import graph
+from .graph import build_graph
 from .tools import NoteTools
 
-__all__ = ["graph", "NoteTools"]
+__all__ = ["build_graph", "NoteTools"]
 
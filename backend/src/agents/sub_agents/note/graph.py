@@ -6,28 +6,28 @@ Note子Agent Graph
 from typing import Dict, Any
 from langchain_core.messages import SystemMessage
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 from ...supervisor.state import SupervisorState
 from .tools import NoteTools
 from .prompt import get_note_agent_prompt
+from ..tool_cache import AgentToolCache
 from ...llmconf import get_llm
 
 
 # 全局变量存储工具和LLM实例
 _note_tools = None
 _llm = None
+_tool_cache = None
 
 
 async def call_model(state: SupervisorState, config: Dict[str, Any] = None):
     """调用模型"""
     if config is None:
         config = {}
-    tool_definitions = _note_tools.get_tool_definitions()
-    system_prompt = get_note_agent_prompt(tool_definitions)
+    # 工具定义、系统提示词和绑定工具后的模型只在前端工具配置变化时重建
+    compiled = _tool_cache.get(_llm)
     
-    messages = [SystemMessage(content=system_prompt)] + state["messages"]
-    model_with_tools = _llm.bind_tools(tool_definitions)
-    response = await model_with_tools.ainvoke(messages)
+    messages = [SystemMessage(content=compiled.system_prompt)] + state["messages"]
+    response = await compiled.model_with_tools.ainvoke(messages)
     return {"messages": response}
 
 
@@ -35,13 +35,10 @@ async def run_tools(state: SupervisorState, config: Dict[str, Any] = None):
     """运行工具"""
     if config is None:
         config = {}
-    # 从state中获取user_id并设置到工具中
-    user_id = state.get("user_id")
-    if user_id is not None and _note_tools:
-        _note_tools.set_user_id(user_id)
-    # 创建 ToolNode 并直接调用，不传递 config（ToolNode 不需要 config）
-    tool_node = ToolNode(_note_tools.get_tools())
-    return await tool_node.ainvoke(state)
+    # user_id 由 ToolNode 从 state 注入到每次工具调用（InjectedState），工具实例不保存用户状态，
+    # 多个会话可以安全地并发使用同一个工具实例
+    # 复用缓存的 ToolNode 并直接调用，不传递 config（ToolNode 不需要 config）
+    return await _tool_cache.get(_llm).tool_node.ainvoke(state)
 
 
 def should_continue(state: SupervisorState):
@@ -55,30 +52,36 @@ def should_continue(state: SupervisorState):
     return "tools"
 
 
-# 在文件末尾直接构建graph
-_llm = get_llm()
-_note_tools = NoteTools()
+def build_graph(llm: Any = None):
+    """构建并编译Note子Agent的LangGraph
 
-# 构建Note子Agent的LangGraph
-workflow = StateGraph(SupervisorState)
+    Args:
+        llm: 共享的LLM实例，为None时调用get_llm()创建
+    """
+    global _llm, _note_tools, _tool_cache
+    _llm = llm if llm is not None else get_llm()
+    _note_tools = NoteTools()
+    _tool_cache = AgentToolCache("Note", _note_tools, get_note_agent_prompt)
 
-# 添加节点
-workflow.add_node("agent", call_model)
-workflow.add_node("tools", run_tools)
+    # 构建Note子Agent的LangGraph
+    workflow = StateGraph(SupervisorState)
 
-# 设置入口点
-workflow.set_entry_point("agent")
+    # 添加节点
+    workflow.add_node("agent", call_model)
+    workflow.add_node("tools", run_tools)
 
-# 添加条件边
-workflow.add_conditional_edges(
-    "agent",
-    should_continue,
-    ["tools", END]
-)
+    # 设置入口点
+    workflow.set_entry_point("agent")
 
-# 添加边
-workflow.add_edge("tools", "agent")
+    # 添加条件边
+    workflow.add_conditional_edges(
+        "agent",
+        should_continue,
+        ["tools", END]
+    )
 
-# 编译graph
-graph = workflow.compile()
+    # 添加边
+    workflow.add_edge("tools", "agent")
 
+    # 编译graph
+    return workflow.compile()
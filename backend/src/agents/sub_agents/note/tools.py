@@ -3,33 +3,33 @@
 """
 
 from langchain_core.tools import tool
-from typing import List, Any, Dict, Optional
-from ....services.sync_note_service import SyncNoteService
-from ....models.note import NoteCreate, NoteUpdate, NoteCategoryEnum
+from langgraph.prebuilt import InjectedState
+from typing import Annotated, List, Any, Dict, Optional, Tuple
+from ....services.note_service import NoteService
+from ....database import get_db_session
+from ....models.note import NoteCreate, NoteUpdate, NoteSearchRequest, NoteCategoryEnum
+from ..tool_outcome import mutation_result
 
 
 class NoteTools:
     """笔记管理工具类"""
     
     def __init__(self):
-        self.note_service = SyncNoteService()
-        self.current_user_id = None
-    
-    def set_user_id(self, user_id: int):
-        """设置当前用户ID"""
-        self.current_user_id = user_id
+        # 使用异步笔记服务（共享AsyncSessionLocal连接池），数据库I/O不阻塞事件循环
+        self.note_service = NoteService()
     
     def get_tools(self):
         """获取所有工具"""
-        @tool
-        def create_note_tool(
+        @tool(response_format="content_and_artifact")
+        async def create_note_tool(
             title: str,
             content: str,
             category: str = "PERSONAL",
             tags: List[str] = None,
             is_pinned: bool = False,
-            is_archived: bool = False
-        ) -> str:
+            is_archived: bool = False,
+            user_id: Annotated[Optional[int], InjectedState("user_id")] = None
+        ) -> Tuple[str, Dict[str, Any]]:
             """创建新笔记
             
             Args:
@@ -40,57 +40,59 @@ class NoteTools:
                 is_pinned: 是否置顶（默认False）
                 is_archived: 是否归档（默认False）
             """
-            return self._create_note_tool(title, content, category, tags, is_pinned, is_archived)
+            return await self._create_note_tool(title, content, category, tags, is_pinned, is_archived, user_id)
         
         @tool
-        def get_notes_tool() -> str:
+        async def get_notes_tool(user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取所有笔记"""
-            return self._get_notes_tool()
+            return await self._get_notes_tool(user_id)
         
         @tool
-        def get_note_tool(id: int) -> str:
+        async def get_note_tool(id: int, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取指定笔记"""
-            return self._get_note_tool(id)
+            return await self._get_note_tool(id, user_id)
         
-        @tool
-        def update_note_tool(
+        @tool(response_format="content_and_artifact")
+        async def update_note_tool(
             id: int,
             title: str = None,
             content: str = None,
             category: str = None,
             tags: List[str] = None,
             is_pinned: bool = None,
-            is_archived: bool = None
-        ) -> str:
+            is_archived: bool = None,
+            user_id: Annotated[Optional[int], InjectedState("user_id")] = None
+        ) -> Tuple[str, Dict[str, Any]]:
             """更新笔记"""
-            return self._update_note_tool(id, title, content, category, tags, is_pinned, is_archived)
+            return await self._update_note_tool(id, title, content, category, tags, is_pinned, is_archived, user_id)
         
-        @tool
-        def delete_note_tool(id: int) -> str:
+        @tool(response_format="content_and_artifact")
+        async def delete_note_tool(id: int, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
             """删除指定笔记"""
-            return self._delete_note_tool(id)
+            return await self._delete_note_tool(id, user_id)
         
         @tool
-        def search_notes_tool(
+        async def search_notes_tool(
             query: str = None,
             category: str = None,
             tags: List[str] = None,
             is_pinned: bool = None,
             is_archived: bool = None,
-            limit: int = 20
+            limit: int = 20,
+            user_id: Annotated[Optional[int], InjectedState("user_id")] = None
         ) -> str:
             """搜索笔记"""
-            return self._search_notes_tool(query, category, tags, is_pinned, is_archived, limit)
+            return await self._search_notes_tool(query, category, tags, is_pinned, is_archived, limit, user_id)
         
         @tool
-        def get_pinned_notes_tool() -> str:
+        async def get_pinned_notes_tool(user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取置顶笔记"""
-            return self._get_pinned_notes_tool()
+            return await self._get_pinned_notes_tool(user_id)
         
         @tool
-        def get_recent_notes_tool(days: int = 7, limit: int = 20) -> str:
+        async def get_recent_notes_tool(days: int = 7, limit: int = 20, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取最近笔记"""
-            return self._get_recent_notes_tool(days, limit)
+            return await self._get_recent_notes_tool(days, limit, user_id)
         
         @tool
         def refresh_note_list_tool() -> str:
@@ -120,22 +122,23 @@ class NoteTools:
                 "function": {
                     "name": tool.name,
                     "description": tool.description,
-                    "parameters": tool.args_schema.model_json_schema() if hasattr(tool, 'args_schema') else {}
+                    "parameters": tool.tool_call_schema.model_json_schema()
                 }
             }
             tool_defs.append(tool_def)
         
         return tool_defs
     
-    def _create_note_tool(
+    async def _create_note_tool(
         self,
         title: str,
         content: str,
         category: str = "PERSONAL",
         tags: Optional[List[str]] = None,
         is_pinned: bool = False,
-        is_archived: bool = False
-    ) -> str:
+        is_archived: bool = False,
+        user_id: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
         """创建新笔记"""
         try:
             # 转换分类枚举
@@ -153,19 +156,21 @@ class NoteTools:
                 is_archived=is_archived
             )
             
-            note = self.note_service.create_note(note_data, self.current_user_id)
+            async with get_db_session() as db:
+                note = await self.note_service.create_note(db, note_data, user_id)
             refresh_message = self._refresh_note_list_tool()
-            return f'笔记创建成功: "{note.title}" (ID: {note.id}, 字数: {note.word_count})\n{refresh_message}'
+            return mutation_result(f'笔记创建成功: "{note.title}" (ID: {note.id}, 字数: {note.word_count})\n{refresh_message}', True)
         except Exception as e:
             print(f"[DEBUG] 笔记创建失败: {e}")
             import traceback
             traceback.print_exc()
-            return f'笔记创建失败: {str(e)}'
+            return mutation_result(f'笔记创建失败: {str(e)}', False)
     
-    def _get_notes_tool(self) -> str:
+    async def _get_notes_tool(self, user_id: Optional[int] = None) -> str:
         """获取所有笔记"""
         try:
-            notes = self.note_service.get_all_notes(self.current_user_id)
+            async with get_db_session() as db:
+                notes = await self.note_service.get_all_notes(db, user_id)
             if not notes:
                 return '没有找到笔记。'
             
@@ -177,10 +182,11 @@ class NoteTools:
         except Exception as e:
             return f'获取笔记列表失败: {str(e)}'
     
-    def _get_note_tool(self, id: int) -> str:
+    async def _get_note_tool(self, id: int, user_id: Optional[int] = None) -> str:
         """获取指定笔记"""
         try:
-            note = self.note_service.get_note_by_id(id, self.current_user_id)
+            async with get_db_session() as db:
+                note = await self.note_service.get_note(db, id, user_id)
             if not note:
                 return f'未找到 ID 为 {id} 的笔记。'
             
@@ -188,7 +194,7 @@ class NoteTools:
         except Exception as e:
             return f'获取笔记失败: {str(e)}'
     
-    def _update_note_tool(
+    async def _update_note_tool(
         self,
         id: int,
         title: Optional[str] = None,
@@ -196,8 +202,9 @@ class NoteTools:
         category: Optional[str] = None,
         tags: Optional[List[str]] = None,
         is_pinned: Optional[bool] = None,
-        is_archived: Optional[bool] = None
-    ) -> str:
+        is_archived: Optional[bool] = None,
+        user_id: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
         """更新笔记"""
         try:
             update_data = {}
@@ -218,43 +225,46 @@ class NoteTools:
                 update_data['is_archived'] = is_archived
             
             if not update_data:
-                return '没有提供要更新的字段。'
+                return mutation_result('没有提供要更新的字段。', False)
             
             note_update = NoteUpdate(**update_data)
-            updated_note = self.note_service.update_note(id, note_update, self.current_user_id)
+            async with get_db_session() as db:
+                updated_note = await self.note_service.update_note(db, id, note_update, user_id)
             
             if not updated_note:
-                return f'更新笔记 {id} 失败。'
+                return mutation_result(f'更新笔记 {id} 失败。', False)
             
             refresh_message = self._refresh_note_list_tool()
-            return f'笔记 {updated_note.id} 更新成功: "{updated_note.title}"\n{refresh_message}'
+            return mutation_result(f'笔记 {updated_note.id} 更新成功: "{updated_note.title}"\n{refresh_message}', True)
         except Exception as e:
-            return f'更新笔记失败: {str(e)}'
+            return mutation_result(f'更新笔记失败: {str(e)}', False)
     
-    def _delete_note_tool(self, id: int) -> str:
+    async def _delete_note_tool(self, id: int, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
         """删除指定笔记"""
         try:
-            note = self.note_service.get_note_by_id(id, self.current_user_id)
-            if not note:
-                return f'未找到 ID 为 {id} 的笔记。'
-            
-            deleted = self.note_service.delete_note(id, self.current_user_id)
+            async with get_db_session() as db:
+                note = await self.note_service.get_note(db, id, user_id)
+                if not note:
+                    return mutation_result(f'未找到 ID 为 {id} 的笔记。', False)
+                
+                deleted = await self.note_service.delete_note(db, id, user_id)
             if not deleted:
-                return f'删除笔记 {id} 失败。'
+                return mutation_result(f'删除笔记 {id} 失败。', False)
             
             refresh_message = self._refresh_note_list_tool()
-            return f'笔记 {note.id} ("{note.title}") 删除成功。\n{refresh_message}'
+            return mutation_result(f'笔记 {note.id} ("{note.title}") 删除成功。\n{refresh_message}', True)
         except Exception as e:
-            return f'删除笔记失败: {str(e)}'
+            return mutation_result(f'删除笔记失败: {str(e)}', False)
     
-    def _search_notes_tool(
+    async def _search_notes_tool(
         self,
         query: Optional[str] = None,
         category: Optional[str] = None,
         tags: Optional[List[str]] = None,
         is_pinned: Optional[bool] = None,
         is_archived: Optional[bool] = None,
-        limit: int = 20
+        limit: int = 20,
+        user_id: Optional[int] = None
     ) -> str:
         """搜索笔记"""
         try:
@@ -265,15 +275,18 @@ class NoteTools:
                 except KeyError:
                     pass
             
-            notes = self.note_service.search_notes(
+            search_request = NoteSearchRequest(
                 query=query,
                 category=category_enum,
                 tags=tags,
                 is_pinned=is_pinned,
                 is_archived=is_archived,
-                user_id=self.current_user_id,
-                limit=limit
+                page=1,
+                page_size=max(1, min(limit, 100)),
+                sort_by="relevance" if query else "updated_at"
             )
+            async with get_db_session() as db:
+                notes = (await self.note_service.search_notes(db, search_request, user_id)).notes
             
             if not notes:
                 return '没有找到匹配的笔记。'
@@ -286,10 +299,11 @@ class NoteTools:
         except Exception as e:
             return f'搜索笔记失败: {str(e)}'
     
-    def _get_pinned_notes_tool(self) -> str:
+    async def _get_pinned_notes_tool(self, user_id: Optional[int] = None) -> str:
         """获取置顶笔记"""
         try:
-            notes = self.note_service.get_pinned_notes(self.current_user_id)
+            async with get_db_session() as db:
+                notes = await self.note_service.get_pinned_notes(db, user_id)
             if not notes:
                 return '没有置顶笔记。'
             
@@ -301,10 +315,11 @@ class NoteTools:
         except Exception as e:
             return f'获取置顶笔记失败: {str(e)}'
     
-    def _get_recent_notes_tool(self, days: int = 7, limit: int = 20) -> str:
+    async def _get_recent_notes_tool(self, days: int = 7, limit: int = 20, user_id: Optional[int] = None) -> str:
         """获取最近笔记"""
         try:
-            notes = self.note_service.get_recent_notes(days, limit, self.current_user_id)
+            async with get_db_session() as db:
+                notes = await self.note_service.get_recent_notes(db, user_id, days, limit)
             if not notes:
                 return f'最近 {days} 天没有创建笔记。'
             
@@ -3,8 +3,8 @@ Schedule子Agent模块
 包含日程管理相关的Graph和工具
 """
 
-from .graph import graph
+from .graph import build_graph
 from .tools import ScheduleTools
 
-__all__ = ["graph", "ScheduleTools"]
+__all__ = ["build_graph", "ScheduleTools"]
 
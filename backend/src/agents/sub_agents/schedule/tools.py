@@ -3,35 +3,35 @@
 """
 
 from langchain_core.tools import tool
-from typing import List, Any, Dict, Optional
+from langgraph.prebuilt import InjectedState
+from typing import Annotated, List, Any, Dict, Optional, Tuple
 from datetime import datetime, date
-from ....services.sync_schedule_service import SyncScheduleService
+from ....services.schedule_service import ScheduleService
+from ....database import get_db_session
 from ....models.schedule import ScheduleCreate, ScheduleUpdate
+from ..tool_outcome import mutation_result
 
 
 class ScheduleTools:
     """日程管理工具类"""
     
     def __init__(self):
-        self.schedule_service = SyncScheduleService()
-        self.current_user_id = None
-    
-    def set_user_id(self, user_id: int):
-        """设置当前用户ID"""
-        self.current_user_id = user_id
+        # 使用异步日程服务（共享AsyncSessionLocal连接池），数据库I/O不阻塞事件循环
+        self.schedule_service = ScheduleService()
     
     def get_tools(self):
         """获取所有工具"""
-        @tool
-        def create_schedule_tool(
+        @tool(response_format="content_and_artifact")
+        async def create_schedule_tool(
             title: str,
             start_time: str,
             end_time: str,
             description: str = None,
             is_all_day: bool = False,
             location: str = None,
-            color: str = "#1890ff"
-        ) -> str:
+            color: str = "#1890ff",
+            user_id: Annotated[Optional[int], InjectedState("user_id")] = None
+        ) -> Tuple[str, Dict[str, Any]]:
             """创建新日程
             
             Args:
@@ -52,20 +52,20 @@ class ScheduleTools:
             - 明天09:00: 2024-01-02T09:00:00+08:00
             - 今天14:00: 2024-01-01T14:00:00+08:00
             """
-            return self._create_schedule_tool(title, start_time, end_time, description, is_all_day, location, color)
+            return await self._create_schedule_tool(title, start_time, end_time, description, is_all_day, location, color, user_id)
         
         @tool
-        def get_schedules_tool() -> str:
+        async def get_schedules_tool(user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取所有日程"""
-            return self._get_schedules_tool()
+            return await self._get_schedules_tool(user_id)
         
         @tool
-        def get_schedule_tool(id: int) -> str:
+        async def get_schedule_tool(id: int, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取指定日程"""
-            return self._get_schedule_tool(id)
+            return await self._get_schedule_tool(id, user_id)
         
-        @tool
-        def update_schedule_tool(
+        @tool(response_format="content_and_artifact")
+        async def update_schedule_tool(
             id: int,
             title: str = None,
             start_time: str = None,
@@ -73,30 +73,31 @@ class ScheduleTools:
             description: str = None,
             is_all_day: bool = None,
             location: str = None,
-            color: str = None
-        ) -> str:
+            color: str = None,
+            user_id: Annotated[Optional[int], InjectedState("user_id")] = None
+        ) -> Tuple[str, Dict[str, Any]]:
             """更新日程"""
-            return self._update_schedule_tool(id, title, start_time, end_time, description, is_all_day, location, color)
+            return await self._update_schedule_tool(id, title, start_time, end_time, description, is_all_day, location, color, user_id)
         
-        @tool
-        def delete_schedule_tool(id: int) -> str:
+        @tool(response_format="content_and_artifact")
+        async def delete_schedule_tool(id: int, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
             """删除指定日程"""
-            return self._delete_schedule_tool(id)
+            return await self._delete_schedule_tool(id, user_id)
         
         @tool
-        def get_schedules_by_date_range_tool(start_date: str, end_date: str) -> str:
+        async def get_schedules_by_date_range_tool(start_date: str, end_date: str, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取指定日期范围内的日程
             
             Args:
                 start_date: 开始日期 (YYYY-MM-DD格式)
                 end_date: 结束日期 (YYYY-MM-DD格式)
             """
-            return self._get_schedules_by_date_range_tool(start_date, end_date)
+            return await self._get_schedules_by_date_range_tool(start_date, end_date, user_id)
         
         @tool
-        def get_upcoming_schedules_tool(limit: int = 10) -> str:
+        async def get_upcoming_schedules_tool(limit: int = 10, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
             """获取即将到来的日程"""
-            return self._get_upcoming_schedules_tool(limit)
+            return await self._get_upcoming_schedules_tool(limit, user_id)
         
         @tool
         def refresh_schedule_list_tool() -> str:
@@ -125,14 +126,14 @@ class ScheduleTools:
                 "function": {
                     "name": tool.name,
                     "description": tool.description,
-                    "parameters": tool.args_schema.model_json_schema() if hasattr(tool, 'args_schema') else {}
+                    "parameters": tool.tool_call_schema.model_json_schema()
                 }
             }
             tool_defs.append(tool_def)
         
         return tool_defs
     
-    def _create_schedule_tool(
+    async def _create_schedule_tool(
         self,
         title: str,
         start_time: str,
@@ -140,8 +141,9 @@ class ScheduleTools:
         description: Optional[str] = None,
         is_all_day: bool = False,
         location: Optional[str] = None,
-        color: str = "#1890ff"
-    ) -> str:
+        color: str = "#1890ff",
+        user_id: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
         """创建新日程"""
         try:
             # 解析时间字符串
@@ -158,19 +160,21 @@ class ScheduleTools:
                 color=color
             )
             
-            schedule = self.schedule_service.create_schedule(schedule_data, self.current_user_id)
+            async with get_db_session() as db:
+                schedule = await self.schedule_service.create_schedule(db, schedule_data, user_id)
             refresh_message = self._refresh_schedule_list_tool()
-            return f'日程创建成功: "{schedule.title}" (ID: {schedule.id}, 时间: {schedule.start_time} - {schedule.end_time})\n{refresh_message}'
+            return mutation_result(f'日程创建成功: "{schedule.title}" (ID: {schedule.id}, 时间: {schedule.start_time} - {schedule.end_time})\n{refresh_message}', True)
         except Exception as e:
             print(f"[DEBUG] 日程创建失败: {e}")
             import traceback
             traceback.print_exc()
-            return f'日程创建失败: {str(e)}'
+            return mutation_result(f'日程创建失败: {str(e)}', False)
     
-    def _get_schedules_tool(self) -> str:
+    async def _get_schedules_tool(self, user_id: Optional[int] = None) -> str:
         """获取所有日程"""
         try:
-            schedules = self.schedule_service.get_all_schedules(self.current_user_id)
+            async with get_db_session() as db:
+                schedules = await self.schedule_service.get_all_schedules(db, user_id)
             if not schedules:
                 return '没有找到日程。'
             
@@ -182,10 +186,11 @@ class ScheduleTools:
         except Exception as e:
             return f'获取日程列表失败: {str(e)}'
     
-    def _get_schedule_tool(self, id: int) -> str:
+    async def _get_schedule_tool(self, id: int, user_id: Optional[int] = None) -> str:
         """获取指定日程"""
         try:
-            schedule = self.schedule_service.get_schedule_by_id(id, self.current_user_id)
+            async with get_db_session() as db:
+                schedule = await self.schedule_service.get_schedule(db, id, user_id)
             if not schedule:
                 return f'未找到 ID 为 {id} 的日程。'
             
@@ -193,7 +198,7 @@ class ScheduleTools:
         except Exception as e:
             return f'获取日程失败: {str(e)}'
     
-    def _update_schedule_tool(
+    async def _update_schedule_tool(
         self,
         id: int,
         title: Optional[str] = None,
@@ -202,8 +207,9 @@ class ScheduleTools:
         description: Optional[str] = None,
         is_all_day: Optional[bool] = None,
         location: Optional[str] = None,
-        color: Optional[str] = None
-    ) -> str:
+        color: Optional[str] = None,
+        user_id: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
         """更新日程"""
         try:
             update_data = {}
@@ -223,42 +229,45 @@ class ScheduleTools:
                 update_data['color'] = color
             
             if not update_data:
-                return '没有提供要更新的字段。'
+                return mutation_result('没有提供要更新的字段。', False)
             
             schedule_update = ScheduleUpdate(**update_data)
-            updated_schedule = self.schedule_service.update_schedule(id, schedule_update, self.current_user_id)
+            async with get_db_session() as db:
+                updated_schedule = await self.schedule_service.update_schedule(db, id, user_id, schedule_update)
             
             if not updated_schedule:
-                return f'更新日程 {id} 失败。'
+                return mutation_result(f'更新日程 {id} 失败。', False)
             
             refresh_message = self._refresh_schedule_list_tool()
-            return f'日程 {updated_schedule.id} 更新成功: "{updated_schedule.title}"\n{refresh_message}'
+            return mutation_result(f'日程 {updated_schedule.id} 更新成功: "{updated_schedule.title}"\n{refresh_message}', True)
         except Exception as e:
-            return f'更新日程失败: {str(e)}'
+            return mutation_result(f'更新日程失败: {str(e)}', False)
     
-    def _delete_schedule_tool(self, id: int) -> str:
+    async def _delete_schedule_tool(self, id: int, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
         """删除指定日程"""
         try:
-            schedule = self.schedule_service.get_schedule_by_id(id, self.current_user_id)
-            if not schedule:
-                return f'未找到 ID 为 {id} 的日程。'
-            
-            deleted = self.schedule_service.delete_schedule(id, self.current_user_id)
+            async with get_db_session() as db:
+                schedule = await self.schedule_service.get_schedule(db, id, user_id)
+                if not schedule:
+                    return mutation_result(f'未找到 ID 为 {id} 的日程。', False)
+                
+                deleted = await self.schedule_service.delete_schedule(db, id, user_id)
             if not deleted:
-                return f'删除日程 {id} 失败。'
+                return mutation_result(f'删除日程 {id} 失败。', False)
             
             refresh_message = self._refresh_schedule_list_tool()
-            return f'日程 {schedule.id} ("{schedule.title}") 删除成功。\n{refresh_message}'
+            return mutation_result(f'日程 {schedule.id} ("{schedule.title}") 删除成功。\n{refresh_message}', True)
         except Exception as e:
-            return f'删除日程失败: {str(e)}'
+            return mutation_result(f'删除日程失败: {str(e)}', False)
     
-    def _get_schedules_by_date_range_tool(self, start_date: str, end_date: str) -> str:
+    async def _get_schedules_by_date_range_tool(self, start_date: str, end_date: str, user_id: Optional[int] = None) -> str:
         """获取指定日期范围内的日程"""
         try:
             start = date.fromisoformat(start_date)
             end = date.fromisoformat(end_date)
             
-            schedules = self.schedule_service.get_schedules_by_date_range(start, end, self.current_user_id)
+            async with get_db_session() as db:
+                schedules = await self.schedule_service.get_schedules_by_date_range(db, user_id, start, end)
             if not schedules:
                 return f'在 {start_date} 到 {end_date} 之间没有找到日程。'
             
@@ -270,10 +279,11 @@ class ScheduleTools:
         except Exception as e:
             return f'获取日程失败: {str(e)}'
     
-    def _get_upcoming_schedules_tool(self, limit: int = 10) -> str:
+    async def _get_upcoming_schedules_tool(self, limit: int = 10, user_id: Optional[int] = None) -> str:
         """获取即将到来的日程"""
         try:
-            schedules = self.schedule_service.get_upcoming_schedules(limit, self.current_user_id)
+            async with get_db_session() as db:
+                schedules = await self.schedule_service.get_upcoming_schedules(db, user_id, limit)
             if not schedules:
                 return '没有即将到来的日程。'
             
@@ -3,8 +3,8 @@ Task子Agent模块
 包含任务管理相关的Graph和工具
 """
 
-from .graph import graph
+from .graph import build_graph
 from .tools import TaskTools, FrontendTool, AnyArgsSchema
 
-__all__ = ["graph", "TaskTools", "FrontendTool", "AnyArgsSchema"]
+__all__ = ["build_graph", "TaskTools", "FrontendTool", "AnyArgsSchema"]
 
@@ -38,6 +38,9 @@ def get_task_agent_prompt(tool_definitions: List[Dict[str, Any]] = None) -> str:
 可用工具：
 {tools_list}
 
+涉及多个任务时（如"添加这几个任务"、"把所有买菜相关的任务标记为完成"、"删除已完成的任务"），
+使用 create_tasks_tool / update_tasks_tool / delete_tasks_tool 一次调用完成，不要逐个调用单任务工具。
+
 请专注于任务管理，使用合适的工具完成用户请求。"""
     
     if tool_definitions:
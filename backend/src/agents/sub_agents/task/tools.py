@@ -3,11 +3,17 @@ LangGraph Agent 工具定义
 包含所有任务管理相关的工具函数
 """
 
+import logging
+
 from langchain_core.tools import tool, BaseTool
 from langgraph.errors import NodeInterrupt
+from langgraph.prebuilt import InjectedState
 from pydantic import BaseModel
-from typing import List, Any, Dict
-from ....services.sync_task_service import SyncTaskService
+from typing import Annotated, List, Any, Dict, Optional, Tuple
+from ....services.task_service import TaskService, encode_task_cursor, decode_task_cursor
+from ..tool_outcome import mutation_result
+
+logger = logging.getLogger(__name__)
 
 
 class AnyArgsSchema(BaseModel):
@@ -37,15 +43,10 @@ class TaskTools:
     """任务管理工具类"""
     
     def __init__(self, task_service=None):
-        # 使用同步任务服务避免异步事件循环问题
-        self.task_service = SyncTaskService()
-        self.current_user_id = None  # 当前用户ID
+        # 使用异步任务服务（共享AsyncSessionLocal连接池），数据库I/O不阻塞事件循环
+        self.task_service = task_service or TaskService()
         self.frontend_tools_config = []  # 前端工具配置
     
-    def set_user_id(self, user_id: int):
-        """设置当前用户ID"""
-        self.current_user_id = user_id
-    
     def set_frontend_tools_config(self, config: List[Dict[str, Any]]):
         """设置前端工具配置"""
         self.frontend_tools_config = config
@@ -53,40 +54,60 @@ class TaskTools:
     def get_tools(self):
         """获取所有工具"""
         # 创建包装函数来避免 self 参数问题
-        @tool
-        def create_task_tool(title: str, isComplete: bool = False) -> str:
+        @tool(response_format="content_and_artifact")
+        async def create_task_tool(title: str, isComplete: bool = False, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
             """创建新任务"""
-            return self._create_task_tool(title, isComplete)
+            return await self._create_task_tool(title, isComplete, user_id)
         
         @tool
-        def get_tasks_tool() -> str:
-            """获取所有任务"""
-            return self._get_tasks_tool()
+        async def get_tasks_tool(isComplete: bool = None, titlePrefix: str = None, cursor: str = None, limit: int = 20, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
+            """获取任务列表（分页）：返回任务数量汇总和一页任务，可按完成状态isComplete、标题前缀titlePrefix筛选；还有更多任务时用返回的cursor获取下一页"""
+            return await self._get_tasks_tool(user_id, isComplete, titlePrefix, cursor, limit)
         
         @tool
-        def get_task_tool(id: int) -> str:
-            """获取指定任务"""
-            return self._get_task_tool(id)
+        async def search_tasks_tool(query: str, limit: int = 10, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
+            """按标题模糊搜索任务（按相似度排序），用于根据名称查找任务ID"""
+            return await self._search_tasks_tool(query, limit, user_id)
         
         @tool
-        def update_task_tool(id: int, title: str = None, isComplete: bool = None) -> str:
+        async def get_task_tool(id: int, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> str:
+            """获取指定任务"""
+            return await self._get_task_tool(id, user_id)
+        
+        @tool(response_format="content_and_artifact")
+        async def update_task_tool(id: int, title: str = None, isComplete: bool = None, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
             """更新任务"""
-            return self._update_task_tool(id, title, isComplete)
+            return await self._update_task_tool(id, title, isComplete, user_id)
         
-        @tool
-        def delete_task_tool(id: int) -> str:
+        @tool(response_format="content_and_artifact")
+        async def delete_task_tool(id: int, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
             """删除指定任务"""
-            return self._delete_task_tool(id)
+            return await self._delete_task_tool(id, user_id)
         
-        @tool
-        def delete_task_by_title_tool(title: str) -> str:
+        @tool(response_format="content_and_artifact")
+        async def create_tasks_tool(titles: List[str], isComplete: bool = False, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
+            """批量创建任务（一次调用创建多个任务，titles为任务标题列表）"""
+            return await self._create_tasks_tool(titles, isComplete, user_id)
+        
+        @tool(response_format="content_and_artifact")
+        async def update_tasks_tool(ids: List[int] = None, titleContains: str = None, currentIsComplete: bool = None, title: str = None, isComplete: bool = None, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
+            """批量更新任务：按任务ID列表（ids）或筛选条件（标题包含titleContains、当前完成状态currentIsComplete）选中任务，一次调用全部更新为新的title/isComplete"""
+            return await self._update_tasks_tool(ids, titleContains, currentIsComplete, title, isComplete, user_id)
+        
+        @tool(response_format="content_and_artifact")
+        async def delete_tasks_tool(ids: List[int] = None, titleContains: str = None, isComplete: bool = None, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
+            """批量删除任务：按任务ID列表（ids）或筛选条件（标题包含titleContains、完成状态isComplete）一次调用删除全部匹配的任务"""
+            return await self._delete_tasks_tool(ids, titleContains, isComplete, user_id)
+        
+        @tool(response_format="content_and_artifact")
+        async def delete_task_by_title_tool(title: str, user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
             """根据任务名称删除任务"""
-            return self._delete_task_by_title_tool(title)
+            return await self._delete_task_by_title_tool(title, user_id)
         
-        @tool
-        def delete_latest_task_tool() -> str:
+        @tool(response_format="content_and_artifact")
+        async def delete_latest_task_tool(user_id: Annotated[Optional[int], InjectedState("user_id")] = None) -> Tuple[str, Dict[str, Any]]:
             """删除最新的任务"""
-            return self._delete_latest_task_tool()
+            return await self._delete_latest_task_tool(user_id)
         
         # 后端工具（实际执行）
         @tool
@@ -103,9 +124,13 @@ class TaskTools:
         backend_tools = [
             create_task_tool,
             get_tasks_tool,
+            search_tasks_tool,
             get_task_tool,
             update_task_tool,
             delete_task_tool,
+            create_tasks_tool,
+            update_tasks_tool,
+            delete_tasks_tool,
             delete_task_by_title_tool,
             delete_latest_task_tool,
             navigate_to_page_tool,
@@ -160,14 +185,14 @@ class TaskTools:
                     "function": {
                         "name": tool.name,
                         "description": tool.description,
-                        "parameters": tool.args_schema.model_json_schema() if hasattr(tool, 'args_schema') else {}
+                        "parameters": tool.tool_call_schema.model_json_schema()
                     }
                 }
             tool_defs.append(tool_def)
         
         return tool_defs
     
-    def _create_task_tool(self, title: str, isComplete: bool = False) -> str:
+    async def _create_task_tool(self, title: str, isComplete: bool = False, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
         """创建新任务
         
         Args:
@@ -178,45 +203,88 @@ class TaskTools:
             任务创建结果信息
         """
         try:
-            print(f"[DEBUG] 开始创建任务: title={title}, isComplete={isComplete}, user_id={self.current_user_id}")
-            task = self.task_service.add_task(title, isComplete, self.current_user_id)
-            print(f"[DEBUG] 任务创建成功: {task.title} (ID: {task.id})")
+            logger.debug("开始创建任务: title=%s, isComplete=%s, user_id=%s", title, isComplete, user_id)
+            task = await self.task_service.add_task(title, isComplete, user_id)
+            logger.debug("任务创建成功: %s (ID: %s)", task.title, task.id)
             
             # 任务创建成功后，触发前端刷新
             refresh_message = self._refresh_task_list_tool()
-            return f'任务创建成功: "{task.title}" (ID: {task.id})\n{refresh_message}'
+            return mutation_result(f'任务创建成功: "{task.title}" (ID: {task.id})\n{refresh_message}', True)
         except Exception as e:
-            print(f"[DEBUG] 任务创建失败: {e}")
-            import traceback
-            traceback.print_exc()
-            return f'任务创建失败: {str(e)}'
+            logger.exception("任务创建失败: %s", e)
+            return mutation_result(f'任务创建失败: {str(e)}', False)
     
-    def _get_tasks_tool(self) -> str:
-        """获取所有任务
+    async def _get_tasks_tool(self, user_id: Optional[int] = None, isComplete: Optional[bool] = None,
+                              titlePrefix: Optional[str] = None, cursor: Optional[str] = None, limit: int = 20) -> str:
+        """获取任务列表（汇总 + 一页任务）
         
+        Args:
+            isComplete: 按完成状态筛选（可选）
+            titlePrefix: 按标题前缀筛选（可选）
+            cursor: 上一页返回的游标（可选）
+            limit: 每页数量，默认20，最多100
+            
         Returns:
-            任务列表信息
+            任务数量汇总和当前页的任务列表
         """
         try:
-            print(f"[DEBUG] 开始获取任务列表, user_id={self.current_user_id}")
-            tasks = self.task_service.get_all_tasks(self.current_user_id)
-            if not tasks:
-                print("[DEBUG] 没有找到任务")
+            limit = max(1, min(limit or 20, 100))
+            logger.debug("开始获取任务列表, user_id=%s, isComplete=%s, titlePrefix=%s, cursor=%s, limit=%s", user_id, isComplete, titlePrefix, cursor, limit)
+            cursor_id = decode_task_cursor(cursor) if cursor else None
+            
+            total, completed = await self.task_service.get_task_summary(user_id, isComplete, titlePrefix)
+            if not total:
+                logger.debug("没有找到任务")
                 return '没有找到任务。'
             
+            tasks, next_cursor = await self.task_service.get_tasks_page(
+                user_id, limit=limit, cursor=cursor_id, is_complete=isComplete, title_prefix=titlePrefix
+            )
+            summary = f'共 {total} 个任务（已完成 {completed}，未完成 {total - completed}）'
+            if not tasks:
+                return f'{summary}，没有更多任务了。'
+            
             task_list = '\n'.join([
                 f'- {t.id}: {t.title} ({"已完成" if t.isComplete else "未完成"})'
                 for t in tasks
             ])
-            print(f"[DEBUG] 找到 {len(tasks)} 个任务")
-            return f'找到 {len(tasks)} 个任务:\n{task_list}'
+            logger.debug("找到 %s 个任务，本页 %s 个", total, len(tasks))
+            if next_cursor is None and cursor_id is None:
+                return f'找到 {total} 个任务:\n{task_list}'
+            
+            result = f'{summary}，本页 {len(tasks)} 个:\n{task_list}'
+            if next_cursor is not None:
+                result += f'\n还有更多任务，如需查看请使用 cursor="{encode_task_cursor(next_cursor)}" 再次调用 get_tasks_tool'
+            return result
         except Exception as e:
-            print(f"[DEBUG] 获取任务列表失败: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("获取任务列表失败: %s", e)
             return f'获取任务列表失败: {str(e)}'
     
-    def _get_task_tool(self, id: int) -> str:
+    async def _search_tasks_tool(self, query: str, limit: int = 10, user_id: Optional[int] = None) -> str:
+        """按标题模糊搜索任务
+        
+        Args:
+            query: 搜索文本
+            limit: 最多返回数量，默认10
+            
+        Returns:
+            按相似度排序的任务列表
+        """
+        try:
+            tasks = await self.task_service.search_tasks(query, user_id, limit=max(1, min(limit or 10, 50)))
+            if not tasks:
+                return f'没有找到与 "{query}" 匹配的任务。'
+            
+            task_list = '\n'.join([
+                f'- {t.id}: {t.title} ({"已完成" if t.isComplete else "未完成"})'
+                for t in tasks
+            ])
+            return f'找到 {len(tasks)} 个与 "{query}" 匹配的任务（按相似度排序）:\n{task_list}'
+        except Exception as e:
+            logger.warning("搜索任务失败: %s", e)
+            return f'搜索任务失败: {str(e)}'
+    
+    async def _get_task_tool(self, id: int, user_id: Optional[int] = None) -> str:
         """获取指定任务
         
         Args:
@@ -226,7 +294,7 @@ class TaskTools:
             任务信息
         """
         try:
-            task = self.task_service.get_task_by_id(id)
+            task = await self.task_service.get_task_by_id(id, user_id)
             if not task:
                 return f'未找到 ID 为 {id} 的任务。'
             
@@ -235,7 +303,7 @@ class TaskTools:
         except Exception as e:
             return f'获取任务失败: {str(e)}'
     
-    def _update_task_tool(self, id: int, title: str = None, isComplete: bool = None) -> str:
+    async def _update_task_tool(self, id: int, title: str = None, isComplete: bool = None, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
         """更新任务
         
         Args:
@@ -247,10 +315,6 @@ class TaskTools:
             更新结果信息
         """
         try:
-            task = self.task_service.get_task_by_id(id)
-            if not task:
-                return f'未找到 ID 为 {id} 的任务。'
-            
             # 构建更新数据
             update_data = {}
             if title is not None:
@@ -259,18 +323,18 @@ class TaskTools:
                 update_data['is_complete'] = isComplete
             
             if not update_data:
-                return '没有提供要更新的字段。'
+                return mutation_result('没有提供要更新的字段。', False)
             
-            updated_task = self.task_service.update_task(id, **update_data)
+            updated_task = await self.task_service.update_task_item(id, user_id=user_id, **update_data)
             if not updated_task:
-                return f'更新任务 {id} 失败。'
+                return mutation_result(f'未找到 ID 为 {id} 的任务。', False)
             
             status = "已完成" if updated_task.isComplete else "未完成"
-            return f'任务 {updated_task.id} 更新成功: "{updated_task.title}" - {status}'
+            return mutation_result(f'任务 {updated_task.id} 更新成功: "{updated_task.title}" - {status}', True)
         except Exception as e:
-            return f'更新任务失败: {str(e)}'
+            return mutation_result(f'更新任务失败: {str(e)}', False)
     
-    def _delete_task_tool(self, id: int) -> str:
+    async def _delete_task_tool(self, id: int, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
         """删除指定任务
         
         Args:
@@ -280,19 +344,145 @@ class TaskTools:
             删除结果信息
         """
         try:
-            task = self.task_service.get_task_by_id(id)
+            task = await self.task_service.get_task_by_id(id, user_id)
             if not task:
-                return f'未找到 ID 为 {id} 的任务。'
+                return mutation_result(f'未找到 ID 为 {id} 的任务。', False)
             
-            deleted = self.task_service.delete_task(id)
+            deleted = await self.task_service.delete_task(id, user_id)
             if not deleted:
-                return f'删除任务 {id} 失败。'
+                return mutation_result(f'删除任务 {id} 失败。', False)
             
-            return f'任务 {task.id} ("{task.title}") 删除成功。'
+            return mutation_result(f'任务 {task.id} ("{task.title}") 删除成功。', True)
         except Exception as e:
-            return f'删除任务失败: {str(e)}'
+            return mutation_result(f'删除任务失败: {str(e)}', False)
+    
+    @staticmethod
+    def _format_task_lines(tasks) -> str:
+        """格式化任务列表（批量工具结果）"""
+        return '\n'.join(
+            f'- {t.id}: {t.title} ({"已完成" if t.isComplete else "未完成"})'
+            for t in tasks
+        )
     
-    def _delete_task_by_title_tool(self, title: str) -> str:
+    @staticmethod
+    def _describe_filter(ids: Optional[List[int]], title_contains: Optional[str], is_complete: Optional[bool]) -> str:
+        """描述批量操作的选择条件"""
+        parts = []
+        if ids is not None:
+            parts.append(f'ID {ids}')
+        if title_contains:
+            parts.append(f'标题包含 "{title_contains}"')
+        if is_complete is not None:
+            parts.append("已完成" if is_complete else "未完成")
+        return '、'.join(parts)
+    
+    async def _create_tasks_tool(self, titles: List[str], isComplete: bool = False, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+        """批量创建任务（单条多行INSERT）
+        
+        Args:
+            titles: 任务标题列表
+            isComplete: 任务是否完成，默认为 False
+            
+        Returns:
+            批量创建结果信息
+        """
+        try:
+            titles = [title.strip() for title in titles or [] if title and title.strip()]
+            if not titles:
+                return mutation_result('没有提供要创建的任务标题。', False)
+            
+            logger.debug("开始批量创建任务: %s 个, isComplete=%s, user_id=%s", len(titles), isComplete, user_id)
+            tasks = await self.task_service.add_tasks(titles, isComplete, user_id)
+            logger.debug("批量创建任务成功: %s", [task.id for task in tasks])
+            
+            refresh_message = self._refresh_task_list_tool()
+            return mutation_result(f'成功创建 {len(tasks)} 个任务:\n{self._format_task_lines(tasks)}\n{refresh_message}', True)
+        except Exception as e:
+            logger.exception("批量创建任务失败: %s", e)
+            return mutation_result(f'批量创建任务失败: {str(e)}', False)
+    
+    async def _update_tasks_tool(self, ids: Optional[List[int]] = None, titleContains: Optional[str] = None,
+                                 currentIsComplete: Optional[bool] = None, title: Optional[str] = None,
+                                 isComplete: Optional[bool] = None, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+        """批量更新任务（单条UPDATE ... RETURNING）
+        
+        Args:
+            ids: 任务ID列表（可选）
+            titleContains: 标题包含的文本（可选）
+            currentIsComplete: 当前完成状态（可选）
+            title: 新的任务标题（可选）
+            isComplete: 新的完成状态（可选）
+            
+        Returns:
+            批量更新结果信息
+        """
+        try:
+            if title is None and isComplete is None:
+                return mutation_result('没有提供要更新的字段。', False)
+            condition = self._describe_filter(ids, titleContains, currentIsComplete)
+            if not condition:
+                return mutation_result('请提供任务ID列表或筛选条件。', False)
+            if user_id is None and ids is None:
+                # 未登录时不按条件批量修改（匿名任务不区分用户），只允许按ID操作
+                return mutation_result('未登录时无法按条件批量更新任务，请提供任务ID列表或先登录。', False)
+            
+            logger.debug("开始批量更新任务: 条件=%s, title=%s, isComplete=%s, user_id=%s", condition, title, isComplete, user_id)
+            tasks = await self.task_service.update_tasks(
+                task_ids=ids,
+                title_contains=titleContains,
+                is_complete_filter=currentIsComplete,
+                title=title,
+                is_complete=isComplete,
+                user_id=user_id,
+            )
+            logger.debug("批量更新任务完成: %s 个", len(tasks))
+            if not tasks:
+                return mutation_result(f'没有找到符合条件（{condition}）的任务。', False)
+            
+            refresh_message = self._refresh_task_list_tool()
+            return mutation_result(f'成功更新 {len(tasks)} 个任务:\n{self._format_task_lines(tasks)}\n{refresh_message}', True)
+        except Exception as e:
+            logger.exception("批量更新任务失败: %s", e)
+            return mutation_result(f'批量更新任务失败: {str(e)}', False)
+    
+    async def _delete_tasks_tool(self, ids: Optional[List[int]] = None, titleContains: Optional[str] = None,
+                                 isComplete: Optional[bool] = None, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+        """批量删除任务（单条DELETE ... RETURNING）
+        
+        Args:
+            ids: 任务ID列表（可选）
+            titleContains: 标题包含的文本（可选）
+            isComplete: 完成状态（可选）
+            
+        Returns:
+            批量删除结果信息
+        """
+        try:
+            condition = self._describe_filter(ids, titleContains, isComplete)
+            if not condition:
+                return mutation_result('请提供任务ID列表或筛选条件。', False)
+            if user_id is None and ids is None:
+                # 未登录时不按条件批量修改（匿名任务不区分用户），只允许按ID操作
+                return mutation_result('未登录时无法按条件批量删除任务，请提供任务ID列表或先登录。', False)
+            
+            logger.debug("开始批量删除任务: 条件=%s, user_id=%s", condition, user_id)
+            tasks = await self.task_service.delete_tasks(
+                task_ids=ids,
+                title_contains=titleContains,
+                is_complete=isComplete,
+                user_id=user_id,
+            )
+            logger.debug("批量删除任务完成: %s 个", len(tasks))
+            if not tasks:
+                return mutation_result(f'没有找到符合条件（{condition}）的任务。', False)
+            
+            refresh_message = self._refresh_task_list_tool()
+            return mutation_result(f'成功删除 {len(tasks)} 个任务:\n{self._format_task_lines(tasks)}\n{refresh_message}', True)
+        except Exception as e:
+            logger.exception("批量删除任务失败: %s", e)
+            return mutation_result(f'批量删除任务失败: {str(e)}', False)
+    
+    async def _delete_task_by_title_tool(self, title: str, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
         """根据任务名称删除任务
         
         Args:
@@ -302,53 +492,49 @@ class TaskTools:
             删除结果信息
         """
         try:
-            print(f"[DEBUG] 开始根据名称删除任务: title={title}, user_id={self.current_user_id}")
+            logger.debug("开始根据名称删除任务: title=%s, user_id=%s", title, user_id)
             
             # 首先查找任务
-            task = self.task_service.get_task_by_title(title, self.current_user_id)
+            task = await self.task_service.find_task_by_title(title, user_id)
             if not task:
-                print(f"[DEBUG] 未找到名称为 '{title}' 的任务")
-                return f'未找到名称为 "{title}" 的任务。'
+                logger.debug("未找到名称为 '%s' 的任务", title)
+                return mutation_result(f'未找到名称为 "{title}" 的任务。', False)
             
-            # 删除任务
-            deleted = self.task_service.delete_task_by_title(title, self.current_user_id)
+            # 按找到的任务ID删除（只删除匹配到的这一个任务）
+            deleted = await self.task_service.delete_task(task.id, user_id)
             if not deleted:
-                print(f"[DEBUG] 删除任务失败")
-                return f'删除任务 "{title}" 失败。'
+                logger.warning("删除任务失败")
+                return mutation_result(f'删除任务 "{task.title}" 失败。', False)
             
-            print(f"[DEBUG] 任务删除成功: {title}")
+            logger.debug("任务删除成功: ID=%s, title=%s", task.id, task.title)
             
             # 任务删除成功后，触发前端刷新
             refresh_message = self._refresh_task_list_tool()
-            return f'任务 "{title}" 删除成功。\n{refresh_message}'
+            return mutation_result(f'任务 "{task.title}" 删除成功。\n{refresh_message}', True)
             
         except Exception as e:
-            print(f"[DEBUG] 根据名称删除任务失败: {e}")
-            import traceback
-            traceback.print_exc()
-            return f'删除任务失败: {str(e)}'
+            logger.exception("根据名称删除任务失败: %s", e)
+            return mutation_result(f'删除任务失败: {str(e)}', False)
     
-    def _delete_latest_task_tool(self) -> str:
+    async def _delete_latest_task_tool(self, user_id: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
         """删除最新的任务
         
         Returns:
             删除结果信息
         """
         try:
-            tasks = self.task_service.get_all_tasks(self.current_user_id)
-            if not tasks:
-                return '没有任务可以删除。'
-            
             # 获取最新的任务（假设ID最大的为最新）
-            latest_task = max(tasks, key=lambda t: t.id)
+            latest_task = await self.task_service.get_latest_task(user_id)
+            if not latest_task:
+                return mutation_result('没有任务可以删除。', False)
             
-            deleted = self.task_service.delete_task(latest_task.id, self.current_user_id)
+            deleted = await self.task_service.delete_task(latest_task.id, user_id)
             if not deleted:
-                return f'删除任务失败。'
+                return mutation_result(f'删除任务失败。', False)
             
-            return f'任务 {latest_task.id} ("{latest_task.title}") 删除成功。'
+            return mutation_result(f'任务 {latest_task.id} ("{latest_task.title}") 删除成功。', True)
         except Exception as e:
-            return f'删除最新任务失败: {str(e)}'
+            return mutation_result(f'删除最新任务失败: {str(e)}', False)
     
     def _navigate_to_page_tool(self, page_key: str) -> str:
         """导航到指定页面
@@ -372,13 +558,13 @@ class TaskTools:
                 return f'未知的页面标识符: {page_key}。支持的页面: {", ".join(page_mapping.keys())}'
             
             page_name = page_mapping[page_key]
-            print(f"[DEBUG] 页面跳转指令: {page_key} -> {page_name}")
+            logger.debug("页面跳转指令: %s -> %s", page_key, page_name)
             
             # 返回包含特殊标识的响应，前端会解析这个标识来触发页面跳转
             return f'navigate_to_{page_key} 正在为您打开{page_name}页面...'
             
         except Exception as e:
-            print(f"[DEBUG] 页面跳转失败: {e}")
+            logger.warning("页面跳转失败: %s", e)
             return f'页面跳转失败: {str(e)}'
     
     def _refresh_task_list_tool(self) -> str:
@@ -388,12 +574,12 @@ class TaskTools:
             刷新结果信息
         """
         try:
-            print("[DEBUG] 触发前端任务列表刷新")
+            logger.debug("触发前端任务列表刷新")
             
             # 返回包含特殊标识的响应，前端会解析这个标识来触发任务列表刷新
             return 'frontend_tool_call:refresh_task_list 正在为您刷新任务列表...'
             
         except Exception as e:
-            print(f"[DEBUG] 前端刷新失败: {e}")
+            logger.warning("前端刷新失败: %s", e)
             return f'前端刷新失败: {str(e)}'
 
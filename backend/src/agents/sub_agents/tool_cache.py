@@ -0,0 +1,72 @@
+"""
+子Agent工具缓存
+工具列表、工具定义（JSON schema）、系统提示词、绑定工具后的模型和ToolNode
+按 (子agent, 前端工具配置) 签名构建一次并复用，只有前端工具配置或LLM实例变化时才重建
+"""
+
+import json
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+from langgraph.prebuilt import ToolNode
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledAgentTools(NamedTuple):
+    """子agent一次构建、多次复用的工具相关对象"""
+    tools: List[Any]  # 工具列表（后端工具 + 前端工具）
+    tool_definitions: List[Dict[str, Any]]  # 工具定义（用于模型绑定和提示词）
+    system_prompt: str  # 渲染后的系统提示词
+    model_with_tools: Any  # 绑定工具后的模型
+    tool_node: ToolNode  # 执行工具的ToolNode
+
+
+def frontend_config_signature(frontend_tools_config: Optional[List[Dict[str, Any]]]) -> str:
+    """计算前端工具配置的签名"""
+    return json.dumps(frontend_tools_config or [], sort_keys=True, ensure_ascii=False, default=str)
+
+
+class AgentToolCache:
+    """子agent工具缓存
+
+    Args:
+        agent_name: 子agent名称（用于日志）
+        agent_tools: 工具类实例（TaskTools / ScheduleTools / NoteTools）
+        prompt_builder: 根据工具定义生成系统提示词的函数
+    """
+
+    def __init__(self, agent_name: str, agent_tools: Any, prompt_builder: Callable[[List[Dict[str, Any]]], str]):
+        self.agent_name = agent_name
+        self.agent_tools = agent_tools
+        self.prompt_builder = prompt_builder
+        self._key: Optional[Tuple[str, int]] = None
+        self._compiled: Optional[CompiledAgentTools] = None
+        self.builds = 0
+
+    def get(self, llm: Any) -> CompiledAgentTools:
+        """获取缓存的工具对象，签名变化时重建"""
+        # 只有TaskTools支持前端工具配置，其它子agent的签名恒定
+        frontend_tools_config = getattr(self.agent_tools, "frontend_tools_config", None)
+        key = (frontend_config_signature(frontend_tools_config), id(llm))
+        if self._compiled is None or key != self._key:
+            self._compiled = self._build(llm)
+            self._key = key
+        return self._compiled
+
+    def invalidate(self) -> None:
+        """清空缓存，下次调用时重建"""
+        self._key = None
+        self._compiled = None
+
+    def _build(self, llm: Any) -> CompiledAgentTools:
+        tools = self.agent_tools.get_tools()
+        tool_definitions = self.agent_tools.get_tool_definitions()
+        self.builds += 1
+        logger.debug("%s 子Agent: 构建工具缓存（第%s次），共%s个工具", self.agent_name, self.builds, len(tools))
+        return CompiledAgentTools(
+            tools=tools,
+            tool_definitions=tool_definitions,
+            system_prompt=self.prompt_builder(tool_definitions),
+            model_with_tools=llm.bind_tools(tool_definitions),
+            tool_node=ToolNode(tools)
+        )
@@ -0,0 +1,27 @@
+"""
+增删改工具的结构化执行结果
+
+增删改工具以 response_format="content_and_artifact" 返回 (文本, artifact)：文本照常给模型，
+artifact 记录这是一次增删改以及是否实际修改成功，supervisor 的模板化汇总据此判断，
+不再在工具输出里匹配"失败"等关键词（未找到、没有提供字段等没有实际修改的结果也记为不成功）
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+
+def mutation_result(content: str, success: bool) -> Tuple[str, Dict[str, Any]]:
+    """增删改工具的返回值
+
+    Args:
+        content: 返回给模型的文本
+        success: 是否实际完成了修改
+    """
+    return content, {"mutation": True, "success": success}
+
+
+def mutation_outcome(message: Any) -> Optional[bool]:
+    """读取ToolMessage的增删改结果；不是增删改工具或没有结构化结果时返回None"""
+    artifact = getattr(message, "artifact", None)
+    if isinstance(artifact, dict) and artifact.get("mutation"):
+        return bool(artifact.get("success"))
+    return None
@@ -3,12 +3,12 @@ Supervisor模块
 包含Supervisor Graph、State和Prompt
 """
 
-from .graph import graph
+from .graph import build_graph
 from .state import SupervisorState, ExecutionPlan, ExecutionStep, ExecutionResult
 from .prompt import get_supervisor_prompt
 
 __all__ = [
-    "graph",
+    "build_graph",
     "SupervisorState",
     "ExecutionPlan",
     "ExecutionStep",
@@ -3,24 +3,49 @@ Supervisor Graph
 构建完整的supervisor工作流
 """
 
+import asyncio
 import json
+import logging
 import re
-from typing import Dict, Any
+import os
+from typing import Dict, Any, List, Optional, Set
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.constants import TAG_NOSTREAM
 from langgraph.graph import StateGraph, END
 from .state import SupervisorState, ExecutionPlan, ExecutionStep, ExecutionResult
-from .prompt import get_plan_node_prompt, get_aggregate_node_prompt, get_intent_classify_prompt
-from ..sub_agents.task.graph import graph as task_graph
-from ..sub_agents.schedule.graph import graph as schedule_graph
-from ..sub_agents.note.graph import graph as note_graph
+from .prompt import (
+    get_plan_node_prompt, get_aggregate_node_prompt, get_intent_classify_prompt,
+    get_fused_plan_node_prompt, get_response_template
+)
+from . import intent_classifier
+from .plan_cache import plan_cache
+from ..sub_agents.task.graph import build_graph as build_task_graph
+from ..sub_agents.schedule.graph import build_graph as build_schedule_graph
+from ..sub_agents.note.graph import build_graph as build_note_graph
 from ..llmconf import get_llm
-from ..dbconf import get_postgres_connection_string, get_postgres_store, get_postgres_checkpointer
+from ..sub_agents.tool_outcome import mutation_outcome
+
+logger = logging.getLogger(__name__)
 
 
 # 全局变量存储supervisor相关实例
 _llm = None
-_checkpointer = None
 _store = None
+# 按角色分配的LLM（intent / plan / response），未分配的角色使用 _llm
+_role_llms: Dict[str, Any] = {}
+# 子agent graph映射（build_graph时填充）
+_sub_agent_graphs: Dict[str, Any] = {}
+
+# 规划模式：separate（意图分类 + 规划两次LLM调用）/ fused（单次LLM调用同时返回意图和计划）
+SUPERVISOR_PLAN_MODE = os.getenv("SUPERVISOR_PLAN_MODE", "separate").lower()
+
+# 模板化汇总：单步骤或全部成功的增删改计划直接用工具输出渲染最终响应，跳过汇总LLM调用
+AGGREGATE_TEMPLATE_ENABLED = os.getenv("AGGREGATE_TEMPLATE_ENABLED", "true").lower() == "true"
+
+# 可以模板化汇总的增删改操作
+_CRUD_ACTIONS = {"create", "update", "delete"}
+
 
 
 def _extract_user_message(state: SupervisorState) -> str:
@@ -28,28 +53,39 @@ def _extract_user_message(state: SupervisorState) -> str:
     if state.get("messages"):
         for msg in state["messages"]:
             if hasattr(msg, 'content') and isinstance(msg, HumanMessage):
-                return msg.content
+                content = msg.content
+                # 聊天接口传入的是内容块列表（文本/图片），只取文本部分
+                if isinstance(content, list):
+                    content = " ".join(
+                        block.get("text", "") if isinstance(block, dict) else str(block)
+                        for block in content
+                        if not isinstance(block, dict) or block.get("type") == "text"
+                    )
+                return content
     return state.get("agent_context", {}).get("user_message", "")
 
 
-async def _intent_classify_node(state: SupervisorState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    """意图分类节点 - 判断用户请求是否需要调用业务数据"""
-    if config is None:
-        config = {}
-    if _llm is None:
-        raise RuntimeError("LLM not initialized.")
-    
-    # 获取用户消息
-    user_message = _extract_user_message(state)
-    
-    # 确保 user_message 是字符串类型
-    if not user_message or not isinstance(user_message, str):
-        # 如果没有用户消息，默认需要业务数据（保守策略）
-        return {
-            "needs_business_data": True,
-            "is_planning": True
-        }
-    
+def _get_llm(role: str) -> Any:
+    """获取指定角色的LLM"""
+    return _role_llms.get(role) or _llm
+
+
+async def _stream_llm_response(role: str, messages: List[Any], config: Dict[str, Any] = None) -> AIMessage:
+    """流式调用LLM生成最终响应
+
+    以流式方式调用，token经 stream_mode="messages" 实时推送给客户端；
+    返回的消息沿用流式消息的id，graph输出该消息时不会被重复推送
+    """
+    response = None
+    async for chunk in _get_llm(role).astream(messages, config):
+        response = chunk if response is None else response + chunk
+    if response is None:
+        return AIMessage(content="")
+    return AIMessage(content=response.content, id=response.id)
+
+
+def _local_intent(user_message: str) -> Optional[bool]:
+    """本地意图判断（硬编码规则 + 快速分类器），无法确定时返回None"""
     # 第一层：硬编码规则 - 检查常见的简单问候和对话
     # 这些情况明确不需要业务数据
     user_message_lower = user_message.lower().strip()
@@ -66,20 +102,14 @@ async def _intent_classify_node(state: SupervisorState, config: Dict[str, Any] =
     
     # 检查是否是简单问候（完全匹配）
     if user_message_lower in simple_greetings:
-        print(f"[DEBUG] 意图分类：检测到简单问候 '{user_message}'，直接返回不需要业务数据")
-        return {
-            "needs_business_data": False,
-            "is_planning": False
-        }
+        logger.debug("意图分类：检测到简单问候 '%s'，直接返回不需要业务数据", user_message)
+        return False
     
     # 检查是否只包含问候词（去除标点、空格和表情符号后）
     message_clean = re.sub(r'[^\w\u4e00-\u9fff]', '', user_message_lower)
     if message_clean in simple_greetings:
-        print(f"[DEBUG] 意图分类：检测到简单问候（清理后）'{message_clean}'，直接返回不需要业务数据")
-        return {
-            "needs_business_data": False,
-            "is_planning": False
-        }
+        logger.debug("意图分类：检测到简单问候（清理后）'%s'，直接返回不需要业务数据", message_clean)
+        return False
     
     # 额外检查：如果消息很短（<=5个字符）且只包含问候相关的词，也认为是简单问候
     if len(user_message.strip()) <= 5:
@@ -89,13 +119,86 @@ async def _intent_classify_node(state: SupervisorState, config: Dict[str, Any] =
             # 确保不包含业务关键词
             business_keywords = ["任务", "日程", "笔记", "task", "schedule", "note", "添加", "创建", "查看", "删除", "更新"]
             if not any(keyword in user_message for keyword in business_keywords):
-                print(f"[DEBUG] 意图分类：检测到短消息且包含问候词 '{user_message}'，直接返回不需要业务数据")
-                return {
-                    "needs_business_data": False,
-                    "is_planning": False
-                }
+                logger.debug("意图分类：检测到短消息且包含问候词 '%s'，直接返回不需要业务数据", user_message)
+                return False
     
-    # 第二层：使用LLM判断（对于不明确的请求）
+    # 第二层：本地快速分类器（规则自动机 + n-gram线性模型），置信度足够时跳过LLM
+    prediction = intent_classifier.fast_classify(user_message)
+    if prediction is not None:
+        logger.debug("意图分类：快速路径命中 '%s' -> needs_business_data=%s (source=%s, confidence=%.2f)",
+                     user_message, prediction.needs_business_data, prediction.source, prediction.confidence)
+        return prediction.needs_business_data
+    
+    return None
+
+
+def _extract_json(text: str) -> Dict[str, Any]:
+    """从LLM响应中提取JSON对象（兼容```json代码块）"""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0].strip()
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0].strip()
+    return json.loads(text)
+
+
+def _build_plan(plan_dict: Dict[str, Any]) -> ExecutionPlan:
+    """根据LLM返回的字典构建执行计划"""
+    return {
+        "summary": plan_dict.get("summary", ""),
+        "steps": plan_dict.get("steps", [])
+    }
+
+
+def _default_plan() -> ExecutionPlan:
+    """计划解析失败时使用的默认计划"""
+    return {
+        "summary": "无法解析计划，使用默认处理",
+        "steps": [{
+            "agent": "task",
+            "action": "query",
+            "params": {},
+            "description": "处理用户请求"
+        }]
+    }
+
+
+def _get_plan_mode(config: Dict[str, Any] = None) -> str:
+    """获取规划模式：separate（意图分类与规划分两次调用）或 fused（单次调用）
+
+    优先使用运行时配置 configurable.plan_mode，便于按请求做A/B对比
+    """
+    configurable = (config or {}).get("configurable", {}) or {}
+    mode = configurable.get("plan_mode") or SUPERVISOR_PLAN_MODE
+    return "fused" if mode == "fused" else "separate"
+
+
+async def _intent_classify_node(state: SupervisorState, config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """意图分类节点 - 判断用户请求是否需要调用业务数据"""
+    if config is None:
+        config = {}
+    if _llm is None:
+        raise RuntimeError("LLM not initialized.")
+    
+    # 获取用户消息
+    user_message = _extract_user_message(state)
+    
+    # 确保 user_message 是字符串类型
+    if not user_message or not isinstance(user_message, str):
+        # 如果没有用户消息，默认需要业务数据（保守策略）
+        return {
+            "needs_business_data": True,
+            "is_planning": True
+        }
+    
+    # 第一、二层：硬编码规则与本地快速分类器
+    local_intent = _local_intent(user_message)
+    if local_intent is not None:
+        return {
+            "needs_business_data": local_intent,
+            "is_planning": local_intent
+        }
+    
+    # 第三层：使用LLM判断（对于不明确的请求）
     system_prompt = get_intent_classify_prompt()
     
     # 调用LLM判断意图
@@ -104,21 +207,15 @@ async def _intent_classify_node(state: SupervisorState, config: Dict[str, Any] =
         HumanMessage(content=f"用户请求：{user_message}\n\n请判断是否需要调用业务数据（只返回JSON）：")
     ]
     
-    response = await _llm.ainvoke(messages)
+    response = await _get_llm("intent").ainvoke(messages)
     intent_text = response.content if hasattr(response, 'content') else str(response)
     
     # 解析判断结果
     try:
-        # 尝试提取JSON
-        if "```json" in intent_text:
-            intent_text = intent_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in intent_text:
-            intent_text = intent_text.split("```")[1].split("```")[0].strip()
-        
-        intent_dict = json.loads(intent_text)
+        intent_dict = _extract_json(intent_text)
         needs_business_data = intent_dict.get("needs_business_data", False)  # 默认为False，保守策略（避免误判）
         
-        print(f"[DEBUG] 意图分类：LLM判断结果 - needs_business_data={needs_business_data}, reason={intent_dict.get('reason', 'N/A')}")
+        logger.debug("意图分类：LLM判断结果 - needs_business_data=%s, reason=%s", needs_business_data, intent_dict.get('reason', 'N/A'))
         
         # 额外检查：如果LLM判断为true，但消息很短且不包含明确的业务关键词，强制设为false
         if needs_business_data and len(user_message.strip()) < 10:
@@ -127,12 +224,12 @@ async def _intent_classify_node(state: SupervisorState, config: Dict[str, Any] =
             has_business_keyword = any(keyword in user_message for keyword in business_keywords)
             
             if not has_business_keyword:
-                print(f"[DEBUG] 意图分类：消息过短且无业务关键词，强制设为不需要业务数据")
+                logger.debug("意图分类：消息过短且无业务关键词，强制设为不需要业务数据")
                 needs_business_data = False
         
     except Exception as e:
         # 如果解析失败，使用保守策略：默认不需要业务数据（避免误判）
-        print(f"[WARNING] 意图分类解析失败: {e}, 使用默认策略（不需要业务数据）")
+        logger.warning("意图分类解析失败: %s, 使用默认策略（不需要业务数据）", e)
         needs_business_data = False
     
     return {
@@ -185,7 +282,7 @@ async def _simple_response_node(state: SupervisorState, config: Dict[str, Any] =
     # 检查是否是硬编码的问候（完全匹配）
     if user_message_lower in greeting_responses:
         reply = greeting_responses[user_message_lower]
-        print(f"[DEBUG] Simple Response: 使用硬编码回复 '{user_message}' -> '{reply}'")
+        logger.debug("Simple Response: 使用硬编码回复 '%s' -> '%s'", user_message, reply)
         return {
             "messages": [AIMessage(content=reply)],
             "should_continue": False
@@ -196,7 +293,7 @@ async def _simple_response_node(state: SupervisorState, config: Dict[str, Any] =
     message_clean = re.sub(r'[^\w\u4e00-\u9fff]', '', user_message_lower)
     if message_clean in greeting_responses:
         reply = greeting_responses[message_clean]
-        print(f"[DEBUG] Simple Response: 使用硬编码回复（清理后）'{message_clean}' -> '{reply}'")
+        logger.debug("Simple Response: 使用硬编码回复（清理后）'%s' -> '%s'", message_clean, reply)
         return {
             "messages": [AIMessage(content=reply)],
             "should_continue": False
@@ -228,12 +325,14 @@ async def _simple_response_node(state: SupervisorState, config: Dict[str, Any] =
         HumanMessage(content=f"用户消息：{user_message}\n\n请生成友好的回复（只回复文字，不执行任何操作，不要说已经做了什么）：")
     ]
     
-    response = await _llm.ainvoke(messages)
-    reply = response.content if hasattr(response, 'content') else str(response)
+    # 不流式输出：回复只有1-2句，需要先经过下面的安全检查再发给客户端
+    # （nostream标签让LangGraph不推送token，节点返回的完整消息整条发送）
+    response = await _get_llm("response").with_config(tags=[TAG_NOSTREAM]).ainvoke(messages, config)
+    reply = response.content if isinstance(response.content, str) else str(response.content)
     
     # 额外检查：如果回复中包含"创建了任务"等字样，替换为安全回复
     if any(keyword in reply for keyword in ["创建了任务", "已创建任务", "帮你创建", "创建任务"]):
-        print(f"[WARNING] Simple Response: 检测到回复中包含创建任务字样，替换为安全回复")
+        logger.warning("Simple Response: 检测到回复中包含创建任务字样，替换为安全回复")
         reply = "你好！我可以帮你管理任务、安排日程、记录笔记等。你可以告诉我你想做什么。"
     
     return {
@@ -251,54 +350,113 @@ async def _plan_node(state: SupervisorState, config: Dict[str, Any] = None) -> D
     
     system_prompt = get_plan_node_prompt()
     
-    # 获取用户消息
-    user_message = ""
-    if state.get("messages"):
-        for msg in state["messages"]:
-            if hasattr(msg, 'content') and isinstance(msg, HumanMessage):
-                user_message = msg.content
-                break
+    # 获取用户消息（没有用户消息时从状态中获取）
+    user_message = _extract_user_message(state)
     
-    if not user_message:
-        # 如果没有用户消息，从状态中获取
-        user_message = state.get("agent_context", {}).get("user_message", "")
+    # 相同请求（提示词版本也相同）直接复用缓存的计划
+    plan = plan_cache.get(user_message, system_prompt)
+    if plan is not None:
+        logger.debug("规划：计划缓存命中 '%s'，跳过LLM调用", user_message)
+    else:
+        # 调用LLM生成计划
+        messages = [
+            SystemMessage(content=system_prompt),
+            HumanMessage(content=f"用户请求：{user_message}\n\n请生成执行计划（只返回JSON）：")
+        ]
+        
+        response = await _get_llm("plan").ainvoke(messages)
+        plan_text = response.content if hasattr(response, 'content') else str(response)
+        
+        # 解析计划
+        try:
+            plan = _build_plan(_extract_json(plan_text))
+            plan_cache.put(user_message, system_prompt, plan)
+        except Exception as e:
+            # 如果解析失败，创建默认计划
+            logger.warning("计划解析失败: %s, 使用默认计划", e)
+            plan = _default_plan()
+    
+    return {
+        "plan": plan,
+        "current_step": 0,
+        "is_planning": False,
+        "is_executing": True,
+        "execution_results": []
+    }
+
+
+async def _fused_plan_node(state: SupervisorState, config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """融合规划节点 - 一次LLM调用同时完成意图分类和执行计划（fused模式）"""
+    if config is None:
+        config = {}
+    if _llm is None:
+        raise RuntimeError("LLM not initialized.")
+    
+    user_message = _extract_user_message(state)
+    if not user_message or not isinstance(user_message, str):
+        # 与separate模式一致：没有用户消息时默认需要业务数据（保守策略），使用默认计划
+        return {
+            "needs_business_data": True,
+            "plan": _default_plan(),
+            "current_step": 0,
+            "is_planning": False,
+            "is_executing": True,
+            "execution_results": []
+        }
+    
+    # 本地规则已确定不需要业务数据时，无需调用LLM
+    local_intent = _local_intent(user_message)
+    if local_intent is False:
+        return {
+            "needs_business_data": False,
+            "is_planning": False
+        }
+    
+    # 缓存中只保存业务请求的计划，命中即说明需要业务数据
+    system_prompt = get_fused_plan_node_prompt()
+    cached_plan = plan_cache.get(user_message, system_prompt)
+    if cached_plan is not None:
+        logger.debug("融合规划：计划缓存命中 '%s'，跳过LLM调用", user_message)
+        return {
+            "needs_business_data": True,
+            "plan": cached_plan,
+            "current_step": 0,
+            "is_planning": False,
+            "is_executing": True,
+            "execution_results": []
+        }
     
-    # 调用LLM生成计划
     messages = [
         SystemMessage(content=system_prompt),
-        HumanMessage(content=f"用户请求：{user_message}\n\n请生成执行计划（只返回JSON）：")
+        HumanMessage(content=f"用户请求：{user_message}\n\n请判断意图并生成执行计划（只返回JSON）：")
     ]
     
-    response = await _llm.ainvoke(messages)
-    plan_text = response.content if hasattr(response, 'content') else str(response)
+    response = await _get_llm("plan").ainvoke(messages)
+    fused_text = response.content if hasattr(response, 'content') else str(response)
     
-    # 解析计划
     try:
-        # 尝试提取JSON
-        if "```json" in plan_text:
-            plan_text = plan_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in plan_text:
-            plan_text = plan_text.split("```")[1].split("```")[0].strip()
-        
-        plan_dict = json.loads(plan_text)
-        plan: ExecutionPlan = {
-            "summary": plan_dict.get("summary", ""),
-            "steps": plan_dict.get("steps", [])
-        }
+        fused_dict = _extract_json(fused_text)
+        # 本地规则已判定为业务请求时以本地结果为准
+        needs_business_data = bool(local_intent or fused_dict.get("needs_business_data", False))
+        plan = _build_plan(fused_dict.get("plan") or {}) if needs_business_data else None
+        if needs_business_data and not plan["steps"]:
+            plan = _default_plan()
+        elif needs_business_data:
+            plan_cache.put(user_message, system_prompt, plan)
+        logger.debug("融合规划：needs_business_data=%s, reason=%s", needs_business_data, fused_dict.get('reason', 'N/A'))
     except Exception as e:
-        # 如果解析失败，创建默认计划
-        print(f"[WARNING] 计划解析失败: {e}, 使用默认计划")
-        plan: ExecutionPlan = {
-            "summary": "无法解析计划，使用默认处理",
-            "steps": [{
-                "agent": "task",
-                "action": "query",
-                "params": {},
-                "description": "处理用户请求"
-            }]
+        logger.warning("融合规划解析失败: %s", e)
+        needs_business_data = bool(local_intent)
+        plan = _default_plan() if needs_business_data else None
+    
+    if not needs_business_data:
+        return {
+            "needs_business_data": False,
+            "is_planning": False
         }
     
     return {
+        "needs_business_data": True,
         "plan": plan,
         "current_step": 0,
         "is_planning": False,
@@ -307,13 +465,64 @@ async def _plan_node(state: SupervisorState, config: Dict[str, Any] = None) -> D
     }
 
 
+def _step_dependencies(steps: List[ExecutionStep]) -> List[List[int]]:
+    """构建计划步骤的依赖关系（DAG）
+
+    - 同一子agent的步骤总是依赖前一个同agent步骤（如"创建任务后再标记完成"）：
+      它们操作同一份数据，LLM给出的 "depends_on": [] 不能让它们并发执行
+    - 再合并显式给出的depends_on（只接受前序步骤的索引）
+    - 不同子agent之间没有显式依赖的步骤视为相互独立，可以并行执行
+    """
+    dependencies = []
+    last_step_by_agent: Dict[str, int] = {}
+    for index, step in enumerate(steps):
+        deps = set()
+        previous = last_step_by_agent.get(step.get("agent"))
+        if previous is not None:
+            deps.add(previous)
+        explicit = step.get("depends_on")
+        if isinstance(explicit, list):
+            deps.update(d for d in explicit if isinstance(d, int) and not isinstance(d, bool) and 0 <= d < index)
+        last_step_by_agent[step.get("agent")] = index
+        dependencies.append(sorted(deps))
+    return dependencies
+
+
+def _ready_steps(steps: List[ExecutionStep], completed: Set[int]) -> List[int]:
+    """返回依赖已全部完成、可以立即执行的步骤索引（按索引升序）"""
+    dependencies = _step_dependencies(steps)
+    ready = [
+        index for index in range(len(steps))
+        if index not in completed and all(dep in completed for dep in dependencies[index])
+    ]
+    if not ready:
+        # 依赖关系存在环或无效时，退化为按顺序执行剩余步骤
+        remaining = [index for index in range(len(steps)) if index not in completed]
+        ready = remaining[:1]
+    return ready
+
+
+def _build_agent_context(state: SupervisorState, step: ExecutionStep, step_index: int) -> Dict[str, Any]:
+    """准备子agent的上下文"""
+    return {
+        "step_index": step_index,
+        "action": step.get("action"),
+        "params": step.get("params", {}),
+        "description": step.get("description", ""),
+        "user_message": _extract_user_message(state)
+    }
+
+
 async def _route_node(state: SupervisorState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    """路由节点 - 根据计划选择下一个要执行的子agent"""
+    """路由节点 - 根据计划的依赖关系选择下一批要执行的步骤
+
+    只有一个可执行步骤时走对应的子agent节点；多个相互独立的步骤同时就绪时
+    路由到parallel_execute节点并发执行
+    """
     if config is None:
         config = {}
     
     plan = state.get("plan")
-    current_step = state.get("current_step", 0)
     
     if not plan or not plan.get("steps"):
         return {
@@ -324,7 +533,8 @@ async def _route_node(state: SupervisorState, config: Dict[str, Any] = None) ->
         }
     
     steps = plan["steps"]
-    if current_step >= len(steps):
+    completed = {result.get("step_index") for result in state.get("execution_results", [])}
+    if len(completed) >= len(steps):
         # 所有步骤执行完成
         return {
             "selected_agent": None,
@@ -333,47 +543,38 @@ async def _route_node(state: SupervisorState, config: Dict[str, Any] = None) ->
             "is_aggregating": True
         }
     
+    ready = _ready_steps(steps, completed)
+    if len(ready) > 1:
+        logger.debug("Route: 并行执行步骤 %s", ready)
+        return {
+            "selected_agent": "parallel",
+            "ready_steps": ready,
+            "should_continue": True
+        }
+    
     # 获取当前步骤
+    current_step = ready[0]
     step = steps[current_step]
     selected_agent = step.get("agent")
     step_description = step.get("description", "")
     
-    # 准备子agent的上下文
-    agent_context = {
-        "action": step.get("action"),
-        "params": step.get("params", {}),
-        "description": step_description,
-        "user_message": _extract_user_message(state)
-    }
-    
     # 为子agent准备指令消息
     # 子agent需要从messages中获取指令，所以我们创建一个包含当前步骤指令的HumanMessage
     instruction_message = HumanMessage(content=step_description)
     
     return {
         "selected_agent": selected_agent,
-        "agent_context": agent_context,
+        "current_step": current_step,
+        "ready_steps": [current_step],
+        "agent_context": _build_agent_context(state, step, current_step),
         "messages": [instruction_message],  # 为子agent设置指令消息
         "should_continue": True
     }
 
 
-async def _execute_node(state: SupervisorState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    """执行节点 - 记录子agent的执行结果并更新状态
-    
-    注意：子agent的实际执行已经在graph层的子agent节点中完成，
-    这个节点负责从messages中提取子agent的最终响应并记录到execution_results中
-    """
-    if config is None:
-        config = {}
-    
-    selected_agent = state.get("selected_agent")
-    current_step = state.get("current_step", 0)
-    
-    # 从messages中提取子agent的最终响应
-    # 子agent执行后，messages中会包含工具调用和最终响应
+def _extract_execution_result(messages: List[Any]) -> str:
+    """从子agent执行后的messages中提取最终响应"""
     execution_result_text = ""
-    messages = state.get("messages", [])
     
     if messages:
         # 从后往前查找最后一个AIMessage（子agent的最终响应）
@@ -397,11 +598,44 @@ async def _execute_node(state: SupervisorState, config: Dict[str, Any] = None) -
                                         break
                 break
     
-    # 如果仍然没有找到结果，尝试从agent_context获取（向后兼容）
-    if not execution_result_text:
-        agent_context = state.get("agent_context", {})
-        execution_result_text = agent_context.get("execution_result", "")
-    
+    return execution_result_text
+
+
+def _extract_tool_outputs(messages: List[Any]) -> List[str]:
+    """提取子agent本轮执行的工具输出（最后一条HumanMessage指令之后的ToolMessage）"""
+    tool_outputs = []
+    for msg in reversed(messages or []):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, ToolMessage):
+            tool_outputs.append(str(msg.content))
+    tool_outputs.reverse()
+    return tool_outputs
+
+
+def _extract_mutation_output(messages: List[Any]) -> Optional[Dict[str, Any]]:
+    """提取子agent本轮最后一次增删改工具调用的结构化结果，没有时返回None
+
+    查询类工具（如删除前的search_tasks_tool）的输出不计入
+    """
+    for msg in reversed(messages or []):
+        if isinstance(msg, HumanMessage):
+            break
+        if isinstance(msg, ToolMessage):
+            success = mutation_outcome(msg)
+            if success is not None:
+                return {"success": success, "output": str(msg.content)}
+    return None
+
+
+def _build_execution_result(
+    step_index: int,
+    agent: str,
+    execution_result_text: str,
+    tool_outputs: Optional[List[str]] = None,
+    mutation_output: Optional[Dict[str, Any]] = None
+) -> ExecutionResult:
+    """根据子agent的响应文本构建执行结果"""
     # 如果没有执行结果，说明子agent可能没有执行或执行失败
     if not execution_result_text:
         execution_result_text = "执行未完成或失败"
@@ -409,36 +643,176 @@ async def _execute_node(state: SupervisorState, config: Dict[str, Any] = None) -
     # 判断执行是否成功
     is_success = "失败" not in execution_result_text and "错误" not in execution_result_text and "未完成" not in execution_result_text
     
-    # 记录执行结果
-    execution_result: ExecutionResult = {
-        "step_index": current_step,
-        "agent": selected_agent,
+    return {
+        "step_index": step_index,
+        "agent": agent,
         "success": is_success,
         "result": execution_result_text,
-        "error": None if is_success else execution_result_text
+        "error": None if is_success else execution_result_text,
+        "tool_outputs": tool_outputs or [],
+        "mutation_output": mutation_output
     }
+
+
+async def _execute_node(state: SupervisorState, config: Dict[str, Any] = None) -> Dict[str, Any]:
+    """执行节点 - 记录子agent的执行结果并更新状态
     
-    execution_results = state.get("execution_results", [])
-    execution_results.append(execution_result)
+    注意：子agent的实际执行已经在graph层的子agent节点中完成，
+    这个节点负责从messages中提取子agent的最终响应并记录到execution_results中
+    """
+    if config is None:
+        config = {}
+    
+    selected_agent = state.get("selected_agent")
+    current_step = state.get("current_step", 0)
+    
+    # 从messages中提取子agent的最终响应
+    # 子agent执行后，messages中会包含工具调用和最终响应
+    execution_result_text = _extract_execution_result(state.get("messages", []))
+    
+    # 如果仍然没有找到结果，尝试从agent_context获取（向后兼容）
+    if not execution_result_text:
+        agent_context = state.get("agent_context", {})
+        execution_result_text = agent_context.get("execution_result", "")
+    
+    # 记录执行结果（execution_results通过merge_execution_results按step_index合并）
+    messages = state.get("messages", [])
+    execution_result = _build_execution_result(
+        current_step, selected_agent, execution_result_text,
+        _extract_tool_outputs(messages), _extract_mutation_output(messages)
+    )
+    
+    return {
+        "execution_results": [execution_result],
+        "selected_agent": None
+    }
+
+
+async def _run_step(state: SupervisorState, step_index: int, config: RunnableConfig = None) -> ExecutionResult:
+    """在独立的子状态中运行单个计划步骤
+
+    子状态与顺序执行时子agent看到的状态一致：完整的对话messages加上本步骤的指令消息，
+    以及本步骤的current_step、selected_agent和agent_context
+    """
+    step = state["plan"]["steps"][step_index]
+    agent = step.get("agent")
+    sub_graph = _sub_agent_graphs.get(agent)
+    if sub_graph is None:
+        return _build_execution_result(step_index, agent, f"未知的子agent: {agent}，执行失败")
+    
+    sub_state = {
+        **state,
+        "messages": list(state.get("messages", [])) + [HumanMessage(content=step.get("description", ""))],
+        "current_step": step_index,
+        "ready_steps": [step_index],
+        "selected_agent": agent,
+        "agent_context": _build_agent_context(state, step, step_index),
+    }
+    tool_outputs = []
+    mutation_output = None
+    try:
+        sub_result = await sub_graph.ainvoke(sub_state, config)
+        execution_result_text = _extract_execution_result(sub_result.get("messages", []))
+        tool_outputs = _extract_tool_outputs(sub_result.get("messages", []))
+        mutation_output = _extract_mutation_output(sub_result.get("messages", []))
+    except Exception as e:
+        logger.warning("并行步骤 %s (%s) 执行失败: %s", step_index, agent, e)
+        execution_result_text = f"执行失败: {e}"
+    return _build_execution_result(step_index, agent, execution_result_text, tool_outputs, mutation_output)
+
+
+async def _parallel_execute_node(state: SupervisorState, config: RunnableConfig = None) -> Dict[str, Any]:
+    """并行执行节点 - 并发运行依赖已满足的多个独立步骤
+
+    各步骤在独立的子状态中运行（都基于本轮之前的对话messages），步骤之间互不共享新增的messages；结果通过merge_execution_results
+    按step_index排序合并，保证汇总顺序与计划顺序一致
+    """
+    ready = state.get("ready_steps") or []
+    results = await asyncio.gather(*(_run_step(state, index, config) for index in ready))
     
-    # 移动到下一步
     return {
-        "execution_results": execution_results,
-        "current_step": current_step + 1,
+        "execution_results": list(results),
+        "ready_steps": [],
         "selected_agent": None
     }
 
 
+def _clean_tool_output(output: str) -> str:
+    """去掉工具输出中给前端的标记行（如 frontend_tool_call:refresh_task_list ...）"""
+    lines = [
+        line for line in output.splitlines()
+        if line.strip() and not line.strip().startswith("frontend_tool_call:")
+    ]
+    return "\n".join(lines)
+
+
+def _render_template_response(plan: Optional[ExecutionPlan], execution_results: List[ExecutionResult]) -> Optional[str]:
+    """按 (agent, action) 模板渲染最终响应
+
+    只处理单步骤计划和全部成功的增删改计划：增删改步骤只渲染最后一次增删改工具调用的输出，
+    单步查询只在恰好一次工具调用时渲染；步骤失败、增删改工具报告未成功（含未找到、没有可修改的内容）、
+    没有结构化的增删改结果、缺少模板或计划包含多步查询等结果不确定的情况返回None，由LLM汇总
+    """
+    if not plan or not plan.get("steps"):
+        return None
+    steps = plan["steps"]
+    if len(execution_results) != len(steps):
+        return None
+    if len(steps) > 1 and any(step.get("action") not in _CRUD_ACTIONS for step in steps):
+        return None
+    
+    parts = []
+    for result in execution_results:
+        step_index = result.get("step_index")
+        if not result.get("success") or step_index is None or not 0 <= step_index < len(steps):
+            return None
+        step = steps[step_index]
+        template = get_response_template(step.get("agent"), step.get("action"))
+        if template is None:
+            return None
+        
+        if step.get("action") in _CRUD_ACTIONS:
+            mutation = result.get("mutation_output")
+            if not mutation or not mutation.get("success"):
+                return None
+            details = _clean_tool_output(mutation.get("output", ""))
+        else:
+            # 查询步骤只在恰好一次工具调用时渲染，多次查询由LLM整理
+            tool_outputs = result.get("tool_outputs") or []
+            if len(tool_outputs) != 1 or result.get("mutation_output"):
+                return None
+            details = _clean_tool_output(tool_outputs[0])
+        if not details:
+            return None
+        parts.append(template.format(details=details))
+    
+    return "\n\n".join(parts)
+
+
 async def _aggregate_node(state: SupervisorState, config: Dict[str, Any] = None) -> Dict[str, Any]:
-    """汇总节点 - 汇总所有执行结果，生成最终响应"""
+    """汇总节点 - 汇总所有执行结果，生成最终响应
+    
+    简单计划优先使用模板渲染（不调用LLM），复杂或失败的计划才由LLM生成响应
+    """
     if config is None:
         config = {}
-    if _llm is None:
-        raise RuntimeError("LLM not initialized.")
     
     plan = state.get("plan")
     execution_results = state.get("execution_results", [])
     
+    if AGGREGATE_TEMPLATE_ENABLED:
+        templated_response = _render_template_response(plan, execution_results)
+        if templated_response is not None:
+            logger.debug("Aggregate: 使用模板化响应，跳过LLM汇总")
+            return {
+                "messages": [AIMessage(content=templated_response)],
+                "is_aggregating": False,
+                "should_continue": False
+            }
+    
+    if _llm is None:
+        raise RuntimeError("LLM not initialized.")
+    
     # 构建汇总消息
     summary_parts = []
     if plan:
@@ -463,22 +837,33 @@ async def _aggregate_node(state: SupervisorState, config: Dict[str, Any] = None)
         HumanMessage(content=f"用户原始请求：{user_message}\n\n{summary_text}\n\n请生成友好的响应：")
     ]
     
-    response = await _llm.ainvoke(messages)
-    final_response = response.content if hasattr(response, 'content') else str(response)
+    response = await _stream_llm_response("response", messages, config)
     
     return {
-        "messages": [AIMessage(content=final_response)],
+        "messages": [response],
         "is_aggregating": False,
         "should_continue": False
     }
 
 
+def _entry_decision(state: SupervisorState, config: RunnableConfig = None) -> str:
+    """入口决策函数 - 根据规划模式选择分步（intent_classify）或融合（fused_plan）流程"""
+    return "fused_plan" if _get_plan_mode(config) == "fused" else "intent_classify"
+
+
+def _fused_decision(state: SupervisorState) -> str:
+    """融合规划决策函数 - 已生成计划则直接路由，否则简单回复"""
+    if state.get("needs_business_data", False) and state.get("plan"):
+        return "supervisor_route"
+    return "simple_response"
+
+
 def _intent_decision(state: SupervisorState) -> str:
     """意图决策函数 - 根据意图分类结果路由到plan或simple_response"""
     # 默认值改为 False（保守策略：不确定时走 simple_response）
     needs_business_data = state.get("needs_business_data", False)
     
-    print(f"[DEBUG] Intent Decision: needs_business_data={needs_business_data}")
+    logger.debug("Intent Decision: needs_business_data=%s", needs_business_data)
     
     if needs_business_data:
         return "plan"  # 需要业务数据，进入plan节点
@@ -500,127 +885,153 @@ def _route_decision(state: SupervisorState) -> str:
         return "schedule_agent"
     elif selected_agent == "note":
         return "note_agent"
+    elif selected_agent == "parallel":
+        return "parallel_execute"
     else:
         return "aggregate"
 
 
-# 在文件末尾直接构建graph
-_llm = get_llm()
-
-# 初始化checkpointer和store
-try:
-    _checkpointer = get_postgres_checkpointer(get_postgres_connection_string())
-    print("[SUCCESS] Supervisor Graph checkpointer 初始化成功")
-except Exception as e:
-    print(f"[WARNING] Supervisor Graph checkpointer 初始化失败: {e}")
-    _checkpointer = None
-
-try:
-    _store = get_postgres_store()
-    if _store:
-        print("[SUCCESS] Supervisor Graph store 初始化成功")
-    else:
-        print("[WARNING] Supervisor Graph store 初始化失败，将使用内存模式")
-except Exception as e:
-    print(f"[WARNING] Supervisor Graph store 初始化失败: {e}")
-    _store = None
-
 # ===================== Supervisor工作流图拓扑结构 =====================
 #
-#       ┌────────────────────┐
-#       │  intent_classify   │   # 0. 意图分类（判断是否需要业务数据）
-#       └─────────┬──────────┘
-#                 │
-#        ┌────────┴────────┐
-#        │                 │
-#        ▼                 ▼
-#   ┌─────────┐    ┌────────────────────┐
-#   │ simple  │    │  supervisor_plan   │   # 1. 生成执行计划
-#   │response │    └─────────┬──────────┘
-#   └────┬────┘              │
-#        │                   ▼
-#        │          ┌────────────────────┐
-#        │          │ supervisor_route   │   # 2. 路由到对应子Agent
-#        │          └────────────────────┘
-#        │         /    |      |     |   \
-#        │        ▼     ▼      ▼     ▼    ▼
-#        │    task  schedule  note  aggregate END
-#        │   agent  agent     agent
-#        │     │      │        │      │
-#        │     ▼      ▼        ▼      │
-#        │ execute execute  execute │
-#        │     │      │        │      │
-#        │     └──────┴────────┴──────┘
-#        │              │
-#        │              ▼
-#        │     ┌────────────────────┐
-#        │     │  supervisor_route  │
-#        │     └────────────────────┘
-#        │
-#        └───────────END─────────────┘
+#                         START
+#                           │  (_entry_decision: plan_mode)
+#              ┌────────────┴─────────────┐
+#              │ separate                 │ fused
+#              ▼                          ▼
+#   ┌────────────────────┐     ┌────────────────────┐
+#   │  intent_classify   │     │     fused_plan     │
+#   └──┬──────────────┬──┘     └──┬──────────────┬──┘
+#      │ plan         │ simple    │ simple       │ plan
+#      ▼              └─────┬─────┘              │
+#   ┌────────────────────┐  ▼                    │
+#   │  supervisor_plan   │  ┌─────────────────┐  │
+#   └─────────┬──────────┘  │ simple_response │──┼──▶ END
+#             │             └─────────────────┘  │
+#             ▼                                  │
+#   ┌────────────────────┐◀──────────────────────┘
+#   │  supervisor_route  │◀────────────────────────────────────┐
+#   └─────────┬──────────┘                                     │
+#      ┌──────┴───────┬───────────────┬───────────────┐        │
+#      ▼              ▼               ▼               ▼        │
+#  task_agent   schedule_agent    note_agent   parallel_execute│
+#      │              │               │               │        │
+#      └──────────────┼───────────────┘               │        │
+#                     ▼                               │        │
+#                  execute ───────────────────────────┴────────┘
 #
+#   supervisor_route ──▶ aggregate ──▶ END（所有步骤执行完成）
+#
+# intent_classify：意图分类（判断是否需要业务数据）；fused_plan：意图分类 + 计划（单次LLM调用）
+# supervisor_plan：生成执行计划；supervisor_route：按依赖关系路由到对应子Agent
 # aggregate节点和simple_response节点之后都是END
+# 多个相互独立的步骤同时就绪时，parallel_execute并发调用各子agent，耗时约等于最慢的步骤
+# fused模式（SUPERVISOR_PLAN_MODE=fused 或 configurable.plan_mode=fused）跳过intent_classify和supervisor_plan
 # ================================================================
 
-# 构建Supervisor工作流图
-workflow = StateGraph(SupervisorState)
-
-# 添加supervisor节点
-workflow.add_node("intent_classify", _intent_classify_node)
-workflow.add_node("simple_response", _simple_response_node)
-workflow.add_node("supervisor_plan", _plan_node)
-workflow.add_node("supervisor_route", _route_node)
-workflow.add_node("execute", _execute_node)
-workflow.add_node("aggregate", _aggregate_node)
-
-# 将子agent的graph作为子图添加到supervisor graph中
-workflow.add_node("task_agent", task_graph)
-workflow.add_node("schedule_agent", schedule_graph)
-workflow.add_node("note_agent", note_graph)
-
-# 设置入口点
-workflow.set_entry_point("intent_classify")
-
-# 添加条件边：从intent_classify根据判断结果路由
-workflow.add_conditional_edges(
-    "intent_classify",
-    _intent_decision,
-    {
-        "plan": "supervisor_plan",
-        "simple_response": "simple_response"
-    }
-)
+def build_graph(llm: Any = None, store: Any = None, role_llms: Optional[Dict[str, Any]] = None):
+    """构建并编译Supervisor Graph（由应用lifespan调用，导入模块时不再构建）
 
-# 添加边
-workflow.add_edge("simple_response", END)
-workflow.add_edge("supervisor_plan", "supervisor_route")
-workflow.add_edge("execute", "supervisor_route")
-workflow.add_edge("aggregate", END)
-
-# 添加条件边：从supervisor_route到各个子agent或aggregate
-workflow.add_conditional_edges(
-    "supervisor_route",
-    _route_decision,
-    {
-        "task_agent": "task_agent",
-        "schedule_agent": "schedule_agent",
-        "note_agent": "note_agent",
-        "aggregate": "aggregate",
-        "end": END
-    }
-)
+    Args:
+        llm: 默认LLM实例，为None时调用get_llm()创建
+        store: 消息历史store，为None时以内存模式运行
+        role_llms: 按角色分配的LLM（intent / plan / response / agent，见llmconf.LLM_ROLES），
+            未分配的角色使用默认LLM
+
+    Returns:
+        编译后的graph；checkpointer由调用方在创建后设置到graph.checkpointer上
+    """
+    global _llm, _store
+    _llm = llm if llm is not None else get_llm()
+    _store = store
+    _role_llms.clear()
+    _role_llms.update(role_llms or {})
+
+    # 子agent graph映射（并行执行时直接调用），三个子agent共用agent角色的LLM实例
+    agent_llm = _get_llm("agent")
+    _sub_agent_graphs.clear()
+    _sub_agent_graphs.update({
+        "task": build_task_graph(agent_llm),
+        "schedule": build_schedule_graph(agent_llm),
+        "note": build_note_graph(agent_llm),
+    })
+
+    # 构建Supervisor工作流图
+    workflow = StateGraph(SupervisorState)
+
+    # 添加supervisor节点
+    workflow.add_node("intent_classify", _intent_classify_node)
+    workflow.add_node("fused_plan", _fused_plan_node)
+    workflow.add_node("simple_response", _simple_response_node)
+    workflow.add_node("supervisor_plan", _plan_node)
+    workflow.add_node("supervisor_route", _route_node)
+    workflow.add_node("execute", _execute_node)
+    workflow.add_node("parallel_execute", _parallel_execute_node)
+    workflow.add_node("aggregate", _aggregate_node)
+
+    # 将子agent的graph作为子图添加到supervisor graph中
+    workflow.add_node("task_agent", _sub_agent_graphs["task"])
+    workflow.add_node("schedule_agent", _sub_agent_graphs["schedule"])
+    workflow.add_node("note_agent", _sub_agent_graphs["note"])
+
+    # 设置入口点：根据规划模式选择分步或融合流程
+    workflow.set_conditional_entry_point(
+        _entry_decision,
+        {
+            "intent_classify": "intent_classify",
+            "fused_plan": "fused_plan"
+        }
+    )
+
+    # 添加条件边：从fused_plan直接路由到supervisor_route或simple_response
+    workflow.add_conditional_edges(
+        "fused_plan",
+        _fused_decision,
+        {
+            "supervisor_route": "supervisor_route",
+            "simple_response": "simple_response"
+        }
+    )
+
+    # 添加条件边：从intent_classify根据判断结果路由
+    workflow.add_conditional_edges(
+        "intent_classify",
+        _intent_decision,
+        {
+            "plan": "supervisor_plan",
+            "simple_response": "simple_response"
+        }
+    )
+
+    # 添加边
+    workflow.add_edge("simple_response", END)
+    workflow.add_edge("supervisor_plan", "supervisor_route")
+    workflow.add_edge("execute", "supervisor_route")
+    workflow.add_edge("parallel_execute", "supervisor_route")
+    workflow.add_edge("aggregate", END)
+
+    # 添加条件边：从supervisor_route到各个子agent或aggregate
+    workflow.add_conditional_edges(
+        "supervisor_route",
+        _route_decision,
+        {
+            "task_agent": "task_agent",
+            "schedule_agent": "schedule_agent",
+            "note_agent": "note_agent",
+            "parallel_execute": "parallel_execute",
+            "aggregate": "aggregate",
+            "end": END
+        }
+    )
 
-# 子agent执行后都转到execute节点
-workflow.add_edge("task_agent", "execute")
-workflow.add_edge("schedule_agent", "execute")
-workflow.add_edge("note_agent", "execute")
+    # 子agent执行后都转到execute节点
+    workflow.add_edge("task_agent", "execute")
+    workflow.add_edge("schedule_agent", "execute")
+    workflow.add_edge("note_agent", "execute")
 
-# 编译graph，传入checkpointer
-if _checkpointer:
-    graph = workflow.compile(checkpointer=_checkpointer)
-else:
+    # 编译graph
     graph = workflow.compile()
 
-# 将checkpointer和store作为graph的属性
-graph.checkpointer = _checkpointer
-graph.store = _store
+    # 将checkpointer和store作为graph的属性
+    graph.checkpointer = None
+    graph.store = _store
+    return graph
@@ -0,0 +1,285 @@
+"""
+意图快速分类器
+在进程内完成意图判断（关键词/正则自动机 + 字符n-gram线性模型），
+对明确的请求直接给出结果，只有置信度不足时才回退到LLM
+
+规则命中只作为佐证：与线性模型一致时提高置信度，不一致时判为不确定交给LLM；
+线性模型只用几十条种子语料训练、没有校准，单独给出结果时使用更高的阈值
+"""
+
+import math
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+
+# 快速分类配置
+INTENT_FAST_PATH_ENABLED = os.getenv("INTENT_FAST_PATH_ENABLED", "true").lower() == "true"
+INTENT_FAST_PATH_THRESHOLD = float(os.getenv("INTENT_FAST_PATH_THRESHOLD", "0.85"))
+# 没有规则佐证、只有线性模型判断时的阈值
+INTENT_MODEL_THRESHOLD = float(os.getenv("INTENT_MODEL_THRESHOLD", "0.95"))
+
+
+class IntentPrediction(NamedTuple):
+    """意图预测结果"""
+    needs_business_data: bool  # 是否需要调用业务数据
+    confidence: float  # 置信度（0.5 ~ 1.0）
+    source: str  # 判断来源：rule / model
+
+
+# ===================== 规则自动机 =====================
+
+
+def _terms(chinese: str, latin: str) -> str:
+    """组合中英文词表：英文词加单词边界（避免 "events" 匹配 "prevents"），中文词之间没有单词边界"""
+    return rf"(?:{chinese}|\b(?:{latin})\b)"
+
+
+# 资源名词（任务、日程、笔记）
+_RESOURCE_PATTERN = _terms(
+    r"任务|待办|清单|日程|日历|会议|约会|行程|提醒|笔记|备忘|记事",
+    r"tasks?|todos?|to-dos?|schedules?|calendar|meetings?|appointments?|events?|notes?|memos?",
+)
+
+# 操作动词（不含 "what is"/"什么是" 这类疑问词：询问概念不是数据操作）
+_ACTION_PATTERN = _terms(
+    r"添加|新增|创建|新建|加个|加一个|记一下|记录|写|安排|预约|查看|看看|看一下|列出|显示|查询|查一下|搜索|找"
+    r"|有哪些|有什么|有几个|完成|标记|勾选|修改|更新|改成|改为|重命名|删除|删掉|移除|取消|清空",
+    r"add|create|new|make|put|write|jot|book|show|list|view|see|get|find|search|check"
+    r"|complete|finish|mark|tick|update|change|edit|rename|delete|remove|cancel|clear",
+)
+
+# 动词和资源名词之间的内容：不跨分句，且资源名词不能只是话题（"写一首关于会议的诗"）
+_GAP = r"(?:(?!关于|有关|\babout\b)[^，。,.;；!?！？\n]){0,12}?"
+
+# 分句（规则只在同一分句内匹配）
+_CLAUSE_SPLIT = re.compile(r"[，。,.;；!?！？\n]+")
+
+# 明确需要业务数据的模式
+_BUSINESS_RULES = [
+    # 动词 + 资源名词（"添加任务"、"add a task"）
+    re.compile(_ACTION_PATTERN + _GAP + _RESOURCE_PATTERN, re.IGNORECASE),
+    # 资源名词 + 动词（"任务列表显示一下"、"把学习的任务删除"）
+    re.compile(_RESOURCE_PATTERN + _GAP + _ACTION_PATTERN, re.IGNORECASE),
+    # 所有格 + 资源名词（"我的任务"、"my tasks"、"on my calendar"）
+    re.compile(r"(?:我的|我今天的|我明天的|\bmy\s*)" + _RESOURCE_PATTERN, re.IGNORECASE),
+    # 时间 + 日程类名词（"明天的安排"、"tomorrow's meetings"）
+    re.compile(
+        _terms(r"今天|明天|后天|本周|这周|下周|周[一二三四五六日天]", r"today|tomorrow|this week|next week")
+        + r".{0,8}?"
+        + _terms(r"日程|安排|会议|行程", r"schedule|calendar|meetings?|agenda|plans?"),
+        re.IGNORECASE,
+    ),
+    # "提醒我……"、"remind me to …"
+    re.compile(r"(?:提醒我|\bremind me\b)", re.IGNORECASE),
+]
+
+# 明确不需要业务数据的模式（询问能力、身份等）
+_NON_BUSINESS_RULES = [
+    re.compile(
+        r"^(你|您)?(能|可以|会)(做|干|帮我做)?(什么|些什么|啥)|^你是谁|^你叫什么|^怎么(使用|用)|^如何使用"
+        r"|^what can you do|^who are you|^what are you|^how do i use|^tell me a joke|^讲个笑话",
+        re.IGNORECASE,
+    ),
+]
+
+
+def _match_rules(text: str) -> Optional[bool]:
+    """使用规则自动机匹配意图，返回规则判断的是否需要业务数据，未命中时返回None"""
+    for pattern in _NON_BUSINESS_RULES:
+        if pattern.search(text) and not re.search(_RESOURCE_PATTERN, text, re.IGNORECASE):
+            return False
+    for clause in _CLAUSE_SPLIT.split(text):
+        if any(pattern.search(clause) for pattern in _BUSINESS_RULES):
+            return True
+    return None
+
+
+# ===================== 线性模型 =====================
+
+# 种子语料：(文本, 是否需要业务数据)
+_SEED_CORPUS = [
+    ("添加任务学习Python", True),
+    ("帮我创建一个任务：买牛奶", True),
+    ("新建任务 明天交报告", True),
+    ("查看我的任务", True),
+    ("列出所有未完成的任务", True),
+    ("把买菜标记为完成", True),
+    ("删除最新的任务", True),
+    ("明天下午三点安排一个会议", True),
+    ("我明天有什么安排", True),
+    ("这周的日程", True),
+    ("帮我记一下今天的会议内容", True),
+    ("写一篇笔记记录读书心得", True),
+    ("搜索关于项目的笔记", True),
+    ("取消周五的会议", True),
+    ("把任务3改成已完成", True),
+    ("打开日程页面", True),
+    ("下周一上午九点提醒我开会", True),
+    ("add a task to buy milk", True),
+    ("create a new todo for the report", True),
+    ("show my tasks", True),
+    ("list all my notes", True),
+    ("what's on my calendar tomorrow", True),
+    ("schedule a meeting with bob at 3pm", True),
+    ("mark the groceries task as done", True),
+    ("delete the meeting on friday", True),
+    ("remind me to call mom tonight", True),
+    ("take a note about the design review", True),
+    ("do i have anything planned this weekend", True),
+    ("你好", False),
+    ("早上好啊", False),
+    ("谢谢你的帮助", False),
+    ("你能做什么", False),
+    ("你是谁", False),
+    ("今天天气怎么样", False),
+    ("讲个笑话吧", False),
+    ("解释一下什么是机器学习", False),
+    ("帮我翻译这句话", False),
+    ("Python和Java有什么区别", False),
+    ("我心情不太好", False),
+    ("推荐一本好书", False),
+    ("1加1等于几", False),
+    ("如何提高工作效率", False),
+    ("好的，明白了", False),
+    ("再见", False),
+    ("hello there", False),
+    ("thanks a lot", False),
+    ("what can you do", False),
+    ("who are you", False),
+    ("tell me a joke", False),
+    ("how is the weather today", False),
+    ("explain quantum computing", False),
+    ("translate this sentence into english", False),
+    ("what is the capital of france", False),
+    ("good night", False),
+    ("how are you doing", False),
+    ("recommend a movie", False),
+]
+
+
+def _normalize(text: str) -> str:
+    """归一化文本：小写、去除多余空白"""
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+
+def char_ngrams(text: str, min_n: int = 1, max_n: int = 3) -> Dict[str, int]:
+    """提取字符n-gram特征（带边界标记）"""
+    padded = f"^{_normalize(text)}$"
+    features: Dict[str, int] = {}
+    for n in range(min_n, max_n + 1):
+        for i in range(len(padded) - n + 1):
+            gram = padded[i:i + n]
+            if gram.strip():
+                features[gram] = features.get(gram, 0) + 1
+    return features
+
+
+class NgramLogisticModel:
+    """字符n-gram逻辑回归模型（纯Python实现，规模很小，导入时训练一次）"""
+
+    def __init__(self, epochs: int = 40, learning_rate: float = 0.5, l2: float = 0.001):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.weights: Dict[str, float] = {}
+        self.bias = 0.0
+
+    @staticmethod
+    def _features(text: str) -> Dict[str, float]:
+        counts = char_ngrams(text)
+        norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+        return {k: v / norm for k, v in counts.items()}
+
+    def _score(self, features: Dict[str, float]) -> float:
+        return self.bias + sum(self.weights.get(k, 0.0) * v for k, v in features.items())
+
+    def fit(self, samples: List[tuple]) -> "NgramLogisticModel":
+        """使用SGD训练模型"""
+        featurized = [(self._features(text), 1.0 if label else 0.0) for text, label in samples]
+        for _ in range(self.epochs):
+            for features, label in featurized:
+                error = _sigmoid(self._score(features)) - label
+                self.bias -= self.learning_rate * error
+                for k, v in features.items():
+                    w = self.weights.get(k, 0.0)
+                    self.weights[k] = w - self.learning_rate * (error * v + self.l2 * w)
+        return self
+
+    def predict_proba(self, text: str) -> float:
+        """返回需要业务数据的概率"""
+        return _sigmoid(self._score(self._features(text)))
+
+
+def _sigmoid(x: float) -> float:
+    if x < -30:
+        return 0.0
+    if x > 30:
+        return 1.0
+    return 1.0 / (1.0 + math.exp(-x))
+
+
+# ===================== 对外接口 =====================
+
+# 导入时训练一次
+_model = NgramLogisticModel().fit(_SEED_CORPUS)
+
+# 命中/未命中计数器
+_stats = {
+    "hits": 0,  # 快速路径直接给出结果（节省的LLM调用）
+    "misses": 0,  # 置信度不足，回退到LLM
+    "rule_hits": 0,
+    "model_hits": 0,
+}
+
+
+def classify(message: str) -> IntentPrediction:
+    """对用户消息进行本地意图分类（不做阈值判断）
+
+    规则命中且与模型一致时，把模型的错误率减半作为置信度；与模型不一致时置信度为0.5（交给LLM）
+    """
+    text = _normalize(message)
+    probability = _model.predict_proba(text)
+    model_label = probability >= 0.5
+    model_confidence = max(probability, 1.0 - probability)
+
+    rule_label = _match_rules(text)
+    if rule_label is None:
+        return IntentPrediction(model_label, model_confidence, "model")
+    if rule_label != model_label:
+        return IntentPrediction(rule_label, 0.5, "rule")
+    return IntentPrediction(rule_label, (1.0 + model_confidence) / 2, "rule")
+
+
+def fast_classify(message: str, threshold: float = None) -> Optional[IntentPrediction]:
+    """快速路径分类
+
+    置信度达到阈值时返回预测结果，否则返回None（调用方应回退到LLM）；
+    未指定阈值时，有规则佐证的预测使用 INTENT_FAST_PATH_THRESHOLD，只有模型判断的使用 INTENT_MODEL_THRESHOLD
+    """
+    if not INTENT_FAST_PATH_ENABLED:
+        return None
+
+    prediction = classify(message)
+    if threshold is None:
+        threshold = INTENT_FAST_PATH_THRESHOLD if prediction.source == "rule" else INTENT_MODEL_THRESHOLD
+    if prediction.confidence >= threshold:
+        _stats["hits"] += 1
+        _stats[f"{prediction.source}_hits"] += 1
+        return prediction
+
+    _stats["misses"] += 1
+    return None
+
+
+def get_stats() -> Dict[str, float]:
+    """获取快速分类命中统计"""
+    total = _stats["hits"] + _stats["misses"]
+    return {
+        **_stats,
+        "llm_calls_saved": _stats["hits"],
+        "hit_rate": round(_stats["hits"] / total, 4) if total else 0.0,
+        "threshold": INTENT_FAST_PATH_THRESHOLD,
+        "model_threshold": INTENT_MODEL_THRESHOLD,
+        "enabled": INTENT_FAST_PATH_ENABLED,
+    }
@@ -0,0 +1,207 @@
+"""
+Supervisor计划缓存
+对归一化后的用户消息缓存执行计划，相同（或足够相似的）请求直接复用计划，跳过规划LLM调用
+
+规划只看提示词和用户消息，计划与用户无关（执行时按状态中的user_id访问数据），缓存在用户之间共享；
+包含相对日期/时间（明天、下周一、3小时后……）的消息不缓存：同一句话在不同时间对应不同的日期
+"""
+
+import copy
+import hashlib
+import math
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional
+
+from .intent_classifier import char_ngrams
+
+
+# 计划缓存配置
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "true").lower() == "true"
+PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS", "600"))
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1024"))
+# 相似度阈值：1.0 表示只复用归一化后完全相同的请求；小于1.0时允许近似请求复用只读（query）计划
+PLAN_CACHE_SIMILARITY_THRESHOLD = float(os.getenv("PLAN_CACHE_SIMILARITY_THRESHOLD", "1.0"))
+
+# 只读操作，近似匹配时只复用全部由这些操作组成的计划（写操作的参数与具体请求相关）
+_READ_ONLY_ACTIONS = {"query"}
+
+# 相对日期/时间表达（消息已小写）
+_RELATIVE_TIME = re.compile(
+    r"今天|今日|今早|今晚|今夜|明天|明日|明早|明晚|后天|昨天|昨日|昨晚|前天|"
+    r"[本这上下]个?(?:周|星期|礼拜|月)|今年|明年|去年|月初|月底|月末|年初|年底|年末|"
+    r"(?:周|星期|礼拜)[一二三四五六日天末]|早上|上午|中午|下午|傍晚|晚上|"
+    r"现在|刚才|待会|一会儿|稍后|马上|"
+    r"[\d一二三四五六七八九十两半几]+\s*个?(?:分钟|小时|钟头|天|周|星期|礼拜|月|年)(?:后|以后|之后|前|以前|之前|内|以内)|"
+    r"\b(?:today|tonight|tomorrow|yesterday|now|monday|tuesday|wednesday|thursday|friday|saturday|sunday|weekend)\b|"
+    r"\b(?:this|next|last)\s+(?:week|month|year|morning|afternoon|evening)\b|"
+    r"\bin\s+\d+\s+(?:minute|hour|day|week|month)s?\b|\b\d+\s+(?:minute|hour|day|week|month)s?\s+ago\b"
+)
+
+
+class _CacheEntry(NamedTuple):
+    """缓存条目"""
+    plan: Dict[str, Any]  # 缓存的执行计划
+    features: Dict[str, float]  # 归一化后的字符n-gram向量（用于近似匹配）
+    read_only: bool  # 计划是否只包含只读操作
+    expires_at: float  # 过期时间（time.monotonic）
+
+
+def normalize_message(message: str) -> str:
+    """归一化用户消息：小写、合并空白、去掉首尾标点"""
+    text = re.sub(r"\s+", " ", message.lower()).strip()
+    return re.sub(r"^[\W_]+|[\W_]+$", "", text)
+
+
+def has_relative_time(message: str) -> bool:
+    """消息是否包含相对日期/时间表达（这类请求的计划不缓存）"""
+    return bool(_RELATIVE_TIME.search(message.lower()))
+
+
+def prompt_version(prompt: str) -> str:
+    """计算提示词版本（内容哈希），提示词变化后旧缓存自动失效"""
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def _vectorize(text: str) -> Dict[str, float]:
+    counts = char_ngrams(text)
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+def _is_read_only(plan: Dict[str, Any]) -> bool:
+    steps = plan.get("steps") or []
+    return bool(steps) and all(step.get("action") in _READ_ONLY_ACTIONS for step in steps)
+
+
+class PlanCache:
+    """执行计划缓存（LRU + TTL）
+
+    键为 (提示词版本, 归一化消息)。精确命中直接返回；相似度阈值小于1.0时，
+    在同一提示词版本下查找最相似的只读计划。包含相对日期/时间的消息既不查找也不缓存
+    """
+
+    def __init__(
+        self,
+        max_entries: int = PLAN_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = PLAN_CACHE_TTL_SECONDS,
+        similarity_threshold: float = PLAN_CACHE_SIMILARITY_THRESHOLD,
+        enabled: bool = PLAN_CACHE_ENABLED
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self._entries: "OrderedDict[tuple, _CacheEntry]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "misses": 0,
+            "uncacheable": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def get(self, message: str, prompt: str) -> Optional[Dict[str, Any]]:
+        """查找缓存的计划，未命中返回None"""
+        if not self.enabled:
+            return None
+        normalized = normalize_message(message)
+        if not normalized:
+            return None
+        if has_relative_time(normalized):
+            self._stats["uncacheable"] += 1
+            return None
+        version = prompt_version(prompt)
+        now = time.monotonic()
+
+        key = (version, normalized)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                self._stats["exact_hits"] += 1
+                return copy.deepcopy(entry.plan)
+            self._expire(key)
+
+        if self.similarity_threshold < 1.0:
+            match = self._find_similar(version, normalized, now)
+            if match is not None:
+                self._entries.move_to_end(match)
+                self._stats["hits"] += 1
+                self._stats["similar_hits"] += 1
+                return copy.deepcopy(self._entries[match].plan)
+
+        self._stats["misses"] += 1
+        return None
+
+    def put(self, message: str, prompt: str, plan: Dict[str, Any]) -> None:
+        """缓存计划（超出容量时淘汰最久未使用的条目）"""
+        if not self.enabled or not plan or not plan.get("steps"):
+            return
+        normalized = normalize_message(message)
+        if not normalized or has_relative_time(normalized):
+            return
+        key = (prompt_version(prompt), normalized)
+        self._entries[key] = _CacheEntry(
+            plan=copy.deepcopy(plan),
+            features=_vectorize(normalized),
+            read_only=_is_read_only(plan),
+            expires_at=time.monotonic() + self.ttl_seconds
+        )
+        self._entries.move_to_end(key)
+        self._stats["stores"] += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "size": len(self._entries),
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "enabled": self.enabled,
+        }
+
+    def _expire(self, key: tuple) -> None:
+        del self._entries[key]
+        self._stats["expirations"] += 1
+
+    def _find_similar(self, version: str, normalized: str, now: float) -> Optional[tuple]:
+        """在同一提示词版本的只读计划中查找相似度最高且达到阈值的条目"""
+        features = _vectorize(normalized)
+        best_key, best_score = None, self.similarity_threshold
+        for key, entry in list(self._entries.items()):
+            if key[0] != version or not entry.read_only:
+                continue
+            if entry.expires_at <= now:
+                self._expire(key)
+                continue
+            score = _cosine(features, entry.features)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+
+# 全局计划缓存实例
+plan_cache = PlanCache()
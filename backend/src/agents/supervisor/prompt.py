@@ -51,7 +51,8 @@ SUPERVISOR_SYSTEM_PROMPT = """你是一个Supervisor Agent，负责协调和管
       "params": {
         "key": "value"
       },
-      "description": "步骤的详细描述"
+      "description": "步骤的详细描述",
+      "depends_on": []
     }
   ]
 }
@@ -63,6 +64,7 @@ SUPERVISOR_SYSTEM_PROMPT = """你是一个Supervisor Agent，负责协调和管
 - 对于复杂请求，可以制定多步骤计划
 - 确保计划中的参数准确、完整
 - 如果用户请求涉及多个资源类型，按逻辑顺序安排步骤
+- 使用depends_on标明步骤之间的依赖，相互独立的步骤会被并行执行
 - 始终以用户友好的方式呈现结果
 
 请用中文与用户交互。"""
@@ -89,11 +91,15 @@ PLAN_NODE_PROMPT = """你是一个Supervisor Agent，负责分析用户请求并
       "agent": "task|schedule|note",
       "action": "create|update|delete|query",
       "params": {...},
-      "description": "步骤描述"
+      "description": "步骤描述",
+      "depends_on": []
     }
   ]
 }
 
+depends_on 为该步骤依赖的前序步骤索引（从0开始）。相互独立的步骤（如同时创建任务和笔记）依赖为空，可以并行执行；
+需要使用前序步骤结果的步骤必须列出依赖。同一子agent的步骤总是按顺序执行。
+
 请分析用户请求，生成执行计划。只返回JSON格式的计划，不要其他文字。"""
 
 
@@ -103,6 +109,24 @@ AGGREGATE_NODE_PROMPT = """你是一个Supervisor Agent，负责汇总执行结
 请根据执行计划和结果，生成一个清晰、友好的响应给用户。"""
 
 
+# Aggregate节点的模板化响应（按 (agent, action) 索引）
+# 单步骤计划或全部成功的增删改计划直接用工具输出渲染，不再调用LLM；{details}为工具输出
+RESPONSE_TEMPLATES = {
+    ("task", "create"): "✅ 已为您创建任务：\n{details}",
+    ("task", "update"): "✅ 已为您更新任务：\n{details}",
+    ("task", "delete"): "🗑️ 已为您删除任务：\n{details}",
+    ("task", "query"): "📋 {details}",
+    ("schedule", "create"): "✅ 已为您创建日程：\n{details}",
+    ("schedule", "update"): "✅ 已为您更新日程：\n{details}",
+    ("schedule", "delete"): "🗑️ 已为您删除日程：\n{details}",
+    ("schedule", "query"): "📅 {details}",
+    ("note", "create"): "✅ 已为您创建笔记：\n{details}",
+    ("note", "update"): "✅ 已为您更新笔记：\n{details}",
+    ("note", "delete"): "🗑️ 已为您删除笔记：\n{details}",
+    ("note", "query"): "📝 {details}",
+}
+
+
 # Intent分类节点专用提示词
 INTENT_CLASSIFY_PROMPT = """你是一个意图分类器，负责判断用户的请求是否需要调用业务数据（任务、日程、笔记）。
 
@@ -147,6 +171,46 @@ INTENT_CLASSIFY_PROMPT = """你是一个意图分类器，负责判断用户的
 只返回JSON，不要其他文字。"""
 
 
+# Fused Plan节点专用提示词（意图分类 + 执行计划，单次调用）
+FUSED_PLAN_NODE_PROMPT = """你是一个Supervisor Agent，需要在一次回答中同时完成意图分类和执行计划。
+
+## 第一步：意图分类
+判断用户请求是否需要调用业务数据（任务、日程、笔记）：
+- 明确涉及任务、日程、笔记的创建、查询、更新、删除 → needs_business_data: true
+- 问候、感谢、告别、询问系统功能、闲聊、一般性咨询 → needs_business_data: false
+- 不确定时返回 false
+
+## 第二步：执行计划（仅当 needs_business_data 为 true 时）
+可用的子Agent：
+- task: 任务管理
+- schedule: 日程管理
+- note: 笔记管理
+
+返回格式（只返回JSON）：
+```json
+{
+  "needs_business_data": true/false,
+  "reason": "判断理由",
+  "plan": {
+    "summary": "计划摘要",
+    "steps": [
+      {
+        "agent": "task|schedule|note",
+        "action": "create|update|delete|query",
+        "params": {...},
+        "description": "步骤描述",
+        "depends_on": []
+      }
+    ]
+  }
+}
+```
+
+depends_on 为该步骤依赖的前序步骤索引（从0开始），相互独立的步骤依赖为空，可以并行执行；同一子agent的步骤总是按顺序执行。
+
+needs_business_data 为 false 时，plan 返回 null。只返回JSON，不要其他文字。"""
+
+
 def get_supervisor_prompt() -> str:
     """获取Supervisor系统提示词"""
     return SUPERVISOR_SYSTEM_PROMPT
@@ -162,7 +226,16 @@ def get_aggregate_node_prompt() -> str:
     return AGGREGATE_NODE_PROMPT
 
 
+def get_response_template(agent: str, action: str) -> Optional[str]:
+    """获取Aggregate节点的模板化响应，没有对应模板时返回None"""
+    return RESPONSE_TEMPLATES.get((agent, action))
+
+
 def get_intent_classify_prompt() -> str:
     """获取Intent分类节点的系统提示词"""
     return INTENT_CLASSIFY_PROMPT
 
+
+def get_fused_plan_node_prompt() -> str:
+    """获取Fused Plan节点的系统提示词"""
+    return FUSED_PLAN_NODE_PROMPT
@@ -4,7 +4,7 @@ Supervisor Agent 状态定义
 """
 
 from typing import Annotated, List, Dict, Any, Optional, Literal
-from typing_extensions import TypedDict
+from typing_extensions import TypedDict, NotRequired
 from langgraph.graph.message import add_messages
 
 
@@ -14,10 +14,23 @@ class AgentState(TypedDict):
 
 
 def merge_execution_results(x: List, y: List) -> List:
-    """合并执行结果列表"""
-    if isinstance(x, list) and isinstance(y, list):
-        return x + y
-    return (x or []) + (y or [])
+    """合并执行结果列表
+
+    按step_index去重（后写入的结果覆盖先前结果）并排序，
+    保证并行分支以任意顺序完成时合并结果都是确定的。
+    写入空列表表示重置（新一轮对话的初始状态和规划节点会清空上一轮的结果）
+    """
+    if isinstance(y, list) and not y:
+        return []
+    merged = {}
+    unindexed = []
+    for result in (x or []) + (y or []):
+        step_index = result.get("step_index") if isinstance(result, dict) else None
+        if step_index is None:
+            unindexed.append(result)
+        else:
+            merged[step_index] = result
+    return [merged[index] for index in sorted(merged)] + unindexed
 
 
 class ExecutionStep(TypedDict):
@@ -26,6 +39,7 @@ class ExecutionStep(TypedDict):
     action: str  # 操作类型（create, update, delete, query等）
     params: Dict[str, Any]  # 操作参数
     description: str  # 步骤描述
+    depends_on: NotRequired[List[int]]  # 依赖的前序步骤索引（可选；同agent的步骤总是按顺序依赖）
 
 
 class ExecutionPlan(TypedDict):
@@ -41,6 +55,8 @@ class ExecutionResult(TypedDict):
     success: bool  # 是否成功
     result: Any  # 执行结果
     error: Optional[str]  # 错误信息（如果有）
+    tool_outputs: NotRequired[List[str]]  # 子agent本步骤的工具输出（用于进度事件）
+    mutation_output: NotRequired[Optional[Dict[str, Any]]]  # 本步骤最后一次增删改工具调用：{"success", "output"}（用于模板化汇总）
 
 
 class SupervisorState(AgentState):
@@ -54,12 +70,13 @@ class SupervisorState(AgentState):
     # 执行计划相关
     plan: Optional[ExecutionPlan]  # 当前执行计划
     current_step: int  # 当前执行步骤索引（从0开始）
+    ready_steps: List[int]  # 依赖已满足、本轮要执行的步骤索引
     
     # 执行结果相关
     execution_results: Annotated[List[ExecutionResult], merge_execution_results]  # 所有步骤的执行结果
     
     # 路由相关
-    selected_agent: Optional[Literal["task", "schedule", "note"]]  # 当前选中的子agent类型
+    selected_agent: Optional[Literal["task", "schedule", "note", "parallel"]]  # 当前选中的子agent类型（parallel表示并行执行多个步骤）
     
     # 上下文相关
     agent_context: Dict[str, Any]  # 传递给子agent的上下文信息
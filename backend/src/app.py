@@ -1,11 +1,15 @@
+# 必须最先导入：记录之后所有模块的导入耗时（/api/health 展示）
+from .startup_profiler import import_profiler, FAST_START
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+import logging
 import os
 from contextlib import AsyncExitStack, asynccontextmanager
 from dotenv import load_dotenv
 from .services import TaskService, ConversationService
 from .services.admin_init_service import admin_init_service
-from .agents import graph as supervisor_graph
+from .connection_pool import pool_manager
+from .agents import agent_runtime
 from .routes import create_api_routes
 from .routes.auth import create_auth_routes
 from .routes.admin import create_admin_routes
@@ -17,6 +21,27 @@ from .routes.smart_search import router as smart_search_router
 # Load environment variables from .env file
 load_dotenv()
 
+# 日志配置：第三方库只输出WARNING及以上，本应用的日志级别由 LOG_LEVEL 控制
+logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger(__package__).setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
+
+
+def _preload_optional_subsystems() -> None:
+    """预加载可选子系统，避免首个请求承担导入开销（FAST_START模式下跳过）"""
+    import importlib
+    for module_name in (
+        ".services.smart_search_service",
+        ".services.analytics_service",
+        "assistant_stream",
+        "assistant_stream.serialization",
+        "celery.app",
+    ):
+        try:
+            importlib.import_module(module_name, __package__)
+        except Exception as e:
+            logger.warning("预加载 %s 失败: %s", module_name, e)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -26,11 +51,13 @@ async def lifespan(app: FastAPI):
     
     # 初始化数据库架构和管理员账户
     print("📊 正在初始化数据库架构...")
-    schema_ok = await admin_init_service.initialize_database_schema()
+    with agent_runtime.phase("database_schema"):
+        schema_ok = await admin_init_service.initialize_database_schema()
     
     if schema_ok:
         print("👤 正在检查管理员账户...")
-        admin_ok = await admin_init_service.ensure_admin_exists()
+        with agent_runtime.phase("admin_account"):
+            admin_ok = await admin_init_service.ensure_admin_exists()
         
         if admin_ok:
             print("✅ 管理员账户检查完成")
@@ -39,12 +66,26 @@ async def lifespan(app: FastAPI):
     else:
         print("❌ 数据库架构初始化失败")
     
-    print("🎉 AI Native 智能工作台启动完成！")
+    if FAST_START:
+        print("⚡ FAST_START 模式：可选子系统将在首次使用时加载")
+    else:
+        with agent_runtime.phase("optional_subsystems"):
+            _preload_optional_subsystems()
+    
+    # 在后台构建Supervisor Graph（共享LLM、store、checkpointer），yield之后才开始执行：
+    # 应用先开始接收请求，构建完成前 /api/ready 和聊天接口返回503 + Retry-After，失败时退避重试
+    print("🤖 正在后台初始化 AI Agent...")
+    agent_runtime.start_in_background()
+    
+    total_ms = sum(agent_runtime.startup_phases.values())
+    print(f"🎉 AI Native 智能工作台启动完成！（{total_ms:.1f}ms，AI Agent 初始化中）")
     
     yield
     
     # 关闭时执行
     print("Shutting down AI Native 智能工作台...")
+    await agent_runtime.stop()
+    await pool_manager.close()
 
 
 class AITodoApp:
@@ -84,6 +125,7 @@ class AITodoApp:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-Next-Cursor", "Retry-After"],  # 任务分页游标、聊天准入重试间隔
         )
       
     def _setup_routes(self):
@@ -93,7 +135,7 @@ class AITodoApp:
             print("Creating API routes...")
             api_router = create_api_routes(
                 self.task_service,
-                supervisor_graph,
+                agent_runtime,
                 self.conversation_service
             )
             self.app.include_router(api_router, prefix="/api")
@@ -0,0 +1,253 @@
+"""
+聊天请求准入控制
+限制每个worker同时运行的supervisor graph数量，避免突发流量同时打满LLM提供商限流和数据库连接池
+
+- 全局最多 CHAT_MAX_IN_FLIGHT 个运行中的聊天请求
+- 同一用户同时只运行一个请求，其余请求排队（每个用户最多排队 CHAT_MAX_QUEUED_PER_USER 个）；
+  匿名请求（user_key为None）没有可靠的用户标识（经nginx代理后客户端地址都是代理的地址），只受全局上限约束
+- 名额释放时按到达顺序唤醒等待者，跳过已有运行中请求的用户，保证用户间公平
+- 排队总数达到 CHAT_MAX_QUEUE 或等待超时时立即拒绝，由接口返回429和Retry-After
+
+另外记录已准入运行的结果（完成/客户端断开取消/失败），取消时记录所在节点
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+# 同时运行的聊天请求上限（每个worker）
+CHAT_MAX_IN_FLIGHT = int(os.getenv("CHAT_MAX_IN_FLIGHT", "16"))
+# 排队等待的请求总数上限，超出后直接拒绝
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+# 每个用户最多排队的请求数（不含运行中的一个）
+CHAT_MAX_QUEUED_PER_USER = int(os.getenv("CHAT_MAX_QUEUED_PER_USER", "2"))
+# 排队等待超时（秒）
+CHAT_QUEUE_TIMEOUT_SECONDS = float(os.getenv("CHAT_QUEUE_TIMEOUT_SECONDS", "30"))
+# 拒绝时建议客户端重试的间隔（秒）
+CHAT_RETRY_AFTER_SECONDS = int(os.getenv("CHAT_RETRY_AFTER_SECONDS", "5"))
+
+
+class ChatAdmissionRejected(Exception):
+    """聊天请求未获准入（队列已满或等待超时）"""
+
+    def __init__(self, reason: str, retry_after: int = CHAT_RETRY_AFTER_SECONDS):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class ChatAdmissionTicket:
+    """已获准入的聊天请求，运行结束时必须release（可重复调用）"""
+
+    def __init__(self, controller: "ChatAdmissionController", user_key: Optional[str], wait_ms: float):
+        self._controller = controller
+        self.user_key = user_key
+        self.wait_ms = wait_ms
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self._controller._release(self.user_key)
+
+
+class ChatAdmissionController:
+    """聊天请求准入控制器（进程级，所有方法在事件循环线程中调用）"""
+
+    def __init__(
+        self,
+        max_in_flight: int = CHAT_MAX_IN_FLIGHT,
+        max_queue: int = CHAT_MAX_QUEUE,
+        max_queued_per_user: int = CHAT_MAX_QUEUED_PER_USER,
+        queue_timeout: float = CHAT_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.max_queued_per_user = max(0, max_queued_per_user)
+        self.queue_timeout = queue_timeout
+        self._active_users: set = set()
+        self._waiters: Deque[Any] = deque()  # [user_key, future]
+        self._queued_per_user: Dict[str, int] = {}
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.peak_queue_depth = 0
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"queue_full": 0, "user_queue_full": 0, "timeout": 0}
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _can_run(self, user_key: Optional[str]) -> bool:
+        return self.in_flight < self.max_in_flight and user_key not in self._active_users
+
+    def _start(self, user_key: Optional[str]) -> None:
+        if user_key is not None:
+            self._active_users.add(user_key)
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _reject(self, reason: str) -> ChatAdmissionRejected:
+        self.rejected[reason] += 1
+        return ChatAdmissionRejected(reason)
+
+    async def acquire(self, user_key: Optional[str]) -> ChatAdmissionTicket:
+        """获取运行名额；需要排队时等待，队列已满或等待超时抛出 ChatAdmissionRejected
+
+        Args:
+            user_key: 用户标识，None 表示匿名请求（不做按用户的限制）
+        """
+        start = time.perf_counter()
+        # 名额释放时会立即唤醒可运行的等待者，仍在排队的都是被同用户运行中请求阻塞的，
+        # 所以这里直接运行不会插队
+        if self._can_run(user_key):
+            self._start(user_key)
+            return self._admit(user_key, start)
+
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        if user_key is not None and self._queued_per_user.get(user_key, 0) >= self.max_queued_per_user:
+            raise self._reject("user_queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        waiter = [user_key, future]
+        self._waiters.append(waiter)
+        if user_key is not None:
+            self._queued_per_user[user_key] = self._queued_per_user.get(user_key, 0) + 1
+        self.queued += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, len(self._waiters))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 超时/取消与唤醒同时发生：名额已分配，交还给下一个等待者
+                self._release(user_key)
+            else:
+                future.cancel()
+                self._remove_waiter(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject("timeout")
+        return self._admit(user_key, start)
+
+    def _admit(self, user_key: Optional[str], start: float) -> ChatAdmissionTicket:
+        wait_ms = (time.perf_counter() - start) * 1000
+        self.admitted += 1
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        return ChatAdmissionTicket(self, user_key, wait_ms)
+
+    def _remove_waiter(self, waiter) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            return
+        self._dequeued(waiter[0])
+
+    def _dequeued(self, user_key: Optional[str]) -> None:
+        if user_key is None:
+            return
+        remaining = self._queued_per_user.get(user_key, 0) - 1
+        if remaining > 0:
+            self._queued_per_user[user_key] = remaining
+        else:
+            self._queued_per_user.pop(user_key, None)
+
+    def _release(self, user_key: Optional[str]) -> None:
+        self._active_users.discard(user_key)
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """按到达顺序唤醒可以运行的等待者（跳过已有运行中请求的用户）"""
+        if not self._waiters or self.in_flight >= self.max_in_flight:
+            return
+        for waiter in list(self._waiters):
+            if self.in_flight >= self.max_in_flight:
+                break
+            user_key, future = waiter
+            if future.done() or user_key in self._active_users:
+                continue
+            self._waiters.remove(waiter)
+            self._dequeued(user_key)
+            self._start(user_key)
+            future.set_result(None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取准入统计（运行数、队列深度、等待耗时、拒绝次数）"""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "avg_wait_ms": round(self.total_wait_ms / self.admitted, 2) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait_ms, 2),
+        }
+
+
+class ChatRunStats:
+    """聊天运行结果统计（完成/取消/失败，取消时所在节点）"""
+
+    def __init__(self, recent_size: int = 50):
+        self.completed = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.cancelled_by_node: Dict[str, int] = {}
+        self.recent_cancellations: deque = deque(maxlen=recent_size)
+
+    def record_completed(self) -> None:
+        self.completed += 1
+
+    def record_failed(self) -> None:
+        self.failed += 1
+
+    def record_cancelled(self, thread_id: str, reason: str, emitter: Any) -> None:
+        """记录一次取消：取消时正在运行的节点（没有则为最后完成的节点）
+
+        Args:
+            emitter: 本次运行的ChatStreamEmitter（提供运行中节点和已运行时间）
+        """
+        nodes = emitter.running_nodes or ([emitter.last_node] if emitter.last_node else [])
+        self.cancelled += 1
+        for node in nodes or ["<start>"]:
+            self.cancelled_by_node[node] = self.cancelled_by_node.get(node, 0) + 1
+        self.recent_cancellations.append({
+            "thread_id": thread_id,
+            "reason": reason,
+            "nodes": nodes,
+            "elapsed_ms": round(emitter.elapsed_ms, 1),
+            "text_chars": emitter.text_chars,
+            "at": time.time(),
+        })
+        logger.warning("Assistant-UI Chat: 运行已取消（%s），所在节点 %s，已运行 %.1fms，thread_id=%s",
+                       reason, nodes or '未开始', emitter.elapsed_ms, thread_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "cancelled_by_node": dict(self.cancelled_by_node),
+            "recent_cancellations": list(self.recent_cancellations),
+        }
+
+
+
+# 全局聊天准入控制器
+chat_admission = ChatAdmissionController()
+# 全局聊天运行统计
+chat_run_stats = ChatRunStats()
@@ -0,0 +1,268 @@
+"""
+数据库连接池管理
+进程内所有PostgreSQL连接的唯一来源：
+- async：SQLAlchemy异步引擎（asyncpg），供业务服务和路由使用
+- sync：SQLAlchemy同步引擎（psycopg2），供Sync*服务共享
+- checkpoint：psycopg异步连接池，供LangGraph AsyncPostgresSaver使用（在应用lifespan中打开）
+- store：psycopg同步连接池，供消息历史store使用
+
+各消费方的连接配额之和受全局上限约束，并提供连接池饱和度指标
+"""
+
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+try:
+    from psycopg.rows import dict_row
+    from psycopg_pool import AsyncConnectionPool, ConnectionPool
+except ImportError as e:
+    logger.warning("Could not import psycopg_pool: %s", e)
+    dict_row = None
+    AsyncConnectionPool = None
+    ConnectionPool = None
+
+
+# 数据库配置
+POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
+POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
+POSTGRES_DB = os.getenv("POSTGRES_DB", "ai_todo_db")
+POSTGRES_USER = os.getenv("POSTGRES_USER", "ai_todo_user")
+POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "ai_todo_password")
+
+_CREDENTIALS = f"{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+ASYNC_DATABASE_URL = f"postgresql+asyncpg://{_CREDENTIALS}"
+SYNC_DATABASE_URL = f"postgresql://{_CREDENTIALS}"
+PSYCOPG_CONNINFO = f"postgresql://{_CREDENTIALS}"
+
+# 连接池配置：单进程最多占用的连接数，以及各消费方的配额（常驻 + 溢出）
+DB_POOL_GLOBAL_MAX_CONNECTIONS = int(os.getenv("DB_POOL_GLOBAL_MAX_CONNECTIONS", "30"))
+DB_POOL_ASYNC_SIZE = int(os.getenv("DB_POOL_ASYNC_SIZE", "10"))
+DB_POOL_ASYNC_MAX_OVERFLOW = int(os.getenv("DB_POOL_ASYNC_MAX_OVERFLOW", "10"))
+DB_POOL_SYNC_SIZE = int(os.getenv("DB_POOL_SYNC_SIZE", "2"))
+DB_POOL_SYNC_MAX_OVERFLOW = int(os.getenv("DB_POOL_SYNC_MAX_OVERFLOW", "3"))
+DB_POOL_CHECKPOINT_MIN_SIZE = int(os.getenv("DB_POOL_CHECKPOINT_MIN_SIZE", "1"))
+DB_POOL_CHECKPOINT_MAX_SIZE = int(os.getenv("DB_POOL_CHECKPOINT_MAX_SIZE", "4"))
+DB_POOL_STORE_MAX_SIZE = int(os.getenv("DB_POOL_STORE_MAX_SIZE", "1"))
+# 获取连接的等待超时（秒）
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# psycopg连接池启动时等待首批连接建立的超时（秒）
+DB_POOL_CONNECT_TIMEOUT = float(os.getenv("DB_POOL_CONNECT_TIMEOUT", "5"))
+
+
+def _fit_quotas(quotas: Dict[str, Dict[str, int]], global_max: int) -> Dict[str, Dict[str, int]]:
+    """配额之和超过全局上限时按比例缩减（每个消费方至少保留1个常驻连接）"""
+    total = sum(sum(quota.values()) for quota in quotas.values())
+    if total <= global_max:
+        return quotas
+
+    logger.warning("连接池配额总和 %s 超过全局上限 %s，按比例缩减", total, global_max)
+    ratio = global_max / total
+    fitted = {}
+    for name, quota in quotas.items():
+        fitted[name] = {key: int(value * ratio) for key, value in quota.items()}
+        primary = next(iter(quota))
+        fitted[name][primary] = max(1, fitted[name][primary])
+    return fitted
+
+
+class _EngineCounters:
+    """SQLAlchemy连接池的checkout计数（用于饱和度指标）"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.checkouts = 0
+        self.peak_in_use = 0
+        self.saturated_checkouts = 0  # 取出连接时池已满（之后的请求只能排队等待）
+
+    def attach(self, engine: Engine) -> None:
+        pool = engine.pool
+
+        @event.listens_for(engine, "checkout")
+        def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+            in_use = pool.checkedout()
+            self.checkouts += 1
+            self.peak_in_use = max(self.peak_in_use, in_use)
+            if in_use >= self.capacity:
+                self.saturated_checkouts += 1
+
+
+class ConnectionPoolManager:
+    """进程级数据库连接池管理器
+
+    各连接池按需创建，配额在创建管理器时根据全局上限确定
+    """
+
+    def __init__(self, global_max: int = DB_POOL_GLOBAL_MAX_CONNECTIONS):
+        self.global_max = global_max
+        self.quotas = _fit_quotas({
+            "async": {"pool_size": DB_POOL_ASYNC_SIZE, "max_overflow": DB_POOL_ASYNC_MAX_OVERFLOW},
+            "sync": {"pool_size": DB_POOL_SYNC_SIZE, "max_overflow": DB_POOL_SYNC_MAX_OVERFLOW},
+            "checkpoint": {"max_size": DB_POOL_CHECKPOINT_MAX_SIZE},
+            "store": {"max_size": DB_POOL_STORE_MAX_SIZE},
+        }, global_max)
+        self._async_engine: Optional[AsyncEngine] = None
+        self._sync_engine: Optional[Engine] = None
+        self._checkpoint_pool = None
+        self._store_pool = None
+        self._counters: Dict[str, _EngineCounters] = {}
+
+    def get_async_engine(self) -> AsyncEngine:
+        """获取共享的SQLAlchemy异步引擎"""
+        if self._async_engine is None:
+            quota = self.quotas["async"]
+            self._async_engine = create_async_engine(
+                ASYNC_DATABASE_URL,
+                echo=False,  # 设置为True可以看到SQL语句
+                pool_size=quota["pool_size"],
+                max_overflow=quota["max_overflow"],
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+            )
+            self._counters["async"] = _EngineCounters(quota["pool_size"] + quota["max_overflow"])
+            self._counters["async"].attach(self._async_engine.sync_engine)
+        return self._async_engine
+
+    def get_sync_engine(self) -> Engine:
+        """获取共享的SQLAlchemy同步引擎（Sync*服务共用）"""
+        if self._sync_engine is None:
+            quota = self.quotas["sync"]
+            self._sync_engine = create_engine(
+                SYNC_DATABASE_URL,
+                echo=False,
+                pool_size=quota["pool_size"],
+                max_overflow=quota["max_overflow"],
+                pool_timeout=DB_POOL_TIMEOUT,
+                pool_pre_ping=True,
+                pool_recycle=3600,
+            )
+            self._counters["sync"] = _EngineCounters(quota["pool_size"] + quota["max_overflow"])
+            self._counters["sync"].attach(self._sync_engine)
+        return self._sync_engine
+
+    @staticmethod
+    def _psycopg_pool_kwargs() -> Dict[str, Any]:
+        # 按LangGraph PostgresSaver的要求配置连接（autocommit、dict_row、关闭prepared statements）
+        return {"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row}
+
+    async def open_checkpoint_pool(self):
+        """打开checkpointer使用的psycopg异步连接池（需在事件循环中调用，如应用lifespan）
+
+        首批连接在 DB_POOL_CONNECT_TIMEOUT 内未建立时抛出异常
+        """
+        if AsyncConnectionPool is None:
+            raise ImportError("psycopg_pool 不可用，请安装 langgraph-checkpoint-postgres")
+        if self._checkpoint_pool is None:
+            max_size = self.quotas["checkpoint"]["max_size"]
+            pool = AsyncConnectionPool(
+                PSYCOPG_CONNINFO,
+                min_size=min(DB_POOL_CHECKPOINT_MIN_SIZE, max_size),
+                max_size=max_size,
+                timeout=DB_POOL_TIMEOUT,
+                kwargs=self._psycopg_pool_kwargs(),
+                name="checkpoint",
+                open=False,
+            )
+            try:
+                await pool.open(wait=True, timeout=DB_POOL_CONNECT_TIMEOUT)
+            except Exception:
+                await pool.close()
+                raise
+            self._checkpoint_pool = pool
+        return self._checkpoint_pool
+
+    def get_store_pool(self):
+        """获取store使用的psycopg同步连接池
+
+        首批连接在 DB_POOL_CONNECT_TIMEOUT 内未建立时抛出异常
+        """
+        if ConnectionPool is None:
+            raise ImportError("psycopg_pool 不可用，请安装 langgraph-checkpoint-postgres")
+        if self._store_pool is None:
+            max_size = self.quotas["store"]["max_size"]
+            pool = ConnectionPool(
+                PSYCOPG_CONNINFO,
+                min_size=max_size,
+                max_size=max_size,
+                timeout=DB_POOL_TIMEOUT,
+                kwargs=self._psycopg_pool_kwargs(),
+                name="store",
+                open=False,
+            )
+            pool.open()
+            try:
+                pool.wait(timeout=DB_POOL_CONNECT_TIMEOUT)
+            except Exception:
+                pool.close()
+                raise
+            self._store_pool = pool
+        return self._store_pool
+
+    @staticmethod
+    def _psycopg_pool_stats(pool) -> Dict[str, Any]:
+        pool_stats = pool.get_stats()
+        capacity = pool.max_size
+        in_use = pool_stats.get("pool_size", 0) - pool_stats.get("pool_available", 0)
+        return {
+            "capacity": capacity,
+            "in_use": in_use,
+            "idle": pool_stats.get("pool_available", 0),
+            "saturation": round(in_use / capacity, 4) if capacity else 0.0,
+            "requests_waiting": pool_stats.get("requests_waiting", 0),
+            "requests_queued": pool_stats.get("requests_queued", 0),
+            "requests_errors": pool_stats.get("requests_errors", 0),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取各连接池的使用情况和饱和度"""
+        stats: Dict[str, Any] = {
+            "global_max_connections": self.global_max,
+            "quotas": self.quotas,
+            "pools": {},
+        }
+        for name, engine in (("async", self._async_engine and self._async_engine.sync_engine), ("sync", self._sync_engine)):
+            if engine is None:
+                continue
+            pool = engine.pool
+            counters = self._counters[name]
+            in_use = pool.checkedout()
+            stats["pools"][name] = {
+                "capacity": counters.capacity,
+                "in_use": in_use,
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "saturation": round(in_use / counters.capacity, 4) if counters.capacity else 0.0,
+                "peak_in_use": counters.peak_in_use,
+                "checkouts": counters.checkouts,
+                "saturated_checkouts": counters.saturated_checkouts,
+            }
+        for name, pool in (("checkpoint", self._checkpoint_pool), ("store", self._store_pool)):
+            if pool is not None:
+                stats["pools"][name] = self._psycopg_pool_stats(pool)
+        stats["connections_in_use"] = sum(pool["in_use"] for pool in stats["pools"].values())
+        return stats
+
+    async def close(self) -> None:
+        """关闭所有连接池（应用关闭时调用）"""
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+        if self._sync_engine is not None:
+            self._sync_engine.dispose()
+        if self._checkpoint_pool is not None:
+            await self._checkpoint_pool.close()
+            self._checkpoint_pool = None
+        if self._store_pool is not None:
+            self._store_pool.close()
+            self._store_pool = None
+        logger.info("数据库连接池已关闭")
+
+
+# 全局连接池管理器实例
+pool_manager = ConnectionPoolManager()
@@ -1,30 +1,17 @@
 import os
 import asyncio
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import declarative_base
 from sqlalchemy import MetaData
 from contextlib import asynccontextmanager
-
-# 数据库配置
-POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
-POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
-POSTGRES_DB = os.getenv("POSTGRES_DB", "ai_todo_db")
-POSTGRES_USER = os.getenv("POSTGRES_USER", "ai_todo_user")
-POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "ai_todo_password")
+from .connection_pool import pool_manager, ASYNC_DATABASE_URL
 
 # 构建数据库URL
-DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+DATABASE_URL = ASYNC_DATABASE_URL
 
-# 创建异步引擎
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=False,  # 设置为True可以看到SQL语句
-    pool_size=10,
-    max_overflow=20,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-)
+# 异步引擎由连接池管理器统一创建（连接配额见 connection_pool.py）
+engine = pool_manager.get_async_engine()
 
 # 创建会话工厂
 AsyncSessionLocal = sessionmaker(
@@ -5,20 +5,25 @@ Celery 客户端（后端轻依赖）。
 
 import os
 from typing import Any, List
-from celery import Celery
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Celery应用在首次发送任务时创建并复用（celery只在需要时导入）
+_celery_app = None
 
-def _get_celery_app() -> Celery:
-    host = os.getenv("REDIS_HOST", "redis")
-    port = os.getenv("REDIS_PORT", "6379")
-    db = os.getenv("REDIS_DB", "0")
-    broker = f"redis://{host}:{port}/{db}"
-    backend = broker
-    app = Celery("ai_todo_client", broker=broker, backend=backend)
-    return app
+
+def _get_celery_app():
+    global _celery_app
+    if _celery_app is None:
+        from celery import Celery
+        host = os.getenv("REDIS_HOST", "redis")
+        port = os.getenv("REDIS_PORT", "6379")
+        db = os.getenv("REDIS_DB", "0")
+        broker = f"redis://{host}:{port}/{db}"
+        backend = broker
+        _celery_app = Celery("ai_todo_client", broker=broker, backend=backend)
+    return _celery_app
 
 
 def _send_task(task_name: str, args: List[Any]) -> None:
@@ -38,3 +43,6 @@ def enqueue_delete_note(note_id: int, user_id: int) -> None:
     _send_task("src.tasks.note_sync_tasks.delete_note_from_vector_db", [note_id, user_id])
 
 
+def enqueue_sync_notes_batch(user_id: int, note_ids: List[int], deleted_note_ids: List[int]) -> None:
+    """批量操作后只派发一个任务：同步 note_ids、删除 deleted_note_ids 对应的向量数据"""
+    _send_task("src.tasks.note_sync_tasks.sync_notes_batch", [user_id, note_ids, deleted_note_ids])
@@ -0,0 +1,33 @@
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Literal, Optional
+
+
+class BulkOperation(BaseModel):
+    """单个批量操作"""
+    op: Literal["create", "update", "delete"] = Field(..., description="操作类型")
+    id: Optional[int] = Field(None, description="资源ID（update/delete必填）")
+    data: Optional[Dict[str, Any]] = Field(None, description="资源字段（create/update使用，与单条接口的请求体相同）")
+
+
+class BulkRequest(BaseModel):
+    """批量操作请求模型"""
+    operations: List[BulkOperation] = Field(..., description="操作列表，同一批次在一个事务中执行")
+
+
+class BulkItemResult(BaseModel):
+    """单个操作的执行结果"""
+    index: int = Field(..., description="操作在请求中的位置")
+    op: str
+    success: bool
+    id: Optional[int] = None
+    error: Optional[str] = None
+    item: Optional[Dict[str, Any]] = Field(None, description="创建/更新后的资源")
+
+
+class BulkResponse(BaseModel):
+    """批量操作响应模型"""
+    results: List[BulkItemResult]
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    failed: int = 0
@@ -25,6 +25,7 @@ class TaskDB(Base):
         Index('idx_tasks_user_id', 'user_id'),
         Index('idx_tasks_created_at', 'created_at'),
         Index('idx_tasks_is_complete', 'is_complete'),
+        Index('idx_tasks_user_id_id', 'user_id', 'id'),  # 按用户的keyset分页（WHERE user_id = ? AND id > ? ORDER BY id）
     )
 
 
@@ -212,4 +213,5 @@ class NoteDB(Base):
         Index('idx_notes_updated_at', 'updated_at'),
         Index('idx_notes_user_category', 'user_id', 'category'),
         Index('idx_notes_user_pinned', 'user_id', 'is_pinned'),
+        Index('idx_notes_user_created', 'user_id', 'created_at'),
     )
@@ -70,7 +70,7 @@ class NoteSearchRequest(BaseModel):
     is_archived: Optional[bool] = Field(None, description="是否归档")
     page: int = Field(default=1, ge=1, description="页码")
     page_size: int = Field(default=20, ge=1, le=100, description="每页数量")
-    sort_by: str = Field(default="updated_at", description="排序字段")
+    sort_by: str = Field(default="updated_at", description="排序字段（relevance：按与关键词的相关度）")
     sort_order: str = Field(default="desc", description="排序方向")
 
 
@@ -1,14 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import Optional
-from ..services.analytics_service import AnalyticsService
 from ..models.analytics import AnalyticsRequest, AnalyticsResponse, TimeRange
 from ..auth.dependencies import get_current_user
 from ..models.auth import User
 
 router = APIRouter()
 
-# 创建分析服务实例
-analytics_service = AnalyticsService()
+# 分析服务实例（首次请求时创建）
+_analytics_service = None
+
+
+def _get_analytics_service():
+    """首次使用时才导入并创建分析服务"""
+    global _analytics_service
+    if _analytics_service is None:
+        from ..services.analytics_service import AnalyticsService
+        _analytics_service = AnalyticsService()
+    return _analytics_service
 
 
 @router.get("/overview", response_model=AnalyticsResponse)
@@ -30,7 +38,7 @@ async def get_analytics_overview(
             include_charts=include_charts
         )
         
-        analytics_data = await analytics_service.get_analytics_overview(request)
+        analytics_data = await _get_analytics_service().get_analytics_overview(request)
         
         return AnalyticsResponse(
             success=True,
@@ -61,7 +69,7 @@ async def get_task_analytics(
             include_charts=False
         )
         
-        analytics_data = await analytics_service.get_analytics_overview(request)
+        analytics_data = await _get_analytics_service().get_analytics_overview(request)
         
         return AnalyticsResponse(
             success=True,
@@ -92,7 +100,7 @@ async def get_note_analytics(
             include_charts=False
         )
         
-        analytics_data = await analytics_service.get_analytics_overview(request)
+        analytics_data = await _get_analytics_service().get_analytics_overview(request)
         
         return AnalyticsResponse(
             success=True,
@@ -123,7 +131,7 @@ async def get_schedule_analytics(
             include_charts=False
         )
         
-        analytics_data = await analytics_service.get_analytics_overview(request)
+        analytics_data = await _get_analytics_service().get_analytics_overview(request)
         
         return AnalyticsResponse(
             success=True,
@@ -153,7 +161,7 @@ async def get_productivity_metrics(
             include_charts=False
         )
         
-        analytics_data = await analytics_service.get_analytics_overview(request)
+        analytics_data = await _get_analytics_service().get_analytics_overview(request)
         
         return AnalyticsResponse(
             success=True,
@@ -185,7 +193,7 @@ async def get_chart_data(
             include_charts=True
         )
         
-        analytics_data = await analytics_service.get_analytics_overview(request)
+        analytics_data = await _get_analytics_service().get_analytics_overview(request)
         
         # 如果指定了图表类型，过滤图表数据
         if chart_type:
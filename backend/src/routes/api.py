@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Any
+from fastapi import APIRouter, HTTPException, Depends, Response, Query
+from fastapi.responses import JSONResponse, StreamingResponse
+from typing import List, Any, AsyncIterator, Optional
+import asyncio
 import json
+import logging
+import os
 from datetime import datetime
 from ..models import (
     TaskItem, TaskCreateRequest, TaskUpdateRequest, ChatMessage, 
@@ -8,52 +12,187 @@ from ..models import (
     LanguageModelV1Message, FrontendToolCall
 )
 from ..services import TaskService, ConversationService
+from ..services.task_service import encode_task_cursor, decode_task_cursor
+from ..services.text_search import text_search
+from ..services.note_stats import note_stats_table
+from ..models.bulk import BulkRequest, BulkResponse
+from ..services.bulk_operations import BULK_MAX_OPERATIONS
 from ..auth.dependencies import get_current_active_user, get_optional_current_user
 from ..models.auth import User
+from ..agents.supervisor import intent_classifier
+from ..agents.supervisor.plan_cache import plan_cache
+from ..connection_pool import pool_manager
+from ..agents.checkpointer import checkpoint_stats, checkpoint_policy
+from ..startup_profiler import import_profiler, FAST_START
+from ..agents.llmconf import llm_registry
+from ..chat_admission import chat_admission, chat_run_stats, ChatAdmissionRejected
+
+logger = logging.getLogger(__name__)
+
+
+# GET /tasks 分页大小（未指定limit但带cursor时使用）和上限
+TASKS_PAGE_DEFAULT_LIMIT = int(os.getenv("TASKS_PAGE_DEFAULT_LIMIT", "50"))
+TASKS_PAGE_MAX_LIMIT = int(os.getenv("TASKS_PAGE_MAX_LIMIT", "500"))
+
+
+async def _stream_task_array(tasks: AsyncIterator[TaskItem]) -> AsyncIterator[bytes]:
+    """把任务逐条编码为JSON数组输出（与非流式响应格式相同）"""
+    yield b"["
+    first = True
+    try:
+        async for task in tasks:
+            yield (b"" if first else b",") + task.model_dump_json().encode()
+            first = False
+    except Exception as e:
+        # 响应头已发送，无法再返回错误状态码；记录后截断输出（客户端会得到不完整的JSON）
+        logger.warning("流式输出任务列表失败: %s", e)
+        return
+    yield b"]"
 
 
 def create_api_routes(
     task_service: TaskService,
-    supervisor_graph: Any,  # LangGraph compiled graph
+    agent_runtime: Any,  # AgentRuntime（graph在应用lifespan中构建）
     conversation_service: ConversationService
 ) -> APIRouter:
     """
     Create API router with resource management endpoints (Tasks, Schedules, Notes) and chat agent routes.
     
     Routes:
-    - GET    /tasks          : Retrieves all tasks
+    - GET    /tasks          : Retrieves tasks (filters: is_complete, created_after/before, title_prefix;
+                               keyset pagination via limit/cursor with X-Next-Cursor header; stream=true streams the array)
+    - GET    /tasks/search   : Fuzzy-searches task titles (pg_trgm similarity ranked)
     - POST   /tasks          : Creates a new task
+    - POST   /tasks/bulk     : Creates/updates/deletes up to BULK_MAX_OPERATIONS tasks in a single transaction
     - GET    /tasks/{id}     : Retrieves a task by its ID
     - PUT    /tasks/{id}     : Updates a task by its ID
     - DELETE /tasks/{id}     : Deletes a task by its ID
     - POST   /chat           : Processes a chat message using the LangGraph agent (Assistant-UI)
+    - GET    /ready          : Readiness probe (503 until the agent runtime has been built in the background after startup)
+    - GET    /metrics        : Runtime metrics (intent fast-path and plan cache hit rates, DB pool saturation, LLM concurrency, checkpoint write latency and volume, etc.)
     """
     router = APIRouter()
     
     @router.get("/health", operation_id="healthCheck", include_in_schema=False)
     async def health_check():
-        """Health check endpoint for Docker"""
-        return {"status": "healthy", "service": "AI-Powered-ToDo-List"}
+        """Health check endpoint for Docker（附带启动阶段耗时和模块导入耗时）"""
+        return {
+            "status": "healthy",
+            "service": "AI-Powered-ToDo-List",
+            "startup": {
+                "fast_start": FAST_START,
+                "phases_ms": dict(agent_runtime.startup_phases),
+                "imports": import_profiler.get_report(),
+            },
+        }
+    
+    @router.get("/ready", operation_id="readinessCheck", include_in_schema=False)
+    async def readiness_check():
+        """就绪检查：Agent运行时构建完成前返回503"""
+        status = agent_runtime.get_status()
+        if not status["ready"]:
+            return JSONResponse(status_code=503, content=status, headers={"Retry-After": "5"})
+        return status
+    
+    @router.get("/metrics", operation_id="getMetrics", include_in_schema=False)
+    async def get_metrics():
+        """运行时指标（意图快速分类、计划缓存命中率、数据库连接池饱和度、LLM并发、聊天准入队列、checkpoint写入耗时和写入量等）"""
+        compactor = agent_runtime.compactor
+        return {
+            "intent_classifier": intent_classifier.get_stats(),
+            "plan_cache": plan_cache.get_stats(),
+            "db_pool": pool_manager.get_stats(),
+            "llm": llm_registry.get_stats(),
+            "chat_admission": chat_admission.get_stats(),
+            "chat_runs": chat_run_stats.get_stats(),
+            "text_search": text_search.get_stats(),
+            "note_stats": note_stats_table.get_stats(),
+            "checkpointer": {
+                "enabled": agent_runtime.graph is not None and agent_runtime.graph.checkpointer is not None,
+                "writes": checkpoint_stats.get_stats(),
+                "policy": checkpoint_policy.get_stats(),
+                "compactor": compactor.get_stats() if compactor else None,
+            },
+        }
     
     @router.get(
         "/tasks",
         response_model=List[TaskItem],
         operation_id="getAllTasks",
-        description="Retrieve all tasks in the task list."
+        description=(
+            "Retrieve tasks in creation order, optionally filtered by completion state, created range and title prefix. "
+            "Pass limit (and the previous X-Next-Cursor value as cursor) for keyset pagination, "
+            "or stream=true to stream the JSON array without loading all tasks at once."
+        )
     )
-    async def get_all_tasks(current_user: User = Depends(get_optional_current_user)):
-        """Get all tasks"""
+    async def get_all_tasks(
+        response: Response,
+        current_user: User = Depends(get_optional_current_user),
+        limit: Optional[int] = Query(None, ge=1, le=TASKS_PAGE_MAX_LIMIT, description="Page size; enables pagination"),
+        cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+        is_complete: Optional[bool] = Query(None, description="Filter by completion state"),
+        created_after: Optional[datetime] = Query(None, description="Only tasks created at or after this time"),
+        created_before: Optional[datetime] = Query(None, description="Only tasks created before this time"),
+        title_prefix: Optional[str] = Query(None, description="Only tasks whose title starts with this text"),
+        stream: bool = Query(False, description="Stream the result as a JSON array"),
+    ):
+        """Get tasks (all, one page, or streamed)"""
         try:
             # 如果用户已登录，只获取该用户的任务；否则获取所有任务
             user_id = current_user.id if current_user else None
-            tasks = await task_service.get_all_tasks(user_id)
+            filters = dict(
+                is_complete=is_complete,
+                created_after=created_after,
+                created_before=created_before,
+                title_prefix=title_prefix,
+            )
+            
+            if stream:
+                return StreamingResponse(
+                    _stream_task_array(task_service.iter_tasks(user_id, **filters)),
+                    media_type="application/json",
+                )
+            
+            if limit is None and cursor is None:
+                return await task_service.get_all_tasks(user_id, **filters)
+            
+            try:
+                cursor_id = decode_task_cursor(cursor) if cursor else None
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            
+            tasks, next_cursor = await task_service.get_tasks_page(
+                user_id, limit=limit or TASKS_PAGE_DEFAULT_LIMIT, cursor=cursor_id, **filters
+            )
+            if next_cursor is not None:
+                response.headers["X-Next-Cursor"] = encode_task_cursor(next_cursor)
             return tasks
+        except HTTPException:
+            raise
         except Exception as e:
-            print(f"Error getting tasks: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error getting tasks: %s", e)
             raise HTTPException(status_code=500, detail=f"Failed to get tasks: {str(e)}")
     
+    @router.get(
+        "/tasks/search",
+        response_model=List[TaskItem],
+        operation_id="searchTasks",
+        description="Fuzzy-search tasks by title, ranked by similarity (contains matches first)."
+    )
+    async def search_tasks(
+        q: str = Query(..., min_length=1, description="Search text"),
+        limit: int = Query(20, ge=1, le=100),
+        is_complete: Optional[bool] = Query(None, description="Filter by completion state"),
+        current_user: User = Depends(get_optional_current_user),
+    ):
+        """Search tasks by title"""
+        try:
+            user_id = current_user.id if current_user else None
+            return await task_service.search_tasks(q, user_id, limit, is_complete)
+        except Exception as e:
+            logger.error("Error searching tasks: %s", e)
+            raise HTTPException(status_code=500, detail=f"Failed to search tasks: {str(e)}")
+    
     @router.post(
         "/tasks",
         response_model=TaskItem,
@@ -78,11 +217,26 @@ def create_api_routes(
         except HTTPException:
             raise
         except Exception as e:
-            print(f"Error creating task: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error creating task: %s", e)
             raise HTTPException(status_code=500, detail=f"Failed to create task: {str(e)}")
     
+    @router.post(
+        "/tasks/bulk",
+        response_model=BulkResponse,
+        operation_id="bulkTasks",
+        description="Create, update or delete many tasks in a single transaction, returning a result per operation."
+    )
+    async def bulk_tasks(bulk_request: BulkRequest, current_user: User = Depends(get_optional_current_user)):
+        """Execute a batch of task operations"""
+        if len(bulk_request.operations) > BULK_MAX_OPERATIONS:
+            raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_OPERATIONS} operations per request")
+        try:
+            user_id = current_user.id if current_user else None
+            return await task_service.bulk_operations(bulk_request.operations, user_id)
+        except Exception as e:
+            logger.exception("Error executing bulk task operations: %s", e)
+            raise HTTPException(status_code=500, detail=f"Failed to execute bulk operations: {str(e)}")
+    
     @router.get(
         "/tasks/{task_id}",
         response_model=TaskItem,
@@ -156,10 +310,33 @@ def create_api_routes(
         current_user: User = Depends(get_optional_current_user)
     ):
         """Assistant-UI 聊天端点"""
+        if not agent_runtime.ready:
+            # graph仍在后台构建（或重试中），提示客户端稍后重试
+            raise HTTPException(
+                status_code=503,
+                detail="AI agent is starting up, please retry shortly",
+                headers={"Retry-After": "5"}
+            )
+        
+        # 准入控制：限制同时运行的graph数，同一用户同时只运行一个请求，队列满时快速返回429；
+        # 匿名请求只受全局上限约束（nginx代理后 client.host 是代理地址，不能区分用户）
+        user_key = f"user:{current_user.id}" if current_user else None
+        try:
+            ticket = await chat_admission.acquire(user_key)
+        except ChatAdmissionRejected as e:
+            logger.warning("Assistant-UI Chat: 拒绝请求 %s（%s），排队中 %s 个", user_key or 'anonymous', e.reason, chat_admission.queue_depth)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many chat requests, please retry shortly",
+                headers={"Retry-After": str(e.retry_after)}
+            )
+        if ticket.wait_ms >= 1:
+            logger.debug("Assistant-UI Chat: %s 排队 %.1fms 后开始运行", user_key or 'anonymous', ticket.wait_ms)
+        
         try:
-            # 使用 assistant-stream 的 DataStreamResponse
-            from assistant_stream import create_run, RunController
-            from assistant_stream.serialization import DataStreamResponse
+            # 使用 assistant-stream 的 DataStream 协议（扩展了进度事件数据分片）
+            from assistant_stream import RunController
+            from .chat_stream import CancellableRun, ChatStreamEmitter, ProgressDataStreamResponse
             from langchain_core.messages import (
                 HumanMessage, AIMessageChunk, AIMessage, ToolMessage,
                 SystemMessage, BaseMessage
@@ -229,116 +406,51 @@ def create_api_routes(
             }
             
             async def run(controller: RunController):
-                tool_calls = {}
-                tool_calls_by_idx = {}
-                # 跟踪已发送的内容，避免重复
-                sent_content_set = set()
-                # 跟踪每个节点的已发送内容长度，用于去重
-                node_sent_length = {}
-                
-                print(f"[DEBUG] Assistant-UI Chat: 开始处理请求，user_id={current_user_id}")
+                # 流事件 -> 文本增量、工具调用和进度事件
+                emitter = ChatStreamEmitter(controller)
+                logger.debug("Assistant-UI Chat: 开始处理请求，user_id=%s", current_user_id)
                 
-                # 使用 stream_mode="messages" 来流式传输消息
                 # 配置参数
+                thread_id = f"assistant_ui_{current_user_id or 'anonymous'}_{datetime.now().timestamp()}"
                 config = {
                     "configurable": {
                         "system": request.system,
                         "frontend_tools": request.tools,
-                        "thread_id": f"assistant_ui_{current_user_id or 'anonymous'}_{datetime.now().timestamp()}",
+                        "thread_id": thread_id,
                     }
                 }
                 
-                # stream_mode="messages" 可能返回单个消息对象或 (message, metadata) 元组
-                async for event in supervisor_graph.astream(
-                    initial_state,
-                    config,
-                    stream_mode="messages",
-                ):
-                    # 处理返回值：可能是单个消息对象或 (message, metadata) 元组
-                    if isinstance(event, tuple) and len(event) == 2:
-                        msg, metadata = event
-                    else:
-                        msg = event
-                        metadata = {}
-                    
-                    # 从 metadata 中获取节点名称
-                    node_name = metadata.get("langgraph_node", "") if isinstance(metadata, dict) else ""
-                    
-                    print(f"[DEBUG] Assistant-UI Chat: 收到消息类型={type(msg).__name__}, node={node_name}, content={getattr(msg, 'content', 'N/A')[:100] if hasattr(msg, 'content') else 'N/A'}")
-                    
-                    # 处理工具消息
-                    if isinstance(msg, ToolMessage):
-                        print(f"[DEBUG] Assistant-UI Chat: 处理 ToolMessage, tool_call_id={msg.tool_call_id}")
-                        if msg.tool_call_id in tool_calls:
-                            tool_controller = tool_calls[msg.tool_call_id]
-                            tool_controller.set_result(msg.content)
-                        else:
-                            print(f"[WARNING] Tool call ID {msg.tool_call_id} not found in tool_calls")
-                    
-                    # 处理 AI 消息（包括流式文本和工具调用）
-                    if isinstance(msg, AIMessageChunk) or isinstance(msg, AIMessage):
-                        content = msg.content if hasattr(msg, 'content') else None
-                        
-                        # 只发送来自 aggregate 或 simple_response 节点的最终响应
-                        # 这些节点是生成最终用户可见回答的节点
-                        is_final_response = node_name in ("aggregate", "simple_response")
-                        
-                        # 处理工具调用（所有节点的工具调用都需要显示）
-                        if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                            for tool_call in msg.tool_calls:
-                                tool_call_id = tool_call.get("id") if isinstance(tool_call, dict) else getattr(tool_call, "id", None)
-                                tool_name = tool_call.get("name") if isinstance(tool_call, dict) else getattr(tool_call, "name", None)
-                                
-                                if tool_call_id and tool_name:
-                                    if tool_call_id not in tool_calls:
-                                        tool_controller = await controller.add_tool_call(tool_name, tool_call_id)
-                                        tool_calls[tool_call_id] = tool_controller
-                                        
-                                        # 添加工具参数
-                                        tool_args = tool_call.get("args") if isinstance(tool_call, dict) else getattr(tool_call, "args", None)
-                                        if tool_args:
-                                            tool_controller.append_args_text(str(tool_args) if not isinstance(tool_args, str) else tool_args)
-                                    else:
-                                        # 如果工具调用已存在，更新参数
-                                        tool_controller = tool_calls[tool_call_id]
-                                        tool_args = tool_call.get("args") if isinstance(tool_call, dict) else getattr(tool_call, "args", None)
-                                        if tool_args:
-                                            tool_controller.append_args_text(str(tool_args) if not isinstance(tool_args, str) else tool_args)
-                        
-                        # 只发送最终响应节点的文本内容，忽略中间节点的思考过程
-                        if content and is_final_response:
-                            content_str = str(content) if content else ""
-                            
-                            # 对于完整的 AIMessage，检查是否已经发送过
-                            if isinstance(msg, AIMessage) and not isinstance(msg, AIMessageChunk):
-                                # 检查完整内容是否已发送
-                                if content_str not in sent_content_set:
-                                    print(f"[DEBUG] Assistant-UI Chat: 发送最终响应 (node={node_name}): {content_str[:100]}...")
-                                    controller.append_text(content_str)
-                                    sent_content_set.add(content_str)
-                                    node_sent_length[node_name] = len(content_str)
-                                else:
-                                    print(f"[DEBUG] Assistant-UI Chat: 跳过重复的完整消息 (node={node_name})")
-                            elif isinstance(msg, AIMessageChunk):
-                                # 对于 chunk，只发送新增的部分
-                                current_length = node_sent_length.get(node_name, 0)
-                                if len(content_str) > current_length:
-                                    new_content = content_str[current_length:]
-                                    print(f"[DEBUG] Assistant-UI Chat: 发送最终响应 chunk (node={node_name}): {new_content[:50]}...")
-                                    controller.append_text(new_content)
-                                    node_sent_length[node_name] = len(content_str)
-                                else:
-                                    print(f"[DEBUG] Assistant-UI Chat: 跳过重复的 chunk (node={node_name}, current={current_length}, new={len(content_str)})")
-                        elif content and not is_final_response:
-                            # 中间节点的内容不发送给用户，只记录日志
-                            print(f"[DEBUG] Assistant-UI Chat: 跳过中间节点内容 (node={node_name}): {str(content)[:50]}...")
+                try:
+                    # 同时订阅 messages（token流）、updates（节点更新，用于进度事件）和 tasks（运行中的节点），
+                    # 每个事件为 (mode, payload)
+                    async for mode, payload in agent_runtime.graph.astream(
+                        initial_state,
+                        config,
+                        stream_mode=["messages", "updates", "tasks"],
+                    ):
+                        await emitter.handle(mode, payload)
+                    chat_run_stats.record_completed()
+                except asyncio.CancelledError:
+                    # 客户端断开：取消会传递到进行中的LLM请求（httpx连接随之关闭）和graph节点
+                    chat_run_stats.record_cancelled(thread_id, chat_run.cancel_reason or "cancelled", emitter)
+                    raise
+                except Exception:
+                    chat_run_stats.record_failed()
+                    raise
+                finally:
+                    # 取消或失败的运行没有写入最终checkpoint，丢弃其写入进度（正常结束时已清理，不做处理）
+                    checkpoint_policy.abort_turn(thread_id)
+                    # graph运行结束（含异常）后尽早释放准入名额；响应结束时CancellableRun.close会再兜底释放
+                    ticket.release()
                 
-                print(f"[DEBUG] Assistant-UI Chat: 处理完成")
+                logger.info("Assistant-UI Chat: 处理完成 %s", emitter.get_summary())
             
-            return DataStreamResponse(create_run(run))
+            chat_run = CancellableRun(run, on_close=ticket.release)
+            return ProgressDataStreamResponse(chat_run)
             
         except Exception as e:
-            print(f"Error in assistant UI chat: {e}")
+            ticket.release()
+            logger.error("Error in assistant UI chat: %s", e)
             raise HTTPException(status_code=500, detail="Failed to process assistant UI chat")
     
     # 会话历史管理端点
@@ -366,7 +478,7 @@ def create_api_routes(
             )
             return messages
         except Exception as e:
-            print(f"Error getting conversation history: {e}")
+            logger.error("Error getting conversation history: %s", e)
             raise HTTPException(status_code=500, detail="Failed to get conversation history")
     
     @router.delete(
@@ -386,7 +498,7 @@ def create_api_routes(
             else:
                 raise HTTPException(status_code=500, detail="Failed to clear conversation history")
         except Exception as e:
-            print(f"Error clearing conversation history: {e}")
+            logger.error("Error clearing conversation history: %s", e)
             raise HTTPException(status_code=500, detail="Failed to clear conversation history")
     
     @router.get(
@@ -403,7 +515,7 @@ def create_api_routes(
             )
             return stats
         except Exception as e:
-            print(f"Error getting conversation stats: {e}")
+            logger.error("Error getting conversation stats: %s", e)
             raise HTTPException(status_code=500, detail="Failed to get conversation stats")
     
     @router.get(
@@ -420,7 +532,7 @@ def create_api_routes(
             )
             return sessions
         except Exception as e:
-            print(f"Error getting user sessions: {e}")
+            logger.error("Error getting user sessions: %s", e)
             raise HTTPException(status_code=500, detail="Failed to get user sessions")
     
     # Assistant-UI 支持端点
@@ -436,7 +548,7 @@ def create_api_routes(
             thread_id = str(uuid.uuid4())
             return {"thread_id": thread_id}
         except Exception as e:
-            print(f"Error creating thread: {e}")
+            logger.error("Error creating thread: %s", e)
             raise HTTPException(status_code=500, detail="Failed to create thread")
     
     @router.get(
@@ -466,7 +578,7 @@ def create_api_routes(
                 "tasks": []
             }
         except Exception as e:
-            print(f"Error getting thread state: {e}")
+            logger.error("Error getting thread state: %s", e)
             raise HTTPException(status_code=500, detail="Failed to get thread state")
     
     return router
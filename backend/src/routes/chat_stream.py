@@ -0,0 +1,380 @@
+"""
+聊天流式输出辅助
+- 进度事件：把supervisor graph的节点更新（stream_mode="updates"）转换为结构化进度事件
+  （计划摘要、步骤开始/完成、工具结果），客户端无需等待汇总即可展示执行进度
+- 数据分片：assistant-stream 的 DataStream 编码器只支持文本和工具调用，这里补充
+  AI SDK数据流协议的 `2:` 数据分片，进度事件与文本在同一个流中按顺序发送
+- ChatStreamEmitter：把graph的流事件转换为客户端输出，每个token的处理为O(1)
+- CancellableRun：客户端断开连接时取消仍在运行的graph（连同进行中的LLM HTTP请求），
+  并记录取消时所在的节点
+"""
+
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from assistant_stream import RunController
+from assistant_stream.serialization.assistant_stream_response import AssistantStreamResponse
+from assistant_stream.serialization.data_stream import DataStreamEncoder
+
+
+logger = logging.getLogger(__name__)
+
+# 生成最终用户可见回答的节点（只有这些节点的文本发送给客户端）
+FINAL_RESPONSE_NODES = ("aggregate", "simple_response")
+
+# 进度事件中结果/工具输出的最大长度（完整内容由最终响应给出）
+PROGRESS_TEXT_MAX_CHARS = 500
+
+
+@dataclass
+class DataChunk:
+    type: str  # "data"
+    data: Any
+
+
+class ProgressDataStreamEncoder(DataStreamEncoder):
+    """支持数据分片的DataStream编码器"""
+
+    def encode_chunk(self, chunk) -> str:
+        if chunk.type == "data":
+            return f"2:{json.dumps([chunk.data])}\n"
+        return super().encode_chunk(chunk)
+
+
+class CancellableRun:
+    """可取消的assistant-stream运行（替代 assistant_stream.create_run）
+
+    create_run 在客户端断开后不会停止后台任务，graph会继续调用LLM和写数据库；
+    这里持有后台任务，输出流关闭或检测到断开时取消它。
+    on_close 在响应结束且后台任务已结束（或从未启动）后调用一次，用于释放准入名额：
+    客户端在响应体开始前断开时流不会被迭代，回调本身不会运行
+    """
+
+    def __init__(self, callback, on_close: Optional[Callable[[], None]] = None):
+        self._callback = callback
+        self._on_close = on_close
+        self.task: Optional[asyncio.Task] = None
+        self.cancel_reason: Optional[str] = None
+
+    async def stream(self):
+        queue: asyncio.Queue = asyncio.Queue()
+        controller = RunController(queue)
+
+        async def background():
+            try:
+                await self._callback(controller)
+                for dispose in controller._dispose_callbacks:
+                    dispose()
+                for task in controller._stream_tasks:
+                    await task
+            except asyncio.CancelledError:
+                for task in controller._stream_tasks:
+                    task.cancel()
+                raise
+            finally:
+                queue.put_nowait(None)
+
+        self.task = asyncio.create_task(background())
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                yield chunk
+            if not self.task.cancelled():
+                await self.task
+        finally:
+            self.cancel("stream_closed")
+
+    def cancel(self, reason: str) -> bool:
+        """取消仍在运行的后台任务，返回是否实际取消"""
+        if self.task is None or self.task.done():
+            return False
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+        self.task.cancel()
+        return True
+
+    def close(self, reason: str) -> None:
+        """响应结束：取消仍在运行的后台任务，任务结束后调用on_close"""
+        self.cancel(reason)
+        on_close, self._on_close = self._on_close, None
+        if on_close is None:
+            return
+        if self.task is None or self.task.done():
+            on_close()
+        else:
+            self.task.add_done_callback(lambda _task: on_close())
+
+
+class ProgressDataStreamResponse(AssistantStreamResponse):
+    """带进度数据分片的DataStream响应，客户端断开时取消运行"""
+
+    def __init__(self, run: CancellableRun):
+        self.run = run
+        super().__init__(run.stream(), ProgressDataStreamEncoder())
+
+    async def _watch_disconnect(self, receive) -> None:
+        # 规划等阶段长时间没有输出，写入失败前就需要发现断开
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                self.run.cancel("client_disconnected")
+                return
+
+    async def __call__(self, scope, receive, send) -> None:
+        watcher = asyncio.create_task(self._watch_disconnect(receive))
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            watcher.cancel()
+            # 响应结束（含发送失败、断开监听取消了发送、服务关闭）时graph仍在运行，说明客户端已经不在了
+            self.run.close("client_disconnected")
+
+
+def append_data(controller, data: Any) -> None:
+    """向流中追加一个数据分片
+
+    与 RunController.append_text 使用同一个队列，保证数据分片和文本的相对顺序
+    """
+    chunk = DataChunk(type="data", data=data)
+    controller._loop.call_soon_threadsafe(controller._queue.put_nowait, chunk)
+
+
+def _truncate(text: Any) -> str:
+    text = str(text or "")
+    if len(text) > PROGRESS_TEXT_MAX_CHARS:
+        return text[:PROGRESS_TEXT_MAX_CHARS] + "..."
+    return text
+
+
+def _clean_tool_output(output: Any) -> str:
+    """去掉工具输出中给前端的标记行（frontend_tool_call:...）"""
+    return "\n".join(
+        line for line in str(output).splitlines()
+        if line.strip() and not line.strip().startswith("frontend_tool_call:")
+    )
+
+
+class ProgressTracker:
+    """把supervisor节点更新转换为进度事件（每个请求一个实例）
+
+    事件格式：{"type": "progress", "event": <事件名>, ...}
+    - plan：计划摘要和步骤列表
+    - step_start / step_finish：步骤开始和完成（含成功标记、结果和工具输出）
+    - aggregating：所有步骤完成，开始生成最终响应
+    """
+
+    def __init__(self):
+        self.steps: List[Dict[str, Any]] = []
+        self.started: set = set()
+
+    def _step_info(self, step_index: int) -> Dict[str, Any]:
+        if 0 <= step_index < len(self.steps):
+            step = self.steps[step_index]
+            return {"agent": step.get("agent"), "description": step.get("description", "")}
+        return {}
+
+    def events(self, node_name: str, update: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """根据一个节点的状态更新生成进度事件"""
+        if not isinstance(update, dict):
+            return []
+        events = []
+
+        plan = update.get("plan")
+        if plan and plan.get("steps"):
+            self.steps = list(plan["steps"])
+            self.started.clear()
+            events.append({
+                "type": "progress",
+                "event": "plan",
+                "summary": plan.get("summary", ""),
+                "steps": [
+                    {
+                        "index": index,
+                        "agent": step.get("agent"),
+                        "action": step.get("action"),
+                        "description": step.get("description", ""),
+                    }
+                    for index, step in enumerate(self.steps)
+                ],
+            })
+
+        if node_name == "supervisor_route":
+            for step_index in update.get("ready_steps") or []:
+                if step_index not in self.started:
+                    self.started.add(step_index)
+                    events.append({
+                        "type": "progress",
+                        "event": "step_start",
+                        "step_index": step_index,
+                        **self._step_info(step_index),
+                    })
+            if update.get("is_aggregating") and self.steps:
+                events.append({"type": "progress", "event": "aggregating"})
+
+        for result in update.get("execution_results") or []:
+            tool_results = [_clean_tool_output(output) for output in result.get("tool_outputs") or []]
+            events.append({
+                "type": "progress",
+                "event": "step_finish",
+                "step_index": result.get("step_index"),
+                "agent": result.get("agent"),
+                "success": result.get("success", False),
+                "result": _truncate(result.get("result")),
+                "tool_results": [_truncate(output) for output in tool_results if output],
+            })
+
+        return events
+
+
+def message_text(content: Any) -> str:
+    """提取消息内容中的文本（content可能是字符串或内容块列表）"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    return str(content) if content else ""
+
+
+class ChatStreamEmitter:
+    """把supervisor graph的流事件（stream_mode=["messages", "updates"]）写入assistant-stream
+
+    - 最终响应节点的token按增量直接追加，每条消息只记录已发送的长度（按消息id），
+      不拼接、不比较完整文本，每个chunk的处理为O(1)
+    - 节点输出的完整消息与已流式发送的消息id相同时只补发未发送的尾部
+    - 逐条调试日志只在logger启用DEBUG级别时生成
+    """
+
+    def __init__(self, controller, final_nodes=FINAL_RESPONSE_NODES):
+        self.controller = controller
+        self.final_nodes = frozenset(final_nodes)
+        self.progress = ProgressTracker()
+        self._tool_calls: Dict[str, Any] = {}
+        # 消息id -> 已发送的文本长度
+        self._sent_length: Dict[str, int] = {}
+        # 运行中的graph任务：任务id -> 节点名（stream_mode="tasks"）
+        self._running_tasks: Dict[str, str] = {}
+        self.last_node: Optional[str] = None
+        self._start = time.perf_counter()
+        self.first_token_ms: Optional[float] = None
+        self.text_parts = 0
+        self.text_chars = 0
+        self.events = 0
+
+    def _send_text(self, text: str, node_name: str) -> None:
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.perf_counter() - self._start) * 1000
+            logger.info("Assistant-UI Chat: 首个token耗时 %.1fms (node=%s)", self.first_token_ms, node_name)
+        self.text_parts += 1
+        self.text_chars += len(text)
+        self.controller.append_text(text)
+
+    async def handle(self, mode: str, payload: Any) -> None:
+        """处理一个 (mode, payload) 流事件"""
+        self.events += 1
+        if mode == "tasks":
+            # 任务开始事件包含input，结束事件包含result/error
+            if "input" in payload:
+                self._running_tasks[payload["id"]] = payload["name"]
+            else:
+                self._running_tasks.pop(payload["id"], None)
+                self.last_node = payload["name"]
+            return
+        if mode == "updates":
+            # payload: {节点名: 状态更新}
+            for node_name, update in payload.items():
+                for progress_event in self.progress.events(node_name, update):
+                    append_data(self.controller, progress_event)
+            return
+        # messages模式的payload为 (message, metadata) 元组
+        msg, metadata = payload
+        node_name = metadata.get("langgraph_node", "") if isinstance(metadata, dict) else ""
+        await self.handle_message(msg, node_name)
+
+    async def handle_message(self, msg: Any, node_name: str) -> None:
+        """处理一条消息或token"""
+        is_final_response = node_name in self.final_nodes
+
+        # 热路径：最终响应的token，content即增量文本
+        if type(msg) is AIMessageChunk and is_final_response and not msg.tool_call_chunks:
+            text = message_text(msg.content)
+            if text:
+                self._sent_length[msg.id] = self._sent_length.get(msg.id, 0) + len(text)
+                self._send_text(text, node_name)
+            return
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("收到消息 类型=%s node=%s content=%.100s", type(msg).__name__, node_name, getattr(msg, "content", ""))
+
+        if isinstance(msg, ToolMessage):
+            tool_controller = self._tool_calls.get(msg.tool_call_id)
+            if tool_controller is not None:
+                tool_controller.set_result(msg.content)
+            else:
+                logger.debug("Tool call ID %s not found in tool_calls", msg.tool_call_id)
+            return
+
+        if not isinstance(msg, AIMessage):
+            return
+
+        # 工具调用（所有节点的工具调用都需要显示）
+        for tool_call in msg.tool_calls or []:
+            await self._add_tool_call(tool_call)
+
+        if not is_final_response or isinstance(msg, AIMessageChunk) or not msg.content:
+            # 中间节点的内容不发送给用户
+            return
+
+        # 节点输出的完整消息：只发送该消息id尚未发送的部分
+        content = message_text(msg.content)
+        sent = self._sent_length.get(msg.id, 0)
+        if sent >= len(content):
+            return
+        if sent == 0 and self.text_parts:
+            # 未经流式生成的独立消息（模板化汇总、硬编码回复、simple_response的非流式回复）与前文分段
+            self._send_text("\n\n", node_name)
+        self._sent_length[msg.id] = len(content)
+        self._send_text(content[sent:], node_name)
+
+    async def _add_tool_call(self, tool_call: Dict[str, Any]) -> None:
+        tool_call_id = tool_call.get("id")
+        tool_name = tool_call.get("name")
+        if not tool_call_id or not tool_name:
+            return
+        tool_controller = self._tool_calls.get(tool_call_id)
+        if tool_controller is None:
+            tool_controller = await self.controller.add_tool_call(tool_name, tool_call_id)
+            self._tool_calls[tool_call_id] = tool_controller
+        tool_args = tool_call.get("args")
+        if tool_args:
+            tool_controller.append_args_text(tool_args if isinstance(tool_args, str) else str(tool_args))
+
+    @property
+    def running_nodes(self) -> List[str]:
+        """当前正在运行的节点"""
+        return list(self._running_tasks.values())
+
+    @property
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self._start) * 1000
+
+    def get_summary(self) -> Dict[str, Any]:
+        """本次请求的流式输出统计"""
+        return {
+            "first_token_ms": round(self.first_token_ms, 1) if self.first_token_ms is not None else None,
+            "total_ms": round(self.elapsed_ms, 1),
+            "events": self.events,
+            "text_parts": self.text_parts,
+            "text_chars": self.text_chars,
+        }
+
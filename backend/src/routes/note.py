@@ -10,7 +10,9 @@ from ..models.note import (
     NoteCreate, NoteUpdate, NoteResponse, NoteListResponse,
     NoteSearchRequest, NoteStatsResponse, NoteCategoryEnum
 )
+from ..models.bulk import BulkRequest, BulkResponse
 from ..services.note_service import NoteService
+from ..services.bulk_operations import BULK_MAX_OPERATIONS
 
 router = APIRouter()
 note_service = NoteService()
@@ -33,6 +35,27 @@ async def create_note(
         )
 
 
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_notes(
+    bulk_request: BulkRequest,
+    current_user: UserDB = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量创建/更新/删除笔记（单个事务，返回逐条结果，向量数据库同步合并为一个任务）"""
+    if len(bulk_request.operations) > BULK_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"批量操作最多 {BULK_MAX_OPERATIONS} 条"
+        )
+    try:
+        return await note_service.bulk_operations(db, bulk_request.operations, current_user.id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"批量操作笔记失败: {str(e)}"
+        )
+
+
 @router.get("/{note_id}", response_model=NoteResponse)
 async def get_note(
     note_id: int,
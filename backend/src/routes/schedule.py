@@ -5,6 +5,8 @@ from datetime import datetime, date
 from ..database import get_db
 from ..services.schedule_service import ScheduleService
 from ..models.schedule import Schedule, ScheduleCreate, ScheduleUpdate, ScheduleListResponse
+from ..models.bulk import BulkRequest, BulkResponse
+from ..services.bulk_operations import BULK_MAX_OPERATIONS
 from ..models.auth import User
 from ..auth.dependencies import get_current_user
 
@@ -30,6 +32,25 @@ async def create_schedule(
         raise HTTPException(status_code=400, detail=f"创建日程失败: {str(e)}")
 
 
+@router.post("/bulk", response_model=BulkResponse)
+async def bulk_schedules(
+    bulk_request: BulkRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """批量创建/更新/删除日程（单个事务，返回逐条结果）"""
+    if len(bulk_request.operations) > BULK_MAX_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"批量操作最多 {BULK_MAX_OPERATIONS} 条")
+    try:
+        return await schedule_service.bulk_operations(
+            db=db,
+            operations=bulk_request.operations,
+            user_id=current_user.id
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"批量操作日程失败: {str(e)}")
+
+
 @router.get("/", response_model=ScheduleListResponse)
 async def get_schedules(
     current_user: User = Depends(get_current_user),
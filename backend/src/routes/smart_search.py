@@ -12,11 +12,16 @@ from ..database import get_db
 from ..auth.dependencies import get_current_user
 from ..models.database_models import UserDB
 from ..models.note import NoteResponse, NoteCategoryEnum
-from ..services.smart_search_service import smart_search_service
 
 router = APIRouter()
 
 
+def _get_smart_search_service():
+    """首次使用时才导入智能搜索服务（依赖较重的weaviate客户端，不在应用启动时加载）"""
+    from ..services.smart_search_service import smart_search_service
+    return smart_search_service
+
+
 class SmartSearchRequest(BaseModel):
     """智能搜索请求"""
     query: str = Field(..., min_length=1, max_length=500, description="搜索查询")
@@ -55,7 +60,7 @@ async def smart_search(
     """智能搜索笔记"""
     try:
         # 执行智能搜索
-        notes = smart_search_service.search_notes(
+        notes = _get_smart_search_service().search_notes(
             query=search_request.query,
             user_id=current_user.id,
             limit=search_request.limit,
@@ -65,7 +70,7 @@ async def smart_search(
         )
         
         # 获取搜索建议
-        suggestions = smart_search_service.get_search_suggestions(
+        suggestions = _get_smart_search_service().get_search_suggestions(
             query=search_request.query,
             user_id=current_user.id,
             limit=5
@@ -94,7 +99,7 @@ async def get_similar_notes(
     """获取相似笔记"""
     try:
         # 获取相似笔记
-        notes = smart_search_service.get_similar_notes(
+        notes = _get_smart_search_service().get_similar_notes(
             note_id=request.note_id,
             user_id=current_user.id,
             limit=request.limit
@@ -118,7 +123,7 @@ async def get_search_suggestions(
     """获取搜索建议"""
     try:
         # 获取搜索建议
-        suggestions = smart_search_service.get_search_suggestions(
+        suggestions = _get_smart_search_service().get_search_suggestions(
             query=request.query,
             user_id=current_user.id,
             limit=request.limit
@@ -141,7 +146,7 @@ async def get_search_stats(
     """获取搜索统计信息"""
     try:
         # 获取搜索统计
-        stats = smart_search_service.get_search_stats(current_user.id)
+        stats = _get_smart_search_service().get_search_stats(current_user.id)
         
         return stats
         
@@ -160,7 +165,7 @@ async def reindex_user_notes(
     """重新索引用户笔记"""
     try:
         # 重新索引用户笔记
-        result = smart_search_service.reindex_user_notes(current_user.id)
+        result = _get_smart_search_service().reindex_user_notes(current_user.id)
         
         return result
         
@@ -176,7 +181,7 @@ async def search_health_check():
     """搜索服务健康检查"""
     try:
         # 检查向量数据库连接
-        stats = smart_search_service.get_search_stats(1)  # 使用测试用户ID
+        stats = _get_smart_search_service().get_search_stats(1)  # 使用测试用户ID
         
         return {
             "status": "healthy",
@@ -6,6 +6,17 @@ from sqlalchemy import select, text
 from ..database import get_db_session
 from ..models.database_models import UserDB, UserRole
 from ..models.auth import UserCreate, UserRole as AuthUserRole
+from .text_search import text_search
+from .note_stats import note_stats_table
+
+
+# 后续版本新增的索引：已有数据库中的表不会被create_all更新，启动时按需补建（IF NOT EXISTS）
+SCHEMA_INDEX_STATEMENTS = [
+    # 任务列表按用户的keyset分页（WHERE user_id = ? AND id > ? ORDER BY id）
+    "CREATE INDEX IF NOT EXISTS idx_tasks_user_id_id ON tasks(user_id, id)",
+    # 笔记统计中按用户的最近新建数（WHERE user_id = ? AND created_at >= ?）
+    "CREATE INDEX IF NOT EXISTS idx_notes_user_created ON notes(user_id, created_at)",
+]
 
 
 class AdminInitializationService:
@@ -155,6 +166,24 @@ class AdminInitializationService:
                     else:
                         print("✅ 数据库架构检查通过")
                     
+                    for statement in SCHEMA_INDEX_STATEMENTS:
+                        await session.execute(text(statement))
+                    await session.commit()
+                    
+                    # 文本检索：pg_trgm 三元组索引、notes.search_vector 全文检索列（失败时退回普通模糊匹配）
+                    try:
+                        from ..database import engine
+                        await text_search.ensure_schema(engine)
+                    except Exception as e:
+                        print(f"⚠️ 文本检索初始化失败，使用普通模糊匹配: {e}")
+                    
+                    # 笔记统计汇总表：按 NOTE_STATS_TABLE_ENABLED 创建触发器并回填（失败时退回聚合查询）
+                    try:
+                        from ..database import engine
+                        await note_stats_table.ensure_schema(engine)
+                    except Exception as e:
+                        print(f"⚠️ 笔记统计汇总表初始化失败，使用聚合查询: {e}")
+                    
                     return True
                     
                 except Exception as e:
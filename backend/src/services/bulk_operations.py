@@ -0,0 +1,185 @@
+"""
+资源批量操作（任务、笔记、日程的 POST /bulk 接口共用）
+
+一个批次在同一个事务中按集合执行，而不是每条操作一次会话、一次提交：
+- 创建：一条 INSERT ... RETURNING（SQLAlchemy insertmanyvalues 按批展开多行VALUES），按参数顺序返回新行
+- 更新：先用一条 SELECT ... FOR UPDATE 校验归属并锁定目标行，再按主键 executemany UPDATE，最后一条 SELECT 取回更新后的行
+- 删除：一条 DELETE ... WHERE id IN (...)
+
+同一批次按 创建 → 更新 → 删除 的顺序执行；参数校验失败（包括给非空字段显式传null）、资源不存在、
+同一资源重复的更新或删除只记为该条失败（重复时保留第一条），不影响其他操作。
+数据库错误会使整个批次回滚（由调用方处理）。
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete, insert, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.bulk import BulkItemResult, BulkOperation, BulkResponse
+
+
+# 单个批量请求最多包含的操作数
+BULK_MAX_OPERATIONS = int(os.getenv("BULK_MAX_OPERATIONS", "1000"))
+
+
+class BulkResourceSpec:
+    """描述一种资源如何参与批量操作
+
+    Args:
+        model: 数据库模型（需要有id和user_id列）
+        create_schema: 创建操作data的校验模型
+        update_schema: 更新操作data的校验模型
+        to_create_row: (校验后的创建数据, user_id) -> INSERT参数字典
+        to_update_values: 校验后的更新数据 -> UPDATE字段字典（为空表示没有要更新的字段）
+        to_response: 数据库对象 -> 响应字典
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        create_schema: Type[BaseModel],
+        update_schema: Type[BaseModel],
+        to_create_row: Callable[[Any, Optional[int]], Dict[str, Any]],
+        to_update_values: Callable[[Any], Dict[str, Any]],
+        to_response: Callable[[Any], Dict[str, Any]],
+    ):
+        self.model = model
+        self.create_schema = create_schema
+        self.update_schema = update_schema
+        self.to_create_row = to_create_row
+        self.to_update_values = to_update_values
+        self.to_response = to_response
+
+
+def _format_error(error: ValueError) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(loc) for loc in err['loc']) or 'data'}: {err['msg']}"
+            for err in error.errors()
+        )
+    return str(error)
+
+
+def _check_not_null(model: Any, values: Dict[str, Any]) -> None:
+    """非空字段显式传了null时抛出ValueError（否则整个批次会在执行时因数据库约束失败）"""
+    columns = inspect(model).columns
+    null_fields = [
+        key for key, value in values.items()
+        if value is None and key in columns and not columns[key].nullable
+    ]
+    if null_fields:
+        raise ValueError(f"{', '.join(null_fields)}: 不能为null")
+
+
+async def execute_bulk(
+    session: AsyncSession,
+    spec: BulkResourceSpec,
+    operations: List[BulkOperation],
+    user_id: Optional[int],
+) -> BulkResponse:
+    """在调用方的事务中执行一批操作，返回逐条结果（不提交）
+
+    user_id为None时不按用户过滤（与任务接口未登录时的行为一致）
+    """
+    model = spec.model
+    results: List[Optional[BulkItemResult]] = [None] * len(operations)
+    creates, updates, deletes = [], [], []
+
+    def fail(index: int, operation: BulkOperation, error: str) -> None:
+        results[index] = BulkItemResult(index=index, op=operation.op, success=False, id=operation.id, error=error)
+
+    # 1. 逐条校验（纯内存操作）
+    seen_targets = set()
+    for index, operation in enumerate(operations):
+        try:
+            if operation.op == "create":
+                data = spec.create_schema.model_validate(operation.data or {})
+                row = spec.to_create_row(data, user_id)
+                _check_not_null(model, row)
+                creates.append((index, row))
+                continue
+            if operation.id is None:
+                raise ValueError(f"{operation.op} 操作需要id")
+            if (operation.op, operation.id) in seen_targets:
+                raise ValueError(f"同一批次中重复的 {operation.op} 操作（id={operation.id}）")
+            if operation.op == "update":
+                values = spec.to_update_values(spec.update_schema.model_validate(operation.data or {}))
+                if not values:
+                    raise ValueError("没有提供要更新的字段")
+                _check_not_null(model, values)
+                updates.append((index, operation.id, values))
+            else:
+                deletes.append((index, operation.id))
+            seen_targets.add((operation.op, operation.id))
+        except ValueError as e:
+            fail(index, operation, _format_error(e))
+
+    # 2. 一次查询校验更新/删除目标的归属，并锁定这些行直到事务结束
+    target_ids = {target_id for _, target_id, _ in updates} | {target_id for _, target_id in deletes}
+    owned_ids = set()
+    if target_ids:
+        query = select(model.id).where(model.id.in_(target_ids)).with_for_update()
+        if user_id is not None:
+            query = query.where(model.user_id == user_id)
+        owned_ids = set((await session.execute(query)).scalars().all())
+
+    # 3. 创建：insertmanyvalues批量INSERT ... RETURNING，按参数顺序返回
+    if creates:
+        created = (await session.scalars(
+            insert(model).returning(model, sort_by_parameter_order=True),
+            [row for _, row in creates],
+        )).all()
+        for (index, _), obj in zip(creates, created):
+            results[index] = BulkItemResult(
+                index=index, op="create", success=True, id=obj.id, item=spec.to_response(obj)
+            )
+
+    # 4. 更新：按主键executemany（字段组合相同的参数合并为一次executemany）
+    owned_updates = []
+    for index, target_id, values in updates:
+        if target_id in owned_ids:
+            owned_updates.append((index, target_id, values))
+        else:
+            fail(index, operations[index], "资源不存在")
+    if owned_updates:
+        await session.execute(
+            update(model),
+            [{"id": target_id, **values} for _, target_id, values in owned_updates],
+        )
+        updated_rows = (await session.execute(
+            select(model)
+            .where(model.id.in_({target_id for _, target_id, _ in owned_updates}))
+            .execution_options(populate_existing=True)
+        )).scalars().all()
+        updated_by_id = {obj.id: spec.to_response(obj) for obj in updated_rows}
+        for index, target_id, _ in owned_updates:
+            results[index] = BulkItemResult(
+                index=index, op="update", success=True, id=target_id, item=updated_by_id.get(target_id)
+            )
+
+    # 5. 删除：一条DELETE
+    owned_deletes = []
+    for index, target_id in deletes:
+        if target_id in owned_ids:
+            owned_deletes.append((index, target_id))
+        else:
+            fail(index, operations[index], "资源不存在")
+    if owned_deletes:
+        await session.execute(
+            delete(model)
+            .where(model.id.in_({target_id for _, target_id in owned_deletes}))
+            .execution_options(synchronize_session=False)
+        )
+        for index, target_id in owned_deletes:
+            results[index] = BulkItemResult(index=index, op="delete", success=True, id=target_id)
+
+    return BulkResponse(
+        results=results,
+        created=len(creates),
+        updated=len(owned_updates),
+        deleted=len(owned_deletes),
+        failed=sum(1 for result in results if not result.success),
+    )
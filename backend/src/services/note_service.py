@@ -11,11 +11,47 @@ from ..models.note import (
     NoteCreate, NoteUpdate, NoteResponse, NoteListResponse, 
     NoteSearchRequest, NoteStatsResponse, NoteCategoryEnum
 )
-from ..integrations.celery_client import enqueue_sync_note, enqueue_delete_note
+from ..models.bulk import BulkOperation, BulkResponse
+from ..integrations.celery_client import enqueue_sync_note, enqueue_delete_note, enqueue_sync_notes_batch
+from .bulk_operations import BulkResourceSpec, execute_bulk
+from .text_search import text_search
+from .note_stats import note_stats_table
 
 logger = logging.getLogger(__name__)
 
 
+def _note_create_row(data: NoteCreate, user_id: int) -> Dict[str, Any]:
+    return {
+        "title": data.title,
+        "content": data.content,
+        "category": data.category.value,
+        "user_id": user_id,
+        "tags": data.tags or [],
+        "is_pinned": data.is_pinned,
+        "is_archived": data.is_archived,
+        "word_count": len(data.content),
+    }
+
+
+def _note_update_values(data: NoteUpdate) -> Dict[str, Any]:
+    values = data.model_dump(exclude_unset=True)
+    if 'content' in values:
+        values['word_count'] = len(values['content'])
+    if 'category' in values:
+        values['category'] = values['category'].value
+    return values
+
+
+NOTE_BULK_SPEC = BulkResourceSpec(
+    model=NoteDB,
+    create_schema=NoteCreate,
+    update_schema=NoteUpdate,
+    to_create_row=_note_create_row,
+    to_update_values=_note_update_values,
+    to_response=lambda note: NoteResponse.model_validate(note).model_dump(mode="json"),
+)
+
+
 class NoteService:
     """笔记管理服务"""
     
@@ -131,20 +167,36 @@ class NoteService:
         
         return True
     
+    async def bulk_operations(self, db: AsyncSession, operations: List[BulkOperation], user_id: int) -> BulkResponse:
+        """批量创建/更新/删除笔记（单个事务），提交后把向量数据库同步合并为一个Celery任务派发"""
+        try:
+            response = await execute_bulk(db, NOTE_BULK_SPEC, operations, user_id)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        
+        deleted_ids = [r.id for r in response.results if r.success and r.op == "delete"]
+        sync_ids = list(dict.fromkeys(
+            r.id for r in response.results if r.success and r.op != "delete" and r.id not in deleted_ids
+        ))
+        if sync_ids or deleted_ids:
+            try:
+                enqueue_sync_notes_batch(user_id, sync_ids, deleted_ids)
+                logger.info(f"已派发批量向量数据库同步任务: 同步 {len(sync_ids)} 条, 删除 {len(deleted_ids)} 条")
+            except Exception as e:
+                logger.error(f"派发批量向量数据库同步失败: {e}")
+        
+        return response
+    
     async def search_notes(self, db: AsyncSession, search_request: NoteSearchRequest, user_id: int) -> NoteListResponse:
         """搜索笔记"""
         # 构建查询条件
         conditions = [NoteDB.user_id == user_id]
         
-        # 关键词搜索
+        # 关键词搜索（三元组索引加速的包含匹配 + 全文检索，见 text_search）
         if search_request.query:
-            search_term = f"%{search_request.query}%"
-            conditions.append(
-                or_(
-                    NoteDB.title.ilike(search_term),
-                    NoteDB.content.ilike(search_term)
-                )
-            )
+            conditions.append(text_search.note_condition(search_request.query))
         
         # 分类筛选
         if search_request.category:
@@ -167,7 +219,9 @@ class NoteService:
         query = select(NoteDB).where(and_(*conditions))
         
         # 排序
-        if search_request.sort_by == "created_at":
+        if search_request.sort_by == "relevance" and search_request.query:
+            order_by = text_search.note_rank(search_request.query)
+        elif search_request.sort_by == "created_at":
             order_by = NoteDB.created_at
         elif search_request.sort_by == "updated_at":
             order_by = NoteDB.updated_at
@@ -207,6 +261,17 @@ class NoteService:
             total_pages=total_pages
         )
     
+    async def get_all_notes(self, db: AsyncSession, user_id: int) -> List[NoteResponse]:
+        """获取用户的所有笔记（按更新时间倒序，不分页）"""
+        result = await db.execute(
+            select(NoteDB)
+            .where(NoteDB.user_id == user_id)
+            .order_by(desc(NoteDB.updated_at))
+        )
+        notes = result.scalars().all()
+        
+        return [NoteResponse.model_validate(note) for note in notes]
+    
     async def get_notes_by_category(self, db: AsyncSession, category: NoteCategoryEnum, user_id: int, limit: int = 20) -> List[NoteResponse]:
         """根据分类获取笔记"""
         result = await db.execute(
@@ -263,68 +328,37 @@ class NoteService:
         return [NoteResponse.model_validate(note) for note in notes]
     
     async def get_note_stats(self, db: AsyncSession, user_id: int) -> NoteStatsResponse:
-        """获取笔记统计信息"""
-        # 总笔记数
-        total_result = await db.execute(
-            select(func.count(NoteDB.id)).where(NoteDB.user_id == user_id)
-        )
-        total_notes = total_result.scalar()
-        
-        # 按分类统计
-        category_result = await db.execute(
-            select(NoteDB.category, func.count(NoteDB.id))
-            .where(NoteDB.user_id == user_id)
-            .group_by(NoteDB.category)
-        )
-        notes_by_category = {row[0]: row[1] for row in category_result.fetchall()}
-        
-        # 总字数
-        word_count_result = await db.execute(
-            select(func.sum(NoteDB.word_count)).where(NoteDB.user_id == user_id)
-        )
-        total_words = word_count_result.scalar() or 0
-        
-        # 置顶笔记数
-        pinned_result = await db.execute(
-            select(func.count(NoteDB.id)).where(
-                and_(
-                    NoteDB.user_id == user_id,
-                    NoteDB.is_pinned == True
-                )
-            )
-        )
-        pinned_notes = pinned_result.scalar()
-        
-        # 归档笔记数
-        archived_result = await db.execute(
-            select(func.count(NoteDB.id)).where(
-                and_(
-                    NoteDB.user_id == user_id,
-                    NoteDB.is_archived == True
-                )
-            )
-        )
-        archived_notes = archived_result.scalar()
-        
-        # 最近7天创建的笔记数
+        """获取笔记统计信息
+
+        启用 note_stats 汇总表时按主键读取汇总行；否则用一条按分类分组的 FILTER 聚合查询，
+        总数、字数、置顶、归档、最近7天新建数都在同一次扫描中得到
+        """
         since_date = datetime.utcnow() - timedelta(days=7)
-        recent_result = await db.execute(
-            select(func.count(NoteDB.id)).where(
-                and_(
-                    NoteDB.user_id == user_id,
-                    NoteDB.created_at >= since_date
-                )
+        stats = await note_stats_table.read(db, user_id, since_date)
+        if stats is not None:
+            return NoteStatsResponse(**stats)
+
+        result = await db.execute(
+            select(
+                NoteDB.category,
+                func.count(NoteDB.id).label("total"),
+                func.coalesce(func.sum(NoteDB.word_count), 0).label("words"),
+                func.count(NoteDB.id).filter(NoteDB.is_pinned == True).label("pinned"),
+                func.count(NoteDB.id).filter(NoteDB.is_archived == True).label("archived"),
+                func.count(NoteDB.id).filter(NoteDB.created_at >= since_date).label("recent"),
             )
+            .where(NoteDB.user_id == user_id)
+            .group_by(NoteDB.category)
         )
-        recent_notes = recent_result.scalar()
+        rows = result.all()
         
         return NoteStatsResponse(
-            total_notes=total_notes,
-            notes_by_category=notes_by_category,
-            total_words=total_words,
-            pinned_notes=pinned_notes,
-            archived_notes=archived_notes,
-            recent_notes=recent_notes
+            total_notes=sum(row.total for row in rows),
+            notes_by_category={row.category.value: row.total for row in rows},
+            total_words=sum(row.words for row in rows),
+            pinned_notes=sum(row.pinned for row in rows),
+            archived_notes=sum(row.archived for row in rows),
+            recent_notes=sum(row.recent for row in rows)
         )
     
     async def toggle_pin(self, db: AsyncSession, note_id: int, user_id: int) -> Optional[NoteResponse]:
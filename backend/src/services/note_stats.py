@@ -0,0 +1,161 @@
+"""
+笔记统计汇总表（可选）
+
+NOTE_STATS_TABLE_ENABLED=true 时，schema初始化会创建按 (user_id, category) 汇总的 note_stats 表，
+由 notes 表上的语句级触发器（transition table）增量维护：每条 INSERT/UPDATE/DELETE 语句
+把变化的行按用户和分类聚合成一次 upsert，批量接口一次写入多行也只更新一次汇总。
+统计读取只需按主键读取不超过分类数的几行，与笔记数量无关；
+最近7天新建数是滑动窗口，无法增量维护，用 (user_id, created_at) 索引范围计数。
+
+首次启用时在锁住 notes 写入的事务中创建触发器并回填；关闭时删除触发器，
+再次启用会重新回填，汇总表不会因关闭期间的写入而失真。
+"""
+
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+
+# 是否启用 note_stats 汇总表（关闭时笔记统计使用单条FILTER聚合查询）
+NOTE_STATS_TABLE_ENABLED = os.getenv("NOTE_STATS_TABLE_ENABLED", "false").lower() == "true"
+
+CREATE_TABLE_STATEMENT = """
+    CREATE TABLE IF NOT EXISTS note_stats (
+        user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+        category VARCHAR(20) NOT NULL,
+        total_notes INTEGER NOT NULL DEFAULT 0,
+        total_words BIGINT NOT NULL DEFAULT 0,
+        pinned_notes INTEGER NOT NULL DEFAULT 0,
+        archived_notes INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, category)
+    )
+"""
+
+# 变化行聚合后的增量 upsert（{source} 为按操作类型拼出的 new_rows/old_rows 差值子查询）
+_APPLY_DELTA = """
+        INSERT INTO note_stats AS s (user_id, category, total_notes, total_words, pinned_notes, archived_notes)
+        SELECT user_id, category, sum(n), sum(w), sum(p), sum(a)
+        FROM ({source}) AS delta
+        GROUP BY user_id, category
+        HAVING sum(n) <> 0 OR sum(w) <> 0 OR sum(p) <> 0 OR sum(a) <> 0
+        ON CONFLICT (user_id, category) DO UPDATE SET
+            total_notes = s.total_notes + EXCLUDED.total_notes,
+            total_words = s.total_words + EXCLUDED.total_words,
+            pinned_notes = s.pinned_notes + EXCLUDED.pinned_notes,
+            archived_notes = s.archived_notes + EXCLUDED.archived_notes;
+"""
+_ADDED = ("SELECT user_id, category::text AS category, 1 AS n, coalesce(word_count, 0)::bigint AS w, "
+          "coalesce(is_pinned, false)::int AS p, coalesce(is_archived, false)::int AS a FROM new_rows")
+_REMOVED = ("SELECT user_id, category::text AS category, -1 AS n, -coalesce(word_count, 0)::bigint AS w, "
+            "-coalesce(is_pinned, false)::int AS p, -coalesce(is_archived, false)::int AS a FROM old_rows")
+
+# plpgsql按执行到的分支才解析语句，各分支只引用该操作存在的transition table
+CREATE_FUNCTION_STATEMENT = f"""
+    CREATE OR REPLACE FUNCTION note_stats_apply() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+{_APPLY_DELTA.format(source=_ADDED)}
+        ELSIF TG_OP = 'DELETE' THEN
+{_APPLY_DELTA.format(source=_REMOVED)}
+        ELSE
+{_APPLY_DELTA.format(source=_ADDED + " UNION ALL " + _REMOVED)}
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+CREATE_TRIGGER_STATEMENTS = [
+    "CREATE TRIGGER note_stats_insert AFTER INSERT ON notes "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION note_stats_apply()",
+    "CREATE TRIGGER note_stats_update AFTER UPDATE ON notes "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION note_stats_apply()",
+    "CREATE TRIGGER note_stats_delete AFTER DELETE ON notes "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION note_stats_apply()",
+]
+
+DROP_TRIGGER_STATEMENTS = [
+    "DROP TRIGGER IF EXISTS note_stats_insert ON notes",
+    "DROP TRIGGER IF EXISTS note_stats_update ON notes",
+    "DROP TRIGGER IF EXISTS note_stats_delete ON notes",
+]
+
+BACKFILL_STATEMENTS = [
+    "DELETE FROM note_stats",
+    """
+    INSERT INTO note_stats (user_id, category, total_notes, total_words, pinned_notes, archived_notes)
+    SELECT user_id, category::text, count(*), coalesce(sum(word_count), 0),
+           count(*) FILTER (WHERE is_pinned), count(*) FILTER (WHERE is_archived)
+    FROM notes
+    GROUP BY user_id, category
+    """,
+]
+
+# 汇总表读取 + 最近新建数（(user_id, created_at) 索引范围计数），一次往返
+READ_STATEMENT = text("""
+    SELECT category, total_notes, total_words, pinned_notes, archived_notes,
+           (SELECT count(*) FROM notes WHERE user_id = :user_id AND created_at >= :since) AS recent_notes
+    FROM note_stats
+    WHERE user_id = :user_id AND total_notes > 0
+""")
+
+
+class NoteStatsTable:
+    """note_stats 汇总表（进程级单例，schema初始化后记录是否可用）"""
+
+    def __init__(self):
+        self.available = False
+
+    async def ensure_schema(self, engine) -> bool:
+        """按 NOTE_STATS_TABLE_ENABLED 创建或停用汇总表触发器"""
+        async with engine.begin() as conn:
+            exists = (await conn.execute(text(
+                "SELECT count(*) FROM pg_trigger WHERE tgname LIKE 'note_stats_%' AND tgrelid = 'notes'::regclass"
+            ))).scalar()
+
+            if not NOTE_STATS_TABLE_ENABLED:
+                for statement in DROP_TRIGGER_STATEMENTS:
+                    await conn.execute(text(statement))
+                self.available = False
+                return False
+
+            if exists < len(CREATE_TRIGGER_STATEMENTS):
+                # 锁住notes写入，保证回填结果与触发器开始维护的时间点一致
+                await conn.execute(text("LOCK TABLE notes IN SHARE ROW EXCLUSIVE MODE"))
+                await conn.execute(text(CREATE_TABLE_STATEMENT))
+                await conn.execute(text(CREATE_FUNCTION_STATEMENT))
+                for statement in DROP_TRIGGER_STATEMENTS + CREATE_TRIGGER_STATEMENTS + BACKFILL_STATEMENTS:
+                    await conn.execute(text(statement))
+                logger.debug("note_stats 汇总表已创建并回填")
+            else:
+                # 函数可能随版本更新
+                await conn.execute(text(CREATE_FUNCTION_STATEMENT))
+
+        self.available = True
+        return True
+
+    async def read(self, db, user_id: int, since: datetime) -> Optional[Dict[str, Any]]:
+        """读取用户的笔记统计；汇总表不可用时返回None"""
+        if not self.available:
+            return None
+        rows = (await db.execute(READ_STATEMENT, {"user_id": user_id, "since": since})).all()
+        return {
+            "total_notes": sum(row.total_notes for row in rows),
+            "notes_by_category": {row.category: row.total_notes for row in rows},
+            "total_words": sum(row.total_words for row in rows),
+            "pinned_notes": sum(row.pinned_notes for row in rows),
+            "archived_notes": sum(row.archived_notes for row in rows),
+            "recent_notes": rows[0].recent_notes if rows else 0,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"enabled": NOTE_STATS_TABLE_ENABLED, "available": self.available}
+
+
+# 全局笔记统计汇总表实例
+note_stats_table = NoteStatsTable()
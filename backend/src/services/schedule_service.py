@@ -5,6 +5,18 @@ from typing import List, Optional, Tuple
 from datetime import datetime, date
 from ..models.database_models import ScheduleDB
 from ..models.schedule import Schedule, ScheduleCreate, ScheduleUpdate, ScheduleListResponse
+from ..models.bulk import BulkOperation, BulkResponse
+from .bulk_operations import BulkResourceSpec, execute_bulk
+
+
+SCHEDULE_BULK_SPEC = BulkResourceSpec(
+    model=ScheduleDB,
+    create_schema=ScheduleCreate,
+    update_schema=ScheduleUpdate,
+    to_create_row=lambda data, user_id: {**data.model_dump(), "user_id": user_id},
+    to_update_values=lambda data: data.model_dump(exclude_unset=True),
+    to_response=lambda schedule: Schedule.model_validate(schedule).model_dump(mode="json"),
+)
 
 
 class ScheduleService:
@@ -37,6 +49,20 @@ class ScheduleService:
         
         return Schedule.model_validate(db_schedule)
 
+    async def get_all_schedules(
+        self,
+        db: AsyncSession,
+        user_id: int
+    ) -> List[Schedule]:
+        """获取用户的所有日程（按开始时间排序，不分页）"""
+        result = await db.execute(
+            select(ScheduleDB)
+            .where(ScheduleDB.user_id == user_id)
+            .order_by(ScheduleDB.start_time)
+        )
+        schedules = result.scalars().all()
+        return [Schedule.model_validate(schedule) for schedule in schedules]
+
     async def get_schedule(
         self, 
         db: AsyncSession, 
@@ -175,6 +201,21 @@ class ScheduleService:
         
         return True
 
+    async def bulk_operations(
+        self,
+        db: AsyncSession,
+        operations: List[BulkOperation],
+        user_id: int
+    ) -> BulkResponse:
+        """批量创建/更新/删除日程（单个事务）"""
+        try:
+            response = await execute_bulk(db, SCHEDULE_BULK_SPEC, operations, user_id)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return response
+
     async def get_upcoming_schedules(
         self,
         db: AsyncSession,
@@ -6,9 +6,9 @@
 from typing import List, Optional
 from sqlalchemy import select, delete, and_
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy import create_engine
 from datetime import datetime, date
 
+from ..connection_pool import pool_manager
 from ..models.schedule import Schedule, ScheduleCreate, ScheduleUpdate
 from ..models.database_models import ScheduleDB
 import os
@@ -21,25 +21,8 @@ class SyncScheduleService:
     """
     
     def __init__(self):
-        # 创建同步数据库连接
-        POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost")
-        POSTGRES_PORT = os.getenv("POSTGRES_PORT", "5432")
-        POSTGRES_DB = os.getenv("POSTGRES_DB", "ai_todo_db")
-        POSTGRES_USER = os.getenv("POSTGRES_USER", "ai_todo_user")
-        POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD", "ai_todo_password")
-        
-        # 构建同步数据库URL
-        SYNC_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-        
-        # 创建同步引擎
-        self.engine = create_engine(
-            SYNC_DATABASE_URL,
-            echo=False,
-            pool_size=10,
-            max_overflow=20,
-            pool_pre_ping=True,
-            pool_recycle=3600,
-        )
+        # 使用连接池管理器提供的共享同步引擎，不再每个服务单独建立连接池
+        self.engine = pool_manager.get_sync_engine()
         
         # 创建会话工厂
         self.SessionLocal = sessionmaker(
@@ -1,11 +1,77 @@
 import asyncio
-from typing import List, Optional
-from sqlalchemy import select, update, delete, func
+import base64
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import select, insert, update, delete, func
 from sqlalchemy.orm import selectinload
 
 from ..database import get_db_session, AsyncSessionLocal
-from ..models import TaskItem
+from ..models import TaskItem, TaskCreateRequest, TaskUpdateRequest
+from ..models.bulk import BulkOperation, BulkResponse
 from ..models.database_models import TaskDB
+from .bulk_operations import BulkResourceSpec, execute_bulk
+from .text_search import text_search
+
+
+def _task_create_row(data: TaskCreateRequest, user_id: Optional[int]) -> dict:
+    if not data.title:
+        raise ValueError("Title is required")
+    return {"title": data.title, "is_complete": data.isComplete or False, "user_id": user_id}
+
+
+def _task_update_values(data: TaskUpdateRequest) -> dict:
+    values = {}
+    if data.title is not None:
+        values["title"] = data.title
+    if data.isComplete is not None:
+        values["is_complete"] = data.isComplete
+    return values
+
+
+TASK_BULK_SPEC = BulkResourceSpec(
+    model=TaskDB,
+    create_schema=TaskCreateRequest,
+    update_schema=TaskUpdateRequest,
+    to_create_row=_task_create_row,
+    to_update_values=_task_update_values,
+    to_response=lambda task: TaskItem(id=task.id, title=task.title, isComplete=task.is_complete).model_dump(),
+)
+
+
+def encode_task_cursor(task_id: int) -> str:
+    """Encode the keyset position (last returned task id) as an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps({"id": task_id}).encode()).decode().rstrip("=")
+
+
+def decode_task_cursor(cursor: str) -> int:
+    """Decode a cursor produced by encode_task_cursor; raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded.encode()))["id"])
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _task_filter_conditions(
+    user_id: Optional[int] = None,
+    is_complete: Optional[bool] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    title_prefix: Optional[str] = None,
+) -> list:
+    conditions = []
+    if user_id is not None:
+        conditions.append(TaskDB.user_id == user_id)
+    if is_complete is not None:
+        conditions.append(TaskDB.is_complete == is_complete)
+    if created_after is not None:
+        conditions.append(TaskDB.created_at >= created_after)
+    if created_before is not None:
+        conditions.append(TaskDB.created_at < created_before)
+    if title_prefix:
+        conditions.append(TaskDB.title.startswith(title_prefix, autoescape=True))
+    return conditions
 
 
 class TaskService:
@@ -17,26 +83,102 @@ class TaskService:
     def __init__(self):
         pass
     
-    async def get_all_tasks(self, user_id: Optional[int] = None) -> List[TaskItem]:
-        """Get all tasks from the database."""
+    async def get_all_tasks(
+        self,
+        user_id: Optional[int] = None,
+        is_complete: Optional[bool] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        title_prefix: Optional[str] = None,
+    ) -> List[TaskItem]:
+        """Get all (optionally filtered) tasks from the database."""
         async with get_db_session() as session:
-            query = select(TaskDB)
-            if user_id is not None:
-                query = query.where(TaskDB.user_id == user_id)
-            query = query.order_by(TaskDB.id)
+            query = (
+                select(TaskDB.id, TaskDB.title, TaskDB.is_complete)
+                .where(*_task_filter_conditions(user_id, is_complete, created_after, created_before, title_prefix))
+                .order_by(TaskDB.id)
+            )
             
             result = await session.execute(query)
-            tasks_db = result.scalars().all()
             
             return [
                 TaskItem(
-                    id=task.id,
-                    title=task.title,
-                    isComplete=task.is_complete
+                    id=row.id,
+                    title=row.title,
+                    isComplete=row.is_complete
                 )
-                for task in tasks_db
+                for row in result.all()
             ]
     
+    async def get_tasks_page(
+        self,
+        user_id: Optional[int] = None,
+        limit: int = 50,
+        cursor: Optional[int] = None,
+        is_complete: Optional[bool] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        title_prefix: Optional[str] = None,
+    ) -> Tuple[List[TaskItem], Optional[int]]:
+        """Get one page of tasks ordered by id (creation order) using keyset pagination.
+
+        Returns the tasks and the id to pass as the next cursor (None on the last page).
+        """
+        conditions = _task_filter_conditions(user_id, is_complete, created_after, created_before, title_prefix)
+        if cursor is not None:
+            conditions.append(TaskDB.id > cursor)
+
+        async with get_db_session() as session:
+            query = (
+                select(TaskDB.id, TaskDB.title, TaskDB.is_complete)
+                .where(*conditions)
+                .order_by(TaskDB.id)
+                .limit(limit + 1)
+            )
+            rows = (await session.execute(query)).all()
+
+        tasks = [TaskItem(id=row.id, title=row.title, isComplete=row.is_complete) for row in rows[:limit]]
+        next_cursor = tasks[-1].id if len(rows) > limit else None
+        return tasks, next_cursor
+
+    async def iter_tasks(
+        self,
+        user_id: Optional[int] = None,
+        is_complete: Optional[bool] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        title_prefix: Optional[str] = None,
+        batch_size: int = 500,
+    ) -> AsyncIterator[TaskItem]:
+        """Stream matching tasks ordered by id through a server-side cursor, without loading them all."""
+        conditions = _task_filter_conditions(user_id, is_complete, created_after, created_before, title_prefix)
+        async with get_db_session() as session:
+            query = (
+                select(TaskDB.id, TaskDB.title, TaskDB.is_complete)
+                .where(*conditions)
+                .order_by(TaskDB.id)
+                .execution_options(yield_per=batch_size)
+            )
+            result = await session.stream(query)
+            async for row in result:
+                yield TaskItem(id=row.id, title=row.title, isComplete=row.is_complete)
+
+    async def get_task_summary(
+        self,
+        user_id: Optional[int] = None,
+        is_complete: Optional[bool] = None,
+        title_prefix: Optional[str] = None,
+    ) -> Tuple[int, int]:
+        """Get (total, completed) counts for the matching tasks in a single query."""
+        conditions = _task_filter_conditions(user_id, is_complete, title_prefix=title_prefix)
+        async with get_db_session() as session:
+            query = select(
+                func.count(TaskDB.id),
+                func.count(TaskDB.id).filter(TaskDB.is_complete == True),
+            ).where(*conditions)
+            total, completed = (await session.execute(query)).one()
+            return total, completed
+
     async def get_task_by_id(self, task_id: int, user_id: Optional[int] = None) -> Optional[TaskItem]:
         """Get a task by its ID."""
         async with get_db_session() as session:
@@ -74,6 +216,10 @@ class TaskService:
     
     async def update_task(self, task_id: int, title: Optional[str] = None, is_complete: Optional[bool] = None, user_id: Optional[int] = None) -> bool:
         """Update a task by its ID."""
+        return await self.update_task_item(task_id, title, is_complete, user_id) is not None
+    
+    async def update_task_item(self, task_id: int, title: Optional[str] = None, is_complete: Optional[bool] = None, user_id: Optional[int] = None) -> Optional[TaskItem]:
+        """Update a task by its ID and return the updated task (None if not found)."""
         async with get_db_session() as session:
             # 首先获取当前任务
             query = select(TaskDB).where(TaskDB.id == task_id)
@@ -84,7 +230,7 @@ class TaskService:
             task_db = result.scalar_one_or_none()
             
             if not task_db:
-                return False
+                return None
             
             # 更新字段
             if title is not None:
@@ -93,7 +239,21 @@ class TaskService:
                 task_db.is_complete = is_complete
             
             await session.flush()
-            return True
+            return TaskItem(
+                id=task_db.id,
+                title=task_db.title,
+                isComplete=task_db.is_complete
+            )
+    
+    async def delete_task(self, task_id: int, user_id: Optional[int] = None) -> bool:
+        """Delete a task by its ID."""
+        async with get_db_session() as session:
+            query = delete(TaskDB).where(TaskDB.id == task_id)
+            if user_id is not None:
+                query = query.where(TaskDB.user_id == user_id)
+            
+            result = await session.execute(query)
+            return result.rowcount > 0
     
     async def get_task_by_title(self, title: str, user_id: Optional[int] = None) -> Optional[TaskItem]:
         """Get a task by its title."""
@@ -113,6 +273,35 @@ class TaskService:
                 )
             return None
     
+    async def find_task_by_title(self, title: str, user_id: Optional[int] = None) -> Optional[TaskItem]:
+        """Find the task whose title best matches the given text (contains match first, then trigram similarity)."""
+        return await text_search.find_task(title, user_id)
+    
+    async def search_tasks(self, query: str, user_id: Optional[int] = None, limit: int = 20,
+                           is_complete: Optional[bool] = None) -> List[TaskItem]:
+        """Search tasks by title, ranked by similarity."""
+        results = await text_search.search_tasks(query, user_id, limit, is_complete)
+        return [task for task, _ in results]
+    
+    async def get_latest_task(self, user_id: Optional[int] = None) -> Optional[TaskItem]:
+        """Get the most recently created task (highest ID)."""
+        async with get_db_session() as session:
+            query = select(TaskDB)
+            if user_id is not None:
+                query = query.where(TaskDB.user_id == user_id)
+            query = query.order_by(TaskDB.id.desc()).limit(1)
+            
+            result = await session.execute(query)
+            task_db = result.scalar_one_or_none()
+            
+            if task_db:
+                return TaskItem(
+                    id=task_db.id,
+                    title=task_db.title,
+                    isComplete=task_db.is_complete
+                )
+            return None
+    
     async def delete_task_by_title(self, title: str, user_id: Optional[int] = None) -> bool:
         """Delete a task by its title."""
         async with get_db_session() as session:
@@ -123,6 +312,114 @@ class TaskService:
             result = await session.execute(query)
             return result.rowcount > 0
     
+    @staticmethod
+    def _bulk_conditions(
+        task_ids: Optional[List[int]] = None,
+        title_contains: Optional[str] = None,
+        is_complete: Optional[bool] = None,
+        user_id: Optional[int] = None,
+    ) -> list:
+        """Build WHERE conditions for bulk operations (ids and/or filters).
+
+        The owner condition is always added: for anonymous calls (user_id None) it renders as
+        ``user_id IS NULL``, so a filter-only UPDATE/DELETE never reaches other users' tasks.
+        ``%`` and ``_`` in title_contains are matched literally.
+        """
+        conditions = [TaskDB.user_id.is_(None) if user_id is None else TaskDB.user_id == user_id]
+        if task_ids is not None:
+            conditions.append(TaskDB.id.in_(task_ids))
+        if title_contains:
+            conditions.append(TaskDB.title.contains(title_contains, autoescape=True))
+        if is_complete is not None:
+            conditions.append(TaskDB.is_complete == is_complete)
+        return conditions
+
+    async def add_tasks(self, titles: List[str], is_complete: bool = False, user_id: Optional[int] = None) -> List[TaskItem]:
+        """Add several tasks with a single multi-row INSERT ... RETURNING."""
+        if not titles:
+            return []
+        async with get_db_session() as session:
+            query = (
+                insert(TaskDB)
+                .values([
+                    {"title": title, "is_complete": is_complete, "user_id": user_id}
+                    for title in titles
+                ])
+                .returning(TaskDB.id, TaskDB.title, TaskDB.is_complete)
+            )
+            result = await session.execute(query)
+            rows = sorted(result.all(), key=lambda row: row.id)
+
+            return [TaskItem(id=row.id, title=row.title, isComplete=row.is_complete) for row in rows]
+
+    async def update_tasks(
+        self,
+        task_ids: Optional[List[int]] = None,
+        title_contains: Optional[str] = None,
+        is_complete_filter: Optional[bool] = None,
+        title: Optional[str] = None,
+        is_complete: Optional[bool] = None,
+        user_id: Optional[int] = None,
+    ) -> List[TaskItem]:
+        """Update all tasks matching the ids/filters with a single UPDATE ... RETURNING.
+
+        At least one of task_ids, title_contains or is_complete_filter is required so a
+        missing filter never updates every task of the user.
+        """
+        values = {}
+        if title is not None:
+            values["title"] = title
+        if is_complete is not None:
+            values["is_complete"] = is_complete
+        if not values:
+            return []
+        if task_ids is None and not title_contains and is_complete_filter is None:
+            raise ValueError("update_tasks requires task_ids or a filter")
+
+        async with get_db_session() as session:
+            query = (
+                update(TaskDB)
+                .where(*self._bulk_conditions(task_ids, title_contains, is_complete_filter, user_id))
+                .values(**values)
+                .returning(TaskDB.id, TaskDB.title, TaskDB.is_complete)
+                .execution_options(synchronize_session=False)
+            )
+            result = await session.execute(query)
+            rows = sorted(result.all(), key=lambda row: row.id)
+
+            return [TaskItem(id=row.id, title=row.title, isComplete=row.is_complete) for row in rows]
+
+    async def delete_tasks(
+        self,
+        task_ids: Optional[List[int]] = None,
+        title_contains: Optional[str] = None,
+        is_complete: Optional[bool] = None,
+        user_id: Optional[int] = None,
+    ) -> List[TaskItem]:
+        """Delete all tasks matching the ids/filters with a single DELETE ... RETURNING.
+
+        At least one of task_ids, title_contains or is_complete is required.
+        """
+        if task_ids is None and not title_contains and is_complete is None:
+            raise ValueError("delete_tasks requires task_ids or a filter")
+
+        async with get_db_session() as session:
+            query = (
+                delete(TaskDB)
+                .where(*self._bulk_conditions(task_ids, title_contains, is_complete, user_id))
+                .returning(TaskDB.id, TaskDB.title, TaskDB.is_complete)
+                .execution_options(synchronize_session=False)
+            )
+            result = await session.execute(query)
+            rows = sorted(result.all(), key=lambda row: row.id)
+
+            return [TaskItem(id=row.id, title=row.title, isComplete=row.is_complete) for row in rows]
+
+    async def bulk_operations(self, operations: List[BulkOperation], user_id: Optional[int] = None) -> BulkResponse:
+        """Execute a batch of create/update/delete operations in a single transaction."""
+        async with get_db_session() as session:
+            return await execute_bulk(session, TASK_BULK_SPEC, operations, user_id)
+
     async def get_task_count(self, user_id: Optional[int] = None) -> int:
         """Get the total number of tasks."""
         async with get_db_session() as session:
@@ -0,0 +1,278 @@
+"""
+文本检索（任务标题、笔记标题/内容的模糊匹配与全文检索）
+
+- pg_trgm GIN索引：LIKE/ILIKE '%…%' 和相似度匹配可以走索引，不再顺序扫描 tasks / notes
+- notes.search_vector：标题(权重A) + 内容(权重B) 的 tsvector 生成列 + GIN索引；
+  数据库安装了 zhparser 时使用中文分词配置 chinese_zh，否则使用 simple（中文依靠三元组匹配）
+- 按相似度排序的查询接口，供 REST 搜索和 Agent 工具共用
+
+扩展、索引由 schema 初始化（AdminInitializationService.initialize_database_schema）在启动时按需创建；
+数据库账号无权创建扩展等情况下自动退回普通 ILIKE，功能不受影响。
+search_vector 生成列的添加会在 ACCESS EXCLUSIVE 锁下重写整个 notes 表，启动时只对不超过
+TEXT_SEARCH_VECTOR_AUTO_ADD_MAX_ROWS 行的表自动添加；已有大量笔记的数据库请在维护窗口执行
+backend/migrations/add_notes_search_vector.sql
+"""
+
+import logging
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import case, func, literal, literal_column, or_, select, text
+
+from ..database import get_db_session
+from ..models import TaskItem
+from ..models.database_models import NoteDB, TaskDB
+
+logger = logging.getLogger(__name__)
+
+
+# 是否在启动时创建文本检索扩展和索引
+TEXT_SEARCH_ENABLED = os.getenv("TEXT_SEARCH_ENABLED", "true").lower() == "true"
+# tsvector使用的文本检索配置：auto 表示有 zhparser 时使用 chinese_zh，否则 simple
+TEXT_SEARCH_CONFIG = os.getenv("TEXT_SEARCH_CONFIG", "auto")
+# 三元组相似度匹配阈值（word_similarity），低于该值且不包含查询文本的任务不返回
+TEXT_SEARCH_SIMILARITY_THRESHOLD = float(os.getenv("TEXT_SEARCH_SIMILARITY_THRESHOLD", "0.3"))
+# notes 不超过该行数时启动时自动添加 search_vector 生成列（重写表），超过时需手动执行迁移脚本
+TEXT_SEARCH_VECTOR_AUTO_ADD_MAX_ROWS = int(os.getenv("TEXT_SEARCH_VECTOR_AUTO_ADD_MAX_ROWS", "10000"))
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_.]*$")
+
+# 三元组索引：(索引名, 定义)，CONCURRENTLY 创建，不阻塞表的读写
+TRGM_INDEXES = [
+    ("idx_tasks_title_trgm", "ON tasks USING gin (title gin_trgm_ops)"),
+    ("idx_notes_title_trgm", "ON notes USING gin (title gin_trgm_ops)"),
+    ("idx_notes_content_trgm", "ON notes USING gin (content gin_trgm_ops)"),
+]
+
+ZHPARSER_CONFIG_STATEMENT = """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'chinese_zh') THEN
+            CREATE TEXT SEARCH CONFIGURATION chinese_zh (PARSER = zhparser);
+            ALTER TEXT SEARCH CONFIGURATION chinese_zh ADD MAPPING FOR n,v,a,i,e,l,j WITH simple;
+        END IF;
+    END $$;
+"""
+
+# 首次添加生成列会在 ACCESS EXCLUSIVE 锁下重写 notes 表（之后启动时 IF NOT EXISTS 直接跳过）
+SEARCH_VECTOR_COLUMN_STATEMENT = """
+    ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{config}'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{config}'::regconfig, coalesce(content, '')), 'B')
+    ) STORED
+"""
+
+SEARCH_VECTOR_INDEX = ("idx_notes_search_vector", "ON notes USING gin (search_vector)")
+
+# 添加生成列时等待表锁的上限：有长事务持有notes的锁时放弃，不让排队的ALTER阻塞所有读写
+SEARCH_VECTOR_LOCK_TIMEOUT = "5s"
+
+
+# LIKE转义字符（与SQLAlchemy autoescape相同，不依赖数据库对反斜杠的默认处理）
+_LIKE_ESCAPE = "/"
+
+
+def _like_pattern(query: str) -> str:
+    """构造包含匹配的LIKE模式（转义通配符），与 escape=_LIKE_ESCAPE 一起使用"""
+    escaped = query.replace("/", "//").replace("%", "/%").replace("_", "/_")
+    return f"%{escaped}%"
+
+
+class TextSearch:
+    """文本检索子系统（进程级单例，schema初始化后记录可用能力）"""
+
+    def __init__(self):
+        self.trgm_available = False
+        self.tsvector_available = False
+        self.ts_config = "simple"
+        self.schema_errors: List[str] = []
+
+    async def ensure_schema(self, engine) -> Dict[str, Any]:
+        """创建扩展、文本检索配置、生成列和GIN索引（幂等），并检测实际可用的能力
+
+        每条语句在AUTOCOMMIT连接上单独执行：某一步失败（如无权限）不影响其他步骤，
+        CREATE INDEX CONCURRENTLY 也需要在事务外执行
+        """
+        self.schema_errors = []
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+            async def run(statement: str) -> bool:
+                try:
+                    await conn.execute(text(statement))
+                    return True
+                except Exception as e:
+                    message = str(e).splitlines()[0]
+                    self.schema_errors.append(message)
+                    logger.warning("文本检索schema步骤失败: %s", message)
+                    return False
+
+            async def scalar(statement: str, **params) -> Any:
+                return (await conn.execute(text(statement), params)).scalar()
+
+            async def ensure_index(name: str, definition: str) -> bool:
+                # CONCURRENTLY 建索引失败或被中断会留下 INVALID 索引，IF NOT EXISTS 之后会一直跳过它，
+                # 查询也不会使用它：先删除再重建
+                valid = await scalar(
+                    "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)",
+                    name=name,
+                )
+                if valid is False:
+                    logger.warning("索引 %s 无效（上次创建未完成），重建", name)
+                    if not await run(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"):
+                        return False
+                return await run(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+            if TEXT_SEARCH_ENABLED:
+                if await run("CREATE EXTENSION IF NOT EXISTS pg_trgm"):
+                    for name, definition in TRGM_INDEXES:
+                        await ensure_index(name, definition)
+
+                config = await self._choose_config(run, scalar)
+                if await self._ensure_search_vector_column(run, scalar, config):
+                    await ensure_index(*SEARCH_VECTOR_INDEX)
+
+            # 以数据库中的实际状态为准（列可能由早先的配置创建）
+            self.trgm_available = bool(await scalar("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+            expression = await scalar("""
+                SELECT pg_get_expr(d.adbin, d.adrelid)
+                FROM pg_attribute a
+                JOIN pg_attrdef d ON d.adrelid = a.attrelid AND d.adnum = a.attnum
+                WHERE a.attrelid = 'notes'::regclass AND a.attname = 'search_vector' AND NOT a.attisdropped
+            """)
+            self.tsvector_available = expression is not None
+            if expression:
+                match = re.search(r"to_tsvector\('([^']+)'", expression)
+                if match and _IDENTIFIER.match(match.group(1)):
+                    self.ts_config = match.group(1)
+
+        logger.debug("文本检索: pg_trgm=%s, tsvector=%s, config=%s", self.trgm_available, self.tsvector_available, self.ts_config)
+        return self.get_stats()
+
+    async def _ensure_search_vector_column(self, run, scalar, config: str) -> bool:
+        """search_vector 生成列已存在，或 notes 足够小可以在启动时添加时返回True
+
+        添加生成列要重写整个 notes 表并持有 ACCESS EXCLUSIVE 锁，期间笔记的读写全部阻塞；
+        表较大时跳过并提示执行迁移脚本
+        """
+        exists = await scalar(
+            "SELECT 1 FROM pg_attribute WHERE attrelid = 'notes'::regclass "
+            "AND attname = 'search_vector' AND NOT attisdropped"
+        )
+        if exists:
+            return True
+        rows = await scalar(
+            "SELECT count(*) FROM (SELECT 1 FROM notes LIMIT :limit) AS sample",
+            limit=TEXT_SEARCH_VECTOR_AUTO_ADD_MAX_ROWS + 1,
+        )
+        if rows > TEXT_SEARCH_VECTOR_AUTO_ADD_MAX_ROWS:
+            message = (f"notes 超过 {TEXT_SEARCH_VECTOR_AUTO_ADD_MAX_ROWS} 行，未自动添加 search_vector 列"
+                       f"（需重写整表），请在维护窗口执行 backend/migrations/add_notes_search_vector.sql")
+            self.schema_errors.append(message)
+            logger.warning("%s", message)
+            return False
+        await run(f"SET lock_timeout = '{SEARCH_VECTOR_LOCK_TIMEOUT}'")
+        try:
+            return await run(SEARCH_VECTOR_COLUMN_STATEMENT.format(config=config))
+        finally:
+            await run("RESET lock_timeout")
+
+    async def _choose_config(self, run, scalar) -> str:
+        """选择tsvector使用的文本检索配置"""
+        if TEXT_SEARCH_CONFIG != "auto":
+            if _IDENTIFIER.match(TEXT_SEARCH_CONFIG):
+                return TEXT_SEARCH_CONFIG
+            logger.warning("TEXT_SEARCH_CONFIG 无效: %s，使用 simple", TEXT_SEARCH_CONFIG)
+            return "simple"
+        if await scalar("SELECT 1 FROM pg_available_extensions WHERE name = 'zhparser'"):
+            if await run("CREATE EXTENSION IF NOT EXISTS zhparser") and await run(ZHPARSER_CONFIG_STATEMENT):
+                return "chinese_zh"
+        return "simple"
+
+    def _tsquery(self, query: str):
+        return func.websearch_to_tsquery(literal_column(f"'{self.ts_config}'::regconfig"), query)
+
+    def title_match(self, column, query: str) -> Tuple[Any, Any]:
+        """标题匹配条件和相似度分数表达式
+
+        包含查询文本（ILIKE）或 word_similarity 超过阈值（<% 运算符）都算匹配，两者都能走三元组索引；
+        包含查询文本的结果排在前面，其余按相似度排序。
+        <% 的阈值取自 pg_trgm.word_similarity_threshold，需在同一事务中先调用 set_similarity_threshold
+        """
+        contains = column.ilike(_like_pattern(query), escape=_LIKE_ESCAPE)
+        if not self.trgm_available:
+            return contains, case((contains, 1.0), else_=0.0)
+        condition = or_(contains, literal(query).op("<%")(column))
+        return condition, case((contains, 1.0), else_=0.0) + func.word_similarity(literal(query), column)
+
+    async def set_similarity_threshold(self, session) -> None:
+        """在当前事务内设置 <% 运算符使用的相似度阈值"""
+        if self.trgm_available:
+            await session.execute(
+                text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                {"threshold": str(TEXT_SEARCH_SIMILARITY_THRESHOLD)},
+            )
+
+    async def search_tasks(
+        self,
+        query: str,
+        user_id: Optional[int] = None,
+        limit: int = 20,
+        is_complete: Optional[bool] = None,
+    ) -> List[Tuple[TaskItem, float]]:
+        """按标题相似度搜索任务，返回 (任务, 分数)，分数从高到低"""
+        query = (query or "").strip()
+        if not query:
+            return []
+        condition, score = self.title_match(TaskDB.title, query)
+        statement = select(TaskDB.id, TaskDB.title, TaskDB.is_complete, score.label("score")).where(condition)
+        if user_id is not None:
+            statement = statement.where(TaskDB.user_id == user_id)
+        if is_complete is not None:
+            statement = statement.where(TaskDB.is_complete == is_complete)
+        statement = statement.order_by(score.desc(), func.length(TaskDB.title), TaskDB.id).limit(limit)
+
+        async with get_db_session() as session:
+            await self.set_similarity_threshold(session)
+            rows = (await session.execute(statement)).all()
+        return [
+            (TaskItem(id=row.id, title=row.title, isComplete=row.is_complete), float(row.score))
+            for row in rows
+        ]
+
+    async def find_task(self, title: str, user_id: Optional[int] = None) -> Optional[TaskItem]:
+        """按标题找最匹配的一个任务"""
+        results = await self.search_tasks(title, user_id, limit=1)
+        return results[0][0] if results else None
+
+    def note_condition(self, query: str):
+        """笔记关键词匹配条件：标题/内容包含查询文本，或全文检索命中"""
+        pattern = _like_pattern(query)
+        conditions = [NoteDB.title.ilike(pattern, escape=_LIKE_ESCAPE), NoteDB.content.ilike(pattern, escape=_LIKE_ESCAPE)]
+        if self.tsvector_available:
+            conditions.append(literal_column("notes.search_vector").op("@@")(self._tsquery(query)))
+        return or_(*conditions)
+
+    def note_rank(self, query: str):
+        """笔记相关度：标题包含查询文本 + 标题相似度 + 全文检索排名"""
+        rank = case((NoteDB.title.ilike(_like_pattern(query), escape=_LIKE_ESCAPE), 1.0), else_=0.0)
+        if self.trgm_available:
+            rank = rank + func.word_similarity(literal(query), NoteDB.title)
+        if self.tsvector_available:
+            rank = rank + func.ts_rank(literal_column("notes.search_vector"), self._tsquery(query))
+        return rank
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": TEXT_SEARCH_ENABLED,
+            "trgm_available": self.trgm_available,
+            "tsvector_available": self.tsvector_available,
+            "ts_config": self.ts_config,
+            "schema_errors": list(self.schema_errors),
+        }
+
+
+# 全局文本检索实例
+text_search = TextSearch()
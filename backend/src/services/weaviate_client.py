@@ -24,20 +24,30 @@ class WeaviateClient:
         # 构建连接URL
         self.url = f"{self.scheme}://{self.host}:{self.port}"
         
-        # 创建客户端
-        self.client = weaviate.Client(
-            url=self.url,
-            additional_headers={
-                "X-OpenAI-Api-Key": os.getenv("OPENAI_API_KEY", ""),
-                "X-OpenAI-BaseURL": os.getenv("OPENAI_API_BASE", "")
-            }
-        )
-        
-        # 确保连接正常
-        self._ensure_connection()
-        
-        # 创建笔记类（如果不存在）
-        self._create_note_class()
+        # 客户端在首次使用时创建（导入模块时不连接 Weaviate，避免阻塞应用启动）
+        self._client = None
+    
+    @property
+    def client(self):
+        """获取 Weaviate 客户端（首次访问时连接并确保笔记类存在）"""
+        if self._client is None:
+            self._client = weaviate.Client(
+                url=self.url,
+                additional_headers={
+                    "X-OpenAI-Api-Key": os.getenv("OPENAI_API_KEY", ""),
+                    "X-OpenAI-BaseURL": os.getenv("OPENAI_API_BASE", "")
+                }
+            )
+            try:
+                # 确保连接正常
+                self._ensure_connection()
+                
+                # 创建笔记类（如果不存在）
+                self._create_note_class()
+            except Exception:
+                self._client = None
+                raise
+        return self._client
     
     def _ensure_connection(self):
         """确保 Weaviate 连接正常"""
@@ -0,0 +1,109 @@
+"""
+启动导入耗时分析与快速启动配置
+统计每个模块的导入耗时（类似 python -X importtime），按顶层包聚合后通过 /api/health 展示
+
+实现方式：包装CPython导入系统加载模块的函数（_frozen_importlib._load_unlocked），
+记录每个模块执行的总耗时和扣除子模块导入后的自身耗时；非CPython环境下自动禁用
+"""
+
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import _frozen_importlib
+except ImportError:  # 非CPython
+    _frozen_importlib = None
+
+
+# 是否启用导入耗时分析
+STARTUP_PROFILE_ENABLED = os.getenv("STARTUP_PROFILE_ENABLED", "true").lower() == "true"
+# 报告中展示的模块/包数量
+STARTUP_PROFILE_TOP_N = int(os.getenv("STARTUP_PROFILE_TOP_N", "15"))
+# 快速启动模式：可选子系统（智能搜索/Weaviate、Celery客户端、分析服务、assistant_stream）
+# 不在启动时预加载，首次使用时再导入
+FAST_START = os.getenv("FAST_START", "false").lower() == "true"
+
+
+class ImportProfiler:
+    """模块导入耗时分析器"""
+
+    def __init__(self):
+        self._original_load = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 模块名 -> (总耗时ms, 自身耗时ms)
+        self._modules: Dict[str, List[float]] = {}
+        self.installed_at: Optional[float] = None
+
+    @property
+    def installed(self) -> bool:
+        return self._original_load is not None
+
+    def install(self) -> None:
+        """开始记录模块导入耗时"""
+        if self.installed or _frozen_importlib is None or not hasattr(_frozen_importlib, "_load_unlocked"):
+            return
+        self._original_load = _frozen_importlib._load_unlocked
+        self.installed_at = time.perf_counter()
+        original_load = self._original_load
+        profiler = self
+
+        def _timed_load_unlocked(spec):
+            stack = getattr(profiler._local, "stack", None)
+            if stack is None:
+                stack = profiler._local.stack = []
+            # 栈元素：[子模块导入累计耗时]
+            stack.append([0.0])
+            start = time.perf_counter()
+            try:
+                return original_load(spec)
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                children = stack.pop()[0]
+                if stack:
+                    stack[-1][0] += elapsed
+                with profiler._lock:
+                    profiler._modules[spec.name] = [elapsed, max(elapsed - children, 0.0)]
+
+        _frozen_importlib._load_unlocked = _timed_load_unlocked
+
+    def uninstall(self) -> None:
+        """停止记录（已记录的数据保留）"""
+        if self.installed:
+            _frozen_importlib._load_unlocked = self._original_load
+            self._original_load = None
+
+    def get_report(self, top_n: int = STARTUP_PROFILE_TOP_N) -> Dict[str, Any]:
+        """获取导入耗时报告：总耗时、耗时最多的顶层包和模块"""
+        with self._lock:
+            modules = dict(self._modules)
+
+        packages: Dict[str, Dict[str, float]] = {}
+        for name, (_, self_ms) in modules.items():
+            package = packages.setdefault(name.split(".", 1)[0], {"self_ms": 0.0, "modules": 0})
+            package["self_ms"] += self_ms
+            package["modules"] += 1
+
+        top_packages = sorted(packages.items(), key=lambda item: item[1]["self_ms"], reverse=True)[:top_n]
+        top_modules = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:top_n]
+        return {
+            "enabled": self.installed,
+            "modules_imported": len(modules),
+            "total_ms": round(sum(self_ms for _, self_ms in modules.values()), 2),
+            "top_packages": [
+                {"package": name, "self_ms": round(stats["self_ms"], 2), "modules": int(stats["modules"])}
+                for name, stats in top_packages
+            ],
+            "top_modules": [
+                {"module": name, "self_ms": round(self_ms, 2), "cumulative_ms": round(total_ms, 2)}
+                for name, (total_ms, self_ms) in top_modules
+            ],
+        }
+
+
+# 全局导入耗时分析器（导入本模块时即开始记录）
+import_profiler = ImportProfiler()
+if STARTUP_PROFILE_ENABLED:
+    import_profiler.install()
@@ -3,7 +3,7 @@
 """
 
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 from celery import current_task
 
 from ..celery_app import celery_app
@@ -36,3 +36,14 @@ def delete_note_from_vector_db(note_id: int, user_id: int) -> Dict[str, Any]:
         return {"status": "error", "message": str(e)}
 
 
+@celery_app.task(name="src.tasks.note_sync_tasks.sync_notes_batch")
+def sync_notes_batch(user_id: int, note_ids: List[int], deleted_note_ids: List[int]) -> Dict[str, Any]:
+    """批量接口派发的合并同步任务：同步 note_ids，删除 deleted_note_ids"""
+    try:
+        current_task.update_state(state="PROGRESS", meta={"user_id": user_id, "notes": len(note_ids), "deleted": len(deleted_note_ids)})
+        result = note_sync_service.sync_notes_batch(user_id, note_ids, deleted_note_ids)
+        return {"user_id": user_id, "status": "success" if not result["failed"] else "partial", **result}
+    except Exception as e:
+        logger.error(f"sync notes batch error: {e}")
+        current_task.update_state(state="FAILURE", meta={"error": str(e)})
+        return {"status": "error", "message": str(e)}
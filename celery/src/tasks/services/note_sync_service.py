@@ -64,6 +64,55 @@ class NoteSyncService:
                 for n in notes
             ]
 
+    def get_notes(self, note_ids: List[int], user_id: int) -> List[Dict[str, Any]]:
+        """一次查询获取多条笔记"""
+        if not note_ids:
+            return []
+        with self.get_session() as session:
+            result = session.execute(select(NoteDB).where(NoteDB.id.in_(note_ids), NoteDB.user_id == user_id))
+            return [
+                {
+                    "id": n.id,
+                    "user_id": n.user_id,
+                    "title": n.title,
+                    "content": n.content,
+                    "category": n.category.value,
+                    "tags": n.tags or [],
+                    "is_pinned": n.is_pinned,
+                    "is_archived": n.is_archived,
+                    "word_count": n.word_count,
+                    "created_at": n.created_at.isoformat(),
+                    "updated_at": n.updated_at.isoformat(),
+                }
+                for n in result.scalars().all()
+            ]
+
+    def sync_notes_batch(self, user_id: int, note_ids: List[int], deleted_note_ids: List[int]) -> Dict[str, Any]:
+        """批量同步：一次查询读取笔记，复用同一个 Weaviate 客户端完成同步和删除"""
+        result = {"synced": 0, "deleted": 0, "failed": []}
+        weaviate_client = create_weaviate_client()
+
+        for note in self.get_notes(note_ids, user_id):
+            try:
+                if weaviate_client.get_note_by_id(note["id"], user_id):
+                    weaviate_client.update_note(note)
+                else:
+                    weaviate_client.add_note(note)
+                result["synced"] += 1
+            except Exception as e:
+                print(f"同步笔记 {note['id']} 到向量数据库失败: {e}")
+                result["failed"].append(note["id"])
+
+        for note_id in deleted_note_ids:
+            try:
+                weaviate_client.delete_note(note_id, user_id)
+                result["deleted"] += 1
+            except Exception as e:
+                print(f"从向量数据库中删除笔记 {note_id} 失败: {e}")
+                result["failed"].append(note_id)
+
+        return result
+
     def sync_note_to_vector_db(self, note_id: int, user_id: int) -> bool:
         """同步笔记到向量数据库（使用自定义嵌入服务）"""
         try:
@@ -0,0 +1,34 @@
+"""
+测试用的后端模块加载
+
+backend/src 及其子包的 __init__ 会导入整个应用（构建FastAPI app、创建数据库引擎、导入所有agent），
+这里为 src 和各级子包创建不执行 __init__ 的空包，再按常规导入机制加载目标模块：
+模块内的相对导入（from .x / from ..y）照常解析到 backend/src 下的文件，只加载实际用到的模块
+"""
+
+import importlib
+import os
+import sys
+import types
+
+
+BACKEND_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'src')
+
+# 空包的顶层名称，与真正的 src 包区分，避免与 sys.path 方式导入的 src 互相覆盖
+PACKAGE = "src_under_test"
+
+
+def _ensure_package(name: str) -> None:
+    if name in sys.modules:
+        return
+    package = types.ModuleType(name)
+    package.__path__ = [os.path.join(BACKEND_SRC, *name.split(".")[1:])]
+    sys.modules[name] = package
+
+
+def load_backend_module(name: str):
+    """加载 backend/src 下的模块，name 为相对 src 的点分路径（如 "agents.supervisor.plan_cache"）"""
+    parts = name.split(".")
+    for depth in range(len(parts)):
+        _ensure_package(".".join([PACKAGE] + parts[:depth]))
+    return importlib.import_module(f"{PACKAGE}.{name}")
@@ -0,0 +1,130 @@
+"""
+文本检索基准测试（需要可连接的PostgreSQL）
+
+在独立schema中生成 N 行任务和笔记（默认各100万行），对比：
+- 建索引前：LIKE '%…%' / ILIKE 顺序扫描
+- 建索引后：pg_trgm GIN索引上的 ILIKE、<%（word_similarity）相似度排序查询，
+  以及 notes.search_vector 生成列上的全文检索
+输出每个查询的执行计划类型和耗时（EXPLAIN ANALYZE）。
+
+用法：
+    POSTGRES_HOST=localhost python cursortest/benchmark_text_search.py [--rows 1000000] [--keep]
+"""
+
+import argparse
+import os
+import time
+
+from sqlalchemy import create_engine, text
+
+
+SCHEMA = "text_search_bench"
+
+WORDS = ["买菜", "开会", "周报", "健身", "读书", "写代码", "复习", "打电话", "报销", "旅行",
+         "项目", "计划", "整理", "发票", "牛奶", "面包", "客户", "需求", "评审", "部署"]
+
+
+def _engine():
+    url = (
+        f"postgresql://{os.getenv('POSTGRES_USER', 'ai_todo_user')}:{os.getenv('POSTGRES_PASSWORD', 'ai_todo_password')}"
+        f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}/{os.getenv('POSTGRES_DB', 'ai_todo_db')}"
+    )
+    return create_engine(url, isolation_level="AUTOCOMMIT")
+
+
+def _timed(conn, label: str, sql: str) -> None:
+    """执行一次查询，打印执行计划的主要节点和耗时"""
+    start = time.perf_counter()
+    plan = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")).scalar()[0]
+    elapsed = (time.perf_counter() - start) * 1000
+    nodes = []
+
+    def walk(node):
+        nodes.append(node["Node Type"] + (f" on {node['Index Name']}" if "Index Name" in node else ""))
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan["Plan"])
+    print(f"  {label:<42} {plan['Execution Time']:>9.1f}ms (往返 {elapsed:.1f}ms)  {' > '.join(nodes)}")
+
+
+def _populate(conn, rows: int) -> None:
+    words = "ARRAY[" + ",".join(f"'{w}'" for w in WORDS) + "]"
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"SET search_path TO {SCHEMA}, public"))
+    conn.execute(text("CREATE TABLE tasks (id serial PRIMARY KEY, user_id int NOT NULL, title varchar(255) NOT NULL, is_complete boolean DEFAULT false)"))
+    conn.execute(text("CREATE TABLE notes (id serial PRIMARY KEY, user_id int NOT NULL, title varchar(255) NOT NULL, content text NOT NULL)"))
+
+    start = time.perf_counter()
+    conn.execute(text(f"""
+        INSERT INTO tasks (user_id, title, is_complete)
+        SELECT i % 100, ({words})[1 + i % 20] || ({words})[1 + (i / 20) % 20] || ' #' || i, i % 3 = 0
+        FROM generate_series(1, {rows}) AS i
+    """))
+    conn.execute(text(f"""
+        INSERT INTO notes (user_id, title, content)
+        SELECT i % 100,
+               ({words})[1 + i % 20] || '笔记 ' || i,
+               repeat(({words})[1 + (i / 7) % 20] || '，' || ({words})[1 + (i / 3) % 20] || '。', 5) || ' ref' || i
+        FROM generate_series(1, {rows}) AS i
+    """))
+    conn.execute(text("CREATE INDEX ON tasks (user_id)"))
+    conn.execute(text("CREATE INDEX ON notes (user_id)"))
+    conn.execute(text("ANALYZE tasks; ANALYZE notes"))
+    print(f"生成 {rows} 行任务和笔记: {time.perf_counter() - start:.1f}s")
+
+
+def _queries(conn, indexed: bool) -> None:
+    _timed(conn, "tasks LIKE '%周报开会%'", "SELECT id FROM tasks WHERE title LIKE '%周报开会%' LIMIT 20")
+    _timed(conn, "tasks ILIKE '%周报开会 #4242%'", "SELECT id FROM tasks WHERE title ILIKE '%周报开会 #4242%'")
+    _timed(conn, "notes ILIKE title/content", "SELECT id FROM notes WHERE title ILIKE '%ref77777%' OR content ILIKE '%ref77777%'")
+    if indexed:
+        conn.execute(text("SET pg_trgm.word_similarity_threshold = 0.3"))
+        _timed(conn, "tasks <% 相似度排序 (user 7)", """
+            SELECT id, word_similarity('周报开会 4242', title) AS score FROM tasks
+            WHERE user_id = 7 AND (title ILIKE '%周报开会 4242%' OR '周报开会 4242' <% title)
+            ORDER BY score DESC LIMIT 20
+        """)
+        _timed(conn, "notes 全文检索 @@", """
+            SELECT id FROM notes WHERE search_vector @@ websearch_to_tsquery('simple', 'ref77777')
+        """)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="pg_trgm / tsvector 文本检索基准")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--keep", action="store_true", help="保留测试schema")
+    args = parser.parse_args()
+
+    engine = _engine()
+    with engine.connect() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        _populate(conn, args.rows)
+
+        print("\n建索引前（顺序扫描）:")
+        _queries(conn, indexed=False)
+
+        start = time.perf_counter()
+        conn.execute(text("CREATE INDEX idx_tasks_title_trgm ON tasks USING gin (title gin_trgm_ops)"))
+        conn.execute(text("CREATE INDEX idx_notes_title_trgm ON notes USING gin (title gin_trgm_ops)"))
+        conn.execute(text("CREATE INDEX idx_notes_content_trgm ON notes USING gin (content gin_trgm_ops)"))
+        conn.execute(text("""
+            ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+                setweight(to_tsvector('simple'::regconfig, coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('simple'::regconfig, coalesce(content, '')), 'B')
+            ) STORED
+        """))
+        conn.execute(text("CREATE INDEX idx_notes_search_vector ON notes USING gin (search_vector)"))
+        conn.execute(text("ANALYZE tasks; ANALYZE notes"))
+        print(f"\n建索引和生成列: {time.perf_counter() - start:.1f}s")
+
+        print("\n建索引后:")
+        _queries(conn, indexed=True)
+
+        if not args.keep:
+            conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+测试用的内存SQLite会话
+
+服务层通过 get_db_session()（异步会话）访问数据库；测试环境没有PostgreSQL和异步SQLite驱动，
+这里用同步SQLite会话包装出服务层用到的异步接口，并替换模块中的 get_db_session
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+
+class AsyncSessionAdapter:
+    """把同步Session包装成服务层使用的异步接口"""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return self.session.scalars(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return self.session.scalar(*args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        rows = self.session.execute(*args, **kwargs).all()
+
+        async def iterate():
+            for row in rows:
+                yield row
+
+        return iterate()
+
+
+class SQLiteDatabase:
+    """内存SQLite数据库（只创建给定的表），记录执行过的SQL语句
+
+    所有线程共用一个连接（TestClient在另一个线程中运行应用）
+    """
+
+    def __init__(self, *models):
+        self.engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        for model in models:
+            model.__table__.create(self.engine)
+        self.statements = []
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def record(conn, cursor, statement, parameters, context, executemany):
+            self.statements.append((statement, parameters))
+
+    def insert(self, model, rows) -> None:
+        with Session(self.engine) as session:
+            session.execute(model.__table__.insert(), list(rows))
+            session.commit()
+        self.statements.clear()
+
+    def rows(self, model):
+        with Session(self.engine) as session:
+            return session.execute(model.__table__.select().order_by(model.id)).all()
+
+    @asynccontextmanager
+    async def get_db_session(self):
+        """与 database.get_db_session 相同的提交/回滚语义"""
+        with Session(self.engine) as session:
+            try:
+                yield AsyncSessionAdapter(session)
+                session.commit()
+            except Exception:
+                session.rollback()
+                raise
+
+    def install(self, *modules) -> None:
+        """替换模块中导入的 get_db_session"""
+        for module in modules:
+            module.get_db_session = self.get_db_session
+
+
+def run(coroutine):
+    """运行协程（测试函数是同步的，与 main() 运行方式一致）"""
+    return asyncio.run(coroutine)
@@ -0,0 +1,193 @@
+"""
+测试Aggregate节点的模板化响应
+
+验证单个增删改步骤按最后一次增删改工具调用的结构化结果渲染（查询类工具输出和先前未成功的尝试不计入）、
+单步查询只在恰好一次工具调用时渲染，以及步骤失败、增删改未成功、多步查询计划、关闭模板化时交给LLM汇总
+"""
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from backend_loader import load_backend_module
+
+
+graph_module = load_backend_module("agents.supervisor.graph")
+mutation_result = load_backend_module("agents.sub_agents.tool_outcome").mutation_result
+
+
+def _plan(*steps):
+    return {"summary": "", "steps": [
+        {"agent": agent, "action": action, "params": {}, "description": f"{agent} {action}"}
+        for agent, action in steps
+    ]}
+
+
+def _tool_message(content, mutation_success=None, call_id="call"):
+    """工具输出；mutation_success 不为None时带增删改工具的结构化结果"""
+    if mutation_success is None:
+        return ToolMessage(content=content, tool_call_id=call_id)
+    content, artifact = mutation_result(content, mutation_success)
+    return ToolMessage(content=content, artifact=artifact, tool_call_id=call_id)
+
+
+class ScriptedSubGraph:
+    """返回预设工具消息和最终回复的子agent graph"""
+
+    def __init__(self, tool_messages, reply):
+        self.tool_messages = tool_messages
+        self.reply = reply
+
+    async def ainvoke(self, state, config=None):
+        return {"messages": state["messages"] + self.tool_messages + [AIMessage(content=self.reply)]}
+
+
+def _execute(plan, sub_graphs):
+    """用预设子agent依次运行计划的每个步骤，返回执行结果"""
+    graph_module._sub_agent_graphs.clear()
+    graph_module._sub_agent_graphs.update(sub_graphs)
+    state = {"messages": [HumanMessage(content="请求")], "user_id": 1, "plan": plan, "execution_results": []}
+    try:
+        return [asyncio.run(graph_module._run_step(state, index)) for index in range(len(plan["steps"]))]
+    finally:
+        graph_module._sub_agent_graphs.clear()
+
+
+def _aggregate(plan, execution_results, template_enabled=True):
+    """运行汇总节点，返回 (最终响应, 是否调用了LLM)"""
+    llm_calls = []
+
+    async def fake_stream_llm_response(role, messages, config=None):
+        llm_calls.append(role)
+        return AIMessage(content="LLM汇总")
+
+    original = (graph_module._llm, graph_module._stream_llm_response, graph_module.AGGREGATE_TEMPLATE_ENABLED)
+    graph_module._llm = object()
+    graph_module._stream_llm_response = fake_stream_llm_response
+    graph_module.AGGREGATE_TEMPLATE_ENABLED = template_enabled
+    try:
+        state = {"messages": [HumanMessage(content="请求")], "plan": plan, "execution_results": execution_results}
+        update = asyncio.run(graph_module._aggregate_node(state))
+    finally:
+        graph_module._llm, graph_module._stream_llm_response, graph_module.AGGREGATE_TEMPLATE_ENABLED = original
+    assert update["should_continue"] is False
+    return update["messages"][0].content, bool(llm_calls)
+
+
+def test_single_mutation_renders_last_mutation():
+    """测试单个增删改步骤按最后一次增删改工具调用渲染，忽略之前的查询和未成功的尝试"""
+    plan = _plan(("task", "delete"))
+    results = _execute(plan, {"task": ScriptedSubGraph([
+        _tool_message("找到 1 个与 \"周报\" 匹配的任务:\n- 4: 周报"),
+        _tool_message('未找到名称为 "周 报" 的任务。', False, "c1"),
+        _tool_message('任务 "周报" 删除成功。\nfrontend_tool_call:refresh_task_list {}', True, "c2"),
+    ], "已删除任务周报")})
+    assert results[0]["mutation_output"]["success"] is True
+
+    content, used_llm = _aggregate(plan, results)
+    assert not used_llm
+    assert content == '🗑️ 已为您删除任务：\n任务 "周报" 删除成功。'
+    print("✓ 单个增删改步骤模板化渲染")
+
+
+def test_unsuccessful_mutation_falls_through():
+    """测试最后一次增删改未成功（如未找到）或没有结构化结果时交给LLM"""
+    plan = _plan(("task", "delete"))
+    # 子agent回复中没有"失败"字样，步骤本身算成功，但增删改工具报告未成功
+    results = _execute(plan, {"task": ScriptedSubGraph([
+        _tool_message('任务 "周报" 删除成功。', True, "c1"),
+        _tool_message('未找到名称为 "周会" 的任务。', False, "c2"),
+    ], "周会没有找到")})
+    assert results[0]["success"] and results[0]["mutation_output"]["success"] is False
+    assert _aggregate(plan, results) == ("LLM汇总", True)
+
+    # 只调用了查询工具，没有增删改结果
+    results = _execute(plan, {"task": ScriptedSubGraph([_tool_message("没有找到任务。")], "没有可删除的任务")})
+    assert results[0]["mutation_output"] is None
+    assert _aggregate(plan, results) == ("LLM汇总", True)
+    print("✓ 增删改未成功时交给LLM")
+
+
+def test_failed_step_falls_through():
+    """测试步骤失败（子agent报错或回复失败）时交给LLM"""
+    plan = _plan(("task", "create"))
+
+    class BrokenSubGraph:
+        async def ainvoke(self, state, config=None):
+            raise RuntimeError("数据库不可用")
+
+    results = _execute(plan, {"task": BrokenSubGraph()})
+    assert not results[0]["success"]
+    assert _aggregate(plan, results) == ("LLM汇总", True)
+
+    results = _execute(plan, {"task": ScriptedSubGraph([_tool_message("任务创建失败: 超时", False)], "任务创建失败")})
+    assert _aggregate(plan, results) == ("LLM汇总", True)
+    print("✓ 步骤失败时交给LLM")
+
+
+def test_single_query_renders_one_tool_output():
+    """测试单步查询恰好一次工具调用时渲染，多次查询交给LLM"""
+    plan = _plan(("task", "query"))
+    results = _execute(plan, {"task": ScriptedSubGraph([_tool_message("找到 2 个任务:\n- 1: 周报\n- 2: 买菜")], "共2个任务")})
+    assert _aggregate(plan, results) == ("📋 找到 2 个任务:\n- 1: 周报\n- 2: 买菜", False)
+
+    results = _execute(plan, {"task": ScriptedSubGraph([
+        _tool_message("找到 2 个任务:\n- 1: 周报\n- 2: 买菜", call_id="c1"),
+        _tool_message("任务 1: 周报 (未完成)", call_id="c2"),
+    ], "周报未完成")})
+    assert _aggregate(plan, results) == ("LLM汇总", True)
+    print("✓ 单步查询")
+
+
+def test_multi_step_plans():
+    """测试多步计划：包含查询的交给LLM，全部成功的增删改逐步渲染，任一步未成功交给LLM"""
+    created = ScriptedSubGraph([_tool_message('任务创建成功: "周报" (ID: 7)', True)], "已创建")
+    note_created = ScriptedSubGraph([_tool_message('笔记创建成功: "会议纪要"', True)], "已创建")
+    listed = ScriptedSubGraph([_tool_message("找到 1 个任务:\n- 7: 周报")], "共1个任务")
+
+    plan = _plan(("task", "create"), ("note", "query"))
+    results = _execute(plan, {"task": created, "note": listed})
+    assert _aggregate(plan, results) == ("LLM汇总", True)
+
+    plan = _plan(("task", "create"), ("note", "create"))
+    results = _execute(plan, {"task": created, "note": note_created})
+    content, used_llm = _aggregate(plan, results)
+    assert not used_llm
+    assert content == '✅ 已为您创建任务：\n任务创建成功: "周报" (ID: 7)\n\n✅ 已为您创建笔记：\n笔记创建成功: "会议纪要"'
+
+    not_found = ScriptedSubGraph([_tool_message("未找到笔记", False)], "没有找到笔记")
+    plan = _plan(("task", "create"), ("note", "delete"))
+    results = _execute(plan, {"task": created, "note": not_found})
+    assert _aggregate(plan, results) == ("LLM汇总", True)
+
+    # 缺少步骤结果时不渲染
+    assert graph_module._render_template_response(_plan(("task", "create"), ("note", "create")), results[:1]) is None
+    print("✓ 多步计划")
+
+
+def test_template_disabled():
+    """测试 AGGREGATE_TEMPLATE_ENABLED=false 时总是由LLM汇总"""
+    plan = _plan(("task", "create"))
+    results = _execute(plan, {"task": ScriptedSubGraph([_tool_message('任务创建成功: "周报" (ID: 7)', True)], "已创建")})
+    assert _aggregate(plan, results)[1] is False
+    assert _aggregate(plan, results, template_enabled=False) == ("LLM汇总", True)
+    print("✓ 关闭模板化")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_single_mutation_renders_last_mutation,
+        test_unsuccessful_mutation_falls_through,
+        test_failed_step_falls_through,
+        test_single_query_renders_one_tool_output,
+        test_multi_step_plans,
+        test_template_disabled,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+测试资源批量操作
+
+在SQLite内存库上运行execute_bulk，验证：创建/更新/删除逐条返回结果、
+参数校验失败和不属于当前用户的资源只记为该条失败、同一批次按 创建→更新→删除 执行，
+以及更新按主键executemany、删除只发一条DELETE
+"""
+
+import asyncio
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Boolean, Column, Integer, String, create_engine, event
+from sqlalchemy.orm import Session, declarative_base
+
+from backend_loader import load_backend_module
+from sqlite_session import AsyncSessionAdapter
+
+
+bulk_operations = load_backend_module("services.bulk_operations")
+BulkOperation = load_backend_module("models.bulk").BulkOperation
+
+Base = declarative_base()
+
+
+class ItemDB(Base):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    title = Column(String(255), nullable=False)
+    is_complete = Column(Boolean, default=False)
+    user_id = Column(Integer, nullable=True)
+
+
+class ItemCreate(BaseModel):
+    title: str
+    isComplete: Optional[bool] = False
+
+
+class ItemUpdate(BaseModel):
+    title: Optional[str] = None
+    isComplete: Optional[bool] = None
+
+
+def _update_values(data: ItemUpdate) -> dict:
+    values = {}
+    if data.title is not None:
+        values["title"] = data.title
+    if data.isComplete is not None:
+        values["is_complete"] = data.isComplete
+    return values
+
+
+SPEC = bulk_operations.BulkResourceSpec(
+    model=ItemDB,
+    create_schema=ItemCreate,
+    update_schema=ItemUpdate,
+    to_create_row=lambda data, user_id: {"title": data.title, "is_complete": data.isComplete, "user_id": user_id},
+    to_update_values=_update_values,
+    to_response=lambda item: {"id": item.id, "title": item.title, "isComplete": item.is_complete},
+)
+
+
+def _run(operations, user_id=1, seed=(), spec=SPEC):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement.split()[0], executemany))
+
+    with Session(engine) as session:
+        if seed:
+            session.execute(ItemDB.__table__.insert(), list(seed))
+            session.commit()
+        statements.clear()
+        response = asyncio.run(bulk_operations.execute_bulk(AsyncSessionAdapter(session), spec, operations, user_id))
+        session.commit()
+        rows = session.execute(ItemDB.__table__.select().order_by(ItemDB.id)).all()
+    return response, rows, statements
+
+
+def test_create_returns_items_in_order():
+    """测试批量创建按请求顺序返回新建的资源"""
+    operations = [BulkOperation(op="create", data={"title": f"任务{i}"}) for i in range(5)]
+    response, rows, _ = _run(operations)
+
+    assert response.created == 5 and response.failed == 0
+    assert [r.item["title"] for r in response.results] == [f"任务{i}" for i in range(5)]
+    assert [r.id for r in response.results] == [row.id for row in rows]
+    assert all(row.user_id == 1 for row in rows)
+    print("✓ 批量创建")
+
+
+def test_per_item_failures_do_not_abort_batch():
+    """测试校验失败、不存在或属于其他用户的资源只记为该条失败"""
+    seed = [
+        {"id": 1, "title": "买菜", "is_complete": False, "user_id": 1},
+        {"id": 2, "title": "别人的任务", "is_complete": False, "user_id": 2},
+    ]
+    operations = [
+        BulkOperation(op="create", data={}),
+        BulkOperation(op="update", id=1, data={"isComplete": True}),
+        BulkOperation(op="update", id=2, data={"title": "改名"}),
+        BulkOperation(op="update", id=1, data={}),
+        BulkOperation(op="delete"),
+        BulkOperation(op="delete", id=99),
+        BulkOperation(op="create", data={"title": "新任务"}),
+    ]
+    response, rows, _ = _run(operations, seed=seed)
+
+    assert [r.success for r in response.results] == [False, True, False, False, False, False, True]
+    assert response.results[0].error.startswith("title")
+    assert response.results[1].item == {"id": 1, "title": "买菜", "isComplete": True}
+    assert response.results[2].error == "资源不存在"
+    assert (response.created, response.updated, response.deleted, response.failed) == (1, 1, 0, 5)
+    assert [(row.id, row.title) for row in rows] == [(1, "买菜"), (2, "别人的任务"), (3, "新任务")]
+    print("✓ 逐条失败不影响其他操作")
+
+
+def test_set_based_statements():
+    """测试更新按主键executemany、删除只发一条DELETE，删除在更新之后执行"""
+    seed = [{"id": i, "title": f"任务{i}", "is_complete": False, "user_id": 1} for i in range(1, 7)]
+    operations = [BulkOperation(op="update", id=i, data={"isComplete": True}) for i in range(1, 4)]
+    operations += [BulkOperation(op="delete", id=i) for i in range(3, 7)]
+    response, rows, statements = _run(operations, seed=seed)
+
+    assert response.updated == 3 and response.deleted == 4
+    assert response.results[2].item["isComplete"] is True
+    assert [(row.id, row.is_complete) for row in rows] == [(1, True), (2, True)]
+    assert ("UPDATE", True) in statements
+    assert [kind for kind, _ in statements].count("UPDATE") == 1
+    assert [kind for kind, _ in statements].count("DELETE") == 1
+    print("✓ 集合化执行")
+
+
+def test_duplicates_and_explicit_nulls_fail_per_item():
+    """测试同一资源重复的更新/删除、非空字段显式传null只记为该条失败"""
+    seed = [
+        {"id": 1, "title": "买菜", "is_complete": False, "user_id": 1},
+        {"id": 2, "title": "写周报", "is_complete": False, "user_id": 1},
+        {"id": 3, "title": "读书", "is_complete": False, "user_id": 1},
+    ]
+    operations = [
+        BulkOperation(op="update", id=1, data={"isComplete": True}),
+        BulkOperation(op="update", id=1, data={"title": "重复"}),
+        BulkOperation(op="delete", id=2),
+        BulkOperation(op="delete", id=2),
+        BulkOperation(op="update", id=3, data={"title": None}),
+        BulkOperation(op="create", data={"title": "新任务"}),
+    ]
+    null_spec = bulk_operations.BulkResourceSpec(
+        model=ItemDB,
+        create_schema=ItemCreate,
+        update_schema=ItemUpdate,
+        to_create_row=SPEC.to_create_row,
+        # 与日程的 exclude_unset 实现一致：显式传入的null会原样进入UPDATE字段
+        to_update_values=lambda data: {
+            {"isComplete": "is_complete"}.get(key, key): value
+            for key, value in data.model_dump(exclude_unset=True).items()
+        },
+        to_response=SPEC.to_response,
+    )
+    response, rows, _ = _run(operations, seed=seed, spec=null_spec)
+
+    assert [r.success for r in response.results] == [True, False, True, False, False, True]
+    assert "重复" in response.results[1].error and "重复" in response.results[3].error
+    assert response.results[4].error == "title: 不能为null"
+    assert (response.created, response.updated, response.deleted, response.failed) == (1, 1, 1, 3)
+    assert [(row.id, row.title, row.is_complete) for row in rows] == [
+        (1, "买菜", True), (3, "读书", False), (4, "新任务", False)
+    ]
+    print("✓ 重复操作和显式null逐条失败")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_create_returns_items_in_order,
+        test_per_item_failures_do_not_abort_batch,
+        test_set_based_statements,
+        test_duplicates_and_explicit_nulls_fail_per_item,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
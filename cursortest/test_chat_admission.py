@@ -0,0 +1,123 @@
+"""
+测试聊天请求准入控制
+
+验证全局运行数上限、同一用户同时只运行一个请求、用户间按到达顺序公平调度、
+队列满和等待超时时立即拒绝、匿名请求只受全局上限约束，以及队列统计
+"""
+
+import asyncio
+
+from backend_loader import load_backend_module
+
+
+chat_admission = load_backend_module("chat_admission")
+
+
+async def _run_requests(controller, requests, hold=0.05):
+    """按顺序发起请求（间隔极短），记录开始运行的顺序和被拒绝的请求"""
+    started, rejected = [], []
+
+    async def one(name, user_key):
+        try:
+            ticket = await controller.acquire(user_key)
+        except chat_admission.ChatAdmissionRejected as e:
+            rejected.append((name, e.reason))
+            return
+        started.append(name)
+        await asyncio.sleep(hold)
+        ticket.release()
+
+    tasks = []
+    for name, user_key in requests:
+        tasks.append(asyncio.create_task(one(name, user_key)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return started, rejected
+
+
+def test_one_run_per_user_and_fair_order():
+    """测试同一用户串行运行，其他用户的请求不被同一用户的排队请求阻塞"""
+    controller = chat_admission.ChatAdmissionController(max_in_flight=2, max_queue=10, max_queued_per_user=5)
+    requests = [("a1", "a"), ("a2", "a"), ("a3", "a"), ("b1", "b")]
+    started, rejected = asyncio.run(_run_requests(controller, requests))
+
+    assert not rejected
+    # a1和b1先运行（b1不需要等a的排队请求），a2、a3依次运行
+    assert started[:2] == ["a1", "b1"]
+    assert started[2:] == ["a2", "a3"]
+    stats = controller.get_stats()
+    assert stats["peak_in_flight"] == 2
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    assert stats["admitted"] == 4
+    print("✓ 每用户单个运行且公平调度")
+
+
+def test_global_limit_and_queue_full():
+    """测试全局上限和队列满时立即拒绝"""
+    controller = chat_admission.ChatAdmissionController(max_in_flight=1, max_queue=2, max_queued_per_user=5)
+    requests = [(f"u{i}", f"user{i}") for i in range(5)]
+    started, rejected = asyncio.run(_run_requests(controller, requests))
+
+    assert started == ["u0", "u1", "u2"]
+    assert rejected == [("u3", "queue_full"), ("u4", "queue_full")]
+    stats = controller.get_stats()
+    assert stats["peak_in_flight"] == 1
+    assert stats["peak_queue_depth"] == 2
+    assert stats["rejected"]["queue_full"] == 2
+    assert stats["max_wait_ms"] > 0
+    print("✓ 全局上限与队列满拒绝")
+
+
+def test_per_user_queue_limit():
+    """测试单个用户排队数达到上限时拒绝"""
+    controller = chat_admission.ChatAdmissionController(max_in_flight=4, max_queue=10, max_queued_per_user=1)
+    requests = [("a1", "a"), ("a2", "a"), ("a3", "a")]
+    started, rejected = asyncio.run(_run_requests(controller, requests))
+
+    assert started == ["a1", "a2"]
+    assert rejected == [("a3", "user_queue_full")]
+    print("✓ 每用户排队上限")
+
+
+def test_anonymous_requests_only_global_limit():
+    """测试匿名请求（user_key=None）不按用户串行，只受全局上限约束"""
+    controller = chat_admission.ChatAdmissionController(max_in_flight=2, max_queue=1, max_queued_per_user=0)
+    requests = [(f"anon{i}", None) for i in range(4)]
+    started, rejected = asyncio.run(_run_requests(controller, requests))
+
+    assert started == ["anon0", "anon1", "anon2"]
+    assert rejected == [("anon3", "queue_full")]
+    stats = controller.get_stats()
+    assert stats["peak_in_flight"] == 2 and stats["in_flight"] == 0
+    print("✓ 匿名请求只受全局上限约束")
+
+
+def test_queue_timeout_releases_slot():
+    """测试等待超时被拒绝后不占用名额和队列位置"""
+    controller = chat_admission.ChatAdmissionController(max_in_flight=1, max_queue=10, queue_timeout=0.02)
+    requests = [("u0", "user0"), ("u1", "user1")]
+    started, rejected = asyncio.run(_run_requests(controller, requests, hold=0.1))
+
+    assert started == ["u0"]
+    assert rejected == [("u1", "timeout")]
+    stats = controller.get_stats()
+    assert stats["in_flight"] == 0 and stats["queue_depth"] == 0
+    print("✓ 等待超时")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_one_run_per_user_and_fair_order,
+        test_global_limit_and_queue_full,
+        test_per_user_queue_limit,
+        test_anonymous_requests_only_global_limit,
+        test_queue_timeout_releases_slot,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+测试聊天流式输出
+
+验证ChatStreamEmitter：最终响应token按增量发送、节点输出的完整消息不重复发送、
+未经流式生成的消息整条发送、进度事件按顺序写入数据分片、ProgressTracker的事件顺序、取消运行时停止后台任务并
+记录所在节点、响应体开始前断开时释放准入名额；并回放一段5000个chunk的录制流作为微基准，确认每个chunk的处理开销为常数
+"""
+
+import asyncio
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from backend_loader import load_backend_module
+
+
+chat_stream = load_backend_module("routes.chat_stream")
+
+
+class FakeToolController:
+    def __init__(self):
+        self.args = []
+        self.result = None
+
+    def append_args_text(self, text):
+        self.args.append(text)
+
+    def set_result(self, result):
+        self.result = result
+
+
+class FakeController:
+    """模拟assistant-stream的RunController，按顺序记录输出"""
+
+    def __init__(self):
+        self.parts = []
+        self.tool_calls = {}
+        # append_data 通过 _loop.call_soon_threadsafe(_queue.put_nowait, chunk) 写入
+        self._loop = self
+        self._queue = self
+
+    def call_soon_threadsafe(self, callback, *args):
+        callback(*args)
+
+    def put_nowait(self, chunk):
+        self.parts.append(("data", chunk.data))
+
+    def append_text(self, text):
+        self.parts.append(("text", text))
+
+    async def add_tool_call(self, tool_name, tool_call_id):
+        self.tool_calls[tool_call_id] = FakeToolController()
+        return self.tool_calls[tool_call_id]
+
+    @property
+    def text(self):
+        return "".join(value for kind, value in self.parts if kind == "text")
+
+
+def _message_event(msg, node):
+    return "messages", (msg, {"langgraph_node": node})
+
+
+def _replay(events):
+    controller = FakeController()
+    emitter = chat_stream.ChatStreamEmitter(controller)
+
+    async def run():
+        for mode, payload in events:
+            await emitter.handle(mode, payload)
+
+    asyncio.run(run())
+    return controller, emitter
+
+
+def test_streamed_tokens_not_repeated():
+    """测试token按增量发送，节点输出的同id完整消息不重复发送"""
+    tokens = ["你", "今天", "有", "3个", "任务"]
+    events = [_message_event(AIMessageChunk(content="思考中", id="plan-1"), "supervisor_plan")]
+    events += [_message_event(AIMessageChunk(content=token, id="run-1"), "aggregate") for token in tokens]
+    events.append(_message_event(AIMessage(content="".join(tokens), id="run-1"), "aggregate"))
+
+    controller, emitter = _replay(events)
+    assert controller.text == "你今天有3个任务"
+    assert emitter.text_parts == len(tokens)
+    assert emitter.first_token_ms is not None
+    print("✓ token增量发送且不重复")
+
+
+def test_unstreamed_messages_sent_whole():
+    """测试模板化/硬编码回复整条发送，完整消息只补发未发送的尾部"""
+    events = [
+        _message_event(AIMessageChunk(content="部分", id="run-1"), "simple_response"),
+        _message_event(AIMessage(content="部分回复", id="run-1"), "simple_response"),
+        _message_event(AIMessage(content="安全回复"), "simple_response"),
+    ]
+    controller, _ = _replay(events)
+    assert controller.text == "部分回复\n\n安全回复"
+
+    controller, _ = _replay([_message_event(AIMessage(content="✅ 已创建任务", id="tpl"), "aggregate")])
+    assert controller.text == "✅ 已创建任务"
+    print("✓ 非流式消息整条发送")
+
+
+def test_tool_calls_and_progress_events():
+    """测试工具调用、工具结果和进度事件"""
+    plan = {"summary": "创建任务", "steps": [{"agent": "task", "action": "create", "description": "创建任务"}]}
+    events = [
+        ("updates", {"supervisor_plan": {"plan": plan}}),
+        ("updates", {"supervisor_route": {"ready_steps": [0], "current_step": 0}}),
+        _message_event(AIMessage(content="", tool_calls=[{"id": "call-1", "name": "create_task", "args": {"title": "买菜"}}]), "task_agent"),
+        _message_event(ToolMessage(content="任务已创建", tool_call_id="call-1"), "task_agent"),
+        ("updates", {"execute": {"execution_results": [{
+            "step_index": 0, "agent": "task", "success": True, "result": "完成",
+            "tool_outputs": ["任务已创建\nfrontend_tool_call:refresh_task_list"],
+        }]}}),
+        ("updates", {"supervisor_route": {"is_aggregating": True}}),
+    ]
+    controller, _ = _replay(events)
+
+    progress = [value["event"] for kind, value in controller.parts if kind == "data"]
+    assert progress == ["plan", "step_start", "step_finish", "aggregating"]
+    finish = [value for kind, value in controller.parts if kind == "data" and value["event"] == "step_finish"][0]
+    assert finish["tool_results"] == ["任务已创建"]
+    assert controller.tool_calls["call-1"].result == "任务已创建"
+    assert controller.text == ""
+    print("✓ 工具调用与进度事件")
+
+
+def test_progress_tracker_event_order():
+    """测试ProgressTracker：plan → step_start（每步一次）→ step_finish → aggregating 的顺序和内容"""
+    tracker = chat_stream.ProgressTracker()
+    plan = {"summary": "查询并创建", "steps": [
+        {"agent": "task", "action": "query", "description": "查询任务"},
+        {"agent": "note", "action": "create", "description": "记录笔记"},
+    ]}
+
+    def names(events):
+        return [(event["event"], event.get("step_index")) for event in events]
+
+    assert tracker.events("supervisor_plan", None) == []
+    assert names(tracker.events("supervisor_plan", {"plan": plan})) == [("plan", None)]
+    # 两个步骤同时就绪（并行执行），重复的路由更新不重复发送step_start
+    started = tracker.events("supervisor_route", {"ready_steps": [0, 1]})
+    assert names(started) == [("step_start", 0), ("step_start", 1)]
+    assert started[1]["agent"] == "note" and started[1]["description"] == "记录笔记"
+    assert tracker.events("supervisor_route", {"ready_steps": [0, 1]}) == []
+
+    finished = tracker.events("execute", {"execution_results": [
+        {"step_index": 1, "agent": "note", "success": True, "result": "x" * 600, "tool_outputs": []},
+        {"step_index": 0, "agent": "task", "success": False, "result": "失败", "tool_outputs": ["frontend_tool_call:refresh"]},
+    ]})
+    assert names(finished) == [("step_finish", 1), ("step_finish", 0)]
+    assert finished[0]["result"].endswith("...") and len(finished[0]["result"]) == 503
+    assert finished[1]["success"] is False and finished[1]["tool_results"] == []
+
+    assert names(tracker.events("supervisor_route", {"is_aggregating": True})) == [("aggregating", None)]
+
+    # 重新规划后步骤编号重新开始
+    assert names(tracker.events("supervisor_plan", {"plan": plan})) == [("plan", None)]
+    assert names(tracker.events("supervisor_route", {"ready_steps": [0]})) == [("step_start", 0)]
+
+    # 没有计划的简单回复不发送aggregating
+    assert chat_stream.ProgressTracker().events("supervisor_route", {"is_aggregating": True}) == []
+    print("✓ 进度事件顺序")
+
+
+def test_cancel_stops_run_and_tracks_node():
+    """测试取消运行会停止后台graph任务，并能得到取消时所在的节点"""
+    progress = {"ticks": 0, "cancelled": False}
+    emitter_ref = {}
+
+    async def callback(controller):
+        emitter = emitter_ref["emitter"] = chat_stream.ChatStreamEmitter(controller)
+        await emitter.handle("tasks", {"id": "t1", "name": "supervisor_plan", "input": {}, "triggers": []})
+        await emitter.handle("tasks", {"id": "t1", "name": "supervisor_plan", "result": {}, "error": None, "interrupts": []})
+        await emitter.handle("tasks", {"id": "t2", "name": "execute", "input": {}, "triggers": []})
+        controller.append_text("开始")
+        try:
+            while True:
+                progress["ticks"] += 1
+                await asyncio.sleep(0.01)
+        except asyncio.CancelledError:
+            progress["cancelled"] = True
+            raise
+
+    async def consume():
+        run = chat_stream.CancellableRun(callback)
+        received = []
+        async for chunk in run.stream():
+            received.append(chunk)
+            run.cancel("client_disconnected")
+        ticks = progress["ticks"]
+        await asyncio.sleep(0.05)
+        return run, received, ticks
+
+    run, received, ticks = asyncio.run(consume())
+    assert [chunk.text_delta for chunk in received] == ["开始"]
+    assert progress["cancelled"] and progress["ticks"] == ticks
+    assert run.cancel_reason == "client_disconnected"
+    assert emitter_ref["emitter"].running_nodes == ["execute"]
+    assert emitter_ref["emitter"].last_node == "supervisor_plan"
+    print("✓ 取消运行并记录所在节点")
+
+
+def _early_disconnect(spec_version: str, send_start):
+    """模拟客户端在响应体开始前断开，返回响应结束后的准入统计"""
+    chat_admission = load_backend_module("chat_admission")
+    controller = chat_admission.ChatAdmissionController(max_in_flight=2)
+    callback_ran = []
+
+    async def callback(run_controller):
+        callback_ran.append(True)
+        run_controller.append_text("不会发送")
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            await send_start()
+
+    async def serve():
+        ticket = await controller.acquire("user:1")
+        response = chat_stream.ProgressDataStreamResponse(chat_stream.CancellableRun(callback, on_close=ticket.release))
+        try:
+            await response({"type": "http", "asgi": {"spec_version": spec_version}}, receive, send)
+        except Exception:
+            pass
+        await asyncio.sleep(0)
+        stats = controller.get_stats()
+        # 同一用户的下一个请求应能立即获得名额
+        next_ticket = await asyncio.wait_for(controller.acquire("user:1"), 0.5)
+        next_ticket.release()
+        return stats
+
+    return asyncio.run(serve()), callback_ran
+
+
+def test_early_disconnect_releases_admission():
+    """测试响应体开始前客户端断开（发送失败或断开监听先取消发送）时准入名额被释放"""
+    async def send_fails():
+        raise OSError("connection reset")
+
+    async def send_blocks():
+        await asyncio.sleep(10)
+
+    for spec_version, send_start in (("2.4", send_fails), ("2.0", send_blocks)):
+        stats, callback_ran = _early_disconnect(spec_version, send_start)
+        assert stats["in_flight"] == 0, spec_version
+        assert not callback_ran
+    print("✓ 提前断开时释放准入名额")
+
+
+def _recorded_stream(n_chunks: int):
+    """构造录制的流：中间节点token、进度更新和最终响应的n个token"""
+    events = [_message_event(AIMessageChunk(content="{", id="plan-1"), "supervisor_plan") for _ in range(200)]
+    events.append(("updates", {"supervisor_route": {"ready_steps": [0]}}))
+    tokens = [f"token{i % 97} " for i in range(n_chunks)]
+    events += [_message_event(AIMessageChunk(content=token, id="run-final"), "aggregate") for token in tokens]
+    events.append(_message_event(AIMessage(content="".join(tokens), id="run-final"), "aggregate"))
+    return events, "".join(tokens)
+
+
+def test_replay_5k_chunks_benchmark():
+    """微基准：回放5000个chunk，每个chunk开销应与响应长度无关"""
+    timings = {}
+    for n_chunks in (1000, 5000):
+        events, expected = _recorded_stream(n_chunks)
+        start = time.perf_counter()
+        controller, emitter = _replay(events)
+        elapsed = time.perf_counter() - start
+        assert controller.text == expected
+        assert emitter.text_parts == n_chunks
+        timings[n_chunks] = elapsed
+        print(f"  {n_chunks} chunks: {elapsed * 1000:.1f}ms ({elapsed / n_chunks * 1e6:.1f}µs/chunk)")
+
+    assert timings[5000] < 1.0
+    print("✓ 5000 chunk回放")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_streamed_tokens_not_repeated,
+        test_unstreamed_messages_sent_whole,
+        test_tool_calls_and_progress_events,
+        test_progress_tracker_event_order,
+        test_cancel_stops_run_and_tracks_node,
+        test_early_disconnect_releases_admission,
+        test_replay_5k_chunks_benchmark,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+测试checkpoint写入策略
+
+用内存saver混入CheckpointPolicyMixin运行一个小型LangGraph，验证：
+只在边界节点之后和运行结束时落库、跳过的通道版本合并后状态可以完整恢复、
+子graph的checkpoint不落库、每轮写入量统计、取消的运行立即清理进度
+"""
+
+import asyncio
+import operator
+from typing import Annotated, TypedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from backend_loader import load_backend_module
+
+
+checkpointer_module = load_backend_module("agents.checkpointer")
+
+
+class State(TypedDict):
+    log: Annotated[list, operator.add]
+    count: int
+
+
+def _build_graph(checkpointer, with_subgraph: bool = False):
+    sub = StateGraph(State)
+    sub.add_node("inner", lambda s: {"log": ["inner"]})
+    sub.add_edge(START, "inner")
+    sub.add_edge("inner", END)
+    sub_graph = sub.compile()
+
+    async def work(state):
+        if with_subgraph:
+            await sub_graph.ainvoke({"log": [], "count": 0})
+        return {"log": ["work"], "count": state.get("count", 0) + 1}
+
+    workflow = StateGraph(State)
+    workflow.add_node("plan", lambda s: {"log": ["plan"]})
+    workflow.add_node("execute", work)
+    workflow.add_node("aggregate", lambda s: {"log": ["aggregate"]})
+    workflow.add_edge(START, "plan")
+    workflow.add_edge("plan", "execute")
+    workflow.add_conditional_edges(
+        "execute", lambda s: "execute" if s["count"] % 2 else "aggregate", ["execute", "aggregate"]
+    )
+    workflow.add_edge("aggregate", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def _make_saver(**policy_kwargs):
+    policy = checkpointer_module.CheckpointPolicy(enabled=True, boundary_nodes=("aggregate",), **policy_kwargs)
+
+    class PolicyMemorySaver(checkpointer_module.CheckpointPolicyMixin, InMemorySaver):
+        checkpoint_policy = policy
+
+    return PolicyMemorySaver(), policy
+
+
+def _saved_checkpoints(saver, thread_id, checkpoint_ns=""):
+    return [key for key in saver.storage.get(thread_id, {}).get(checkpoint_ns, {})]
+
+
+def test_only_boundaries_and_final_are_persisted():
+    """测试只在边界节点和运行结束时写入checkpoint"""
+    saver, policy = _make_saver()
+    graph = _build_graph(saver)
+    config = {"configurable": {"thread_id": "t1"}}
+    asyncio.run(graph.ainvoke({"log": [], "count": 0}, config))
+
+    # aggregate既是边界节点也是最后一个节点，只落库一次
+    assert len(_saved_checkpoints(saver, "t1")) == 1
+    stats = policy.get_stats()
+    assert stats["totals"]["turns"] == 1
+    assert stats["last_turn"]["checkpoints_written"] == 1
+    assert stats["last_turn"]["checkpoints_skipped"] >= 4
+    assert stats["in_flight_threads"] == 0
+    assert "t1" in policy.dirty_threads
+    print("✓ 只在边界和结束时落库")
+
+
+def test_state_restores_across_turns():
+    """测试跳过的通道版本合并后，下一轮可以从落库的checkpoint恢复完整状态"""
+    saver, _ = _make_saver()
+    graph = _build_graph(saver)
+    config = {"configurable": {"thread_id": "t2"}}
+    asyncio.run(graph.ainvoke({"log": [], "count": 0}, config))
+
+    # 用不带策略的新graph读取状态，确认落库数据完整
+    reader = _build_graph(saver)
+    state = asyncio.run(reader.aget_state(config))
+    assert state.values["log"] == ["plan", "work", "work", "aggregate"]
+    assert state.values["count"] == 2
+
+    asyncio.run(graph.ainvoke({"log": [], "count": state.values["count"]}, config))
+    state = asyncio.run(reader.aget_state(config))
+    assert state.values["log"] == ["plan", "work", "work", "aggregate"] * 2
+    assert state.values["count"] == 4
+    print("✓ 跨轮恢复完整状态")
+
+
+def test_subgraph_checkpoints_skipped():
+    """测试子graph的checkpoint和中间写入默认不落库"""
+    saver, policy = _make_saver()
+    graph = _build_graph(saver, with_subgraph=True)
+    config = {"configurable": {"thread_id": "t3"}}
+    asyncio.run(graph.ainvoke({"log": [], "count": 0}, config))
+
+    # InMemorySaver读取时会创建空的命名空间条目，只检查实际有checkpoint的命名空间
+    namespaces = {ns for ns, checkpoints in saver.storage.get("t3", {}).items() if checkpoints}
+    assert namespaces == {""}
+    assert not any(key[1] for key in saver.writes)
+    assert policy.get_stats()["last_turn"]["writes_written"] == 0
+    print("✓ 子graph不落库")
+
+
+def test_disabled_policy_persists_every_step():
+    """测试关闭策略时每一步都落库"""
+    saver, _ = _make_saver()
+    saver.checkpoint_policy.enabled = False
+    graph = _build_graph(saver)
+    asyncio.run(graph.ainvoke({"log": [], "count": 0}, {"configurable": {"thread_id": "t4"}}))
+    assert len(_saved_checkpoints(saver, "t4")) >= 5
+    print("✓ 关闭策略时逐步落库")
+
+
+def test_aborted_turn_drops_progress():
+    """测试取消的运行立即丢弃写入进度，不等待过期清理"""
+    saver, policy = _make_saver()
+    graph = _build_graph(saver)
+    config = {"configurable": {"thread_id": "t5"}}
+
+    async def cancel_midway():
+        async for _ in graph.astream({"log": [], "count": 0}, config, stream_mode="updates"):
+            raise asyncio.CancelledError()
+
+    try:
+        asyncio.run(cancel_midway())
+    except asyncio.CancelledError:
+        pass
+    assert policy.active_threads() == {"t5"}
+    assert policy.abort_turn("t5")
+    assert policy.active_threads() == set()
+    assert not policy.abort_turn("t5")
+    stats = policy.get_stats()
+    assert stats["totals"]["turns_aborted"] == 1
+    assert stats["totals"]["turns"] == 0
+    assert stats["in_flight_threads"] == 0
+
+    # 正常结束的运行已清理，abort_turn不做处理
+    asyncio.run(graph.ainvoke({"log": [], "count": 0}, {"configurable": {"thread_id": "t6"}}))
+    assert not policy.abort_turn("t6")
+    assert policy.get_stats()["totals"]["turns_aborted"] == 1
+    print("✓ 取消的运行立即清理进度")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_only_boundaries_and_final_are_persisted,
+        test_state_restores_across_turns,
+        test_subgraph_checkpoints_skipped,
+        test_disabled_policy_persists_every_step,
+        test_aborted_turn_drops_progress,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+测试意图快速分类器
+
+验证规则自动机、n-gram线性模型和命中/未命中计数
+"""
+
+
+from backend_loader import load_backend_module
+
+
+intent_classifier = load_backend_module("agents.supervisor.intent_classifier")
+
+
+def test_rule_business_requests():
+    """测试明确的业务请求由规则直接命中"""
+    for message in ["添加任务：学习Python", "查看我的任务", "what's on my calendar tomorrow", "add a task to buy milk"]:
+        prediction = intent_classifier.classify(message)
+        assert prediction.needs_business_data, message
+        assert prediction.source == "rule", message
+    print("✓ 业务请求规则命中")
+
+
+def test_rule_non_business_requests():
+    """测试询问能力类请求由规则判定为不需要业务数据"""
+    for message in ["你能做什么", "what can you do", "你是谁"]:
+        prediction = intent_classifier.classify(message)
+        assert not prediction.needs_business_data, message
+    print("✓ 非业务请求规则命中")
+
+
+def test_no_false_positive_business_rules():
+    """测试概念提问、话题里的资源名词、词内子串和跨分句的词不触发业务规则"""
+    for message in [
+        "what is the event loop in python",
+        "how do I make notes in music theory",
+        "what is a calendar",
+        "写一首关于会议的诗",
+    ]:
+        prediction = intent_classifier.classify(message)
+        assert not (prediction.needs_business_data and prediction.confidence >= 0.85), (message, prediction)
+        fast = intent_classifier.fast_classify(message)
+        assert fast is None or not fast.needs_business_data, (message, fast)
+    # 英文词需要单词边界，动词和资源名词需要在同一分句
+    assert intent_classifier._match_rules("it prevents renewal of the setup") is None
+    assert intent_classifier._match_rules("我写完了，任务呢") is None
+    assert intent_classifier._match_rules("写完作业，然后添加任务") is True
+    print("✓ 业务规则无误判")
+
+
+def test_rule_model_disagreement_defers_to_llm():
+    """测试规则与模型不一致时置信度为0.5，交给LLM"""
+    prediction = intent_classifier.classify("how do I make notes in music theory")
+    assert prediction.source == "rule"
+    assert prediction.confidence == 0.5
+    assert intent_classifier.fast_classify("how do I make notes in music theory") is None
+    print("✓ 规则与模型不一致时回退LLM")
+
+
+def test_model_fallback():
+    """测试规则未命中时使用线性模型"""
+    prediction = intent_classifier.classify("今天天气怎么样")
+    assert prediction.source == "model"
+    assert not prediction.needs_business_data
+    assert 0.5 <= prediction.confidence <= 1.0
+    print("✓ 线性模型回退")
+
+
+def test_fast_classify_counters():
+    """测试阈值判断与命中/未命中计数"""
+    before = intent_classifier.get_stats()
+    assert intent_classifier.fast_classify("添加任务：写周报") is not None
+    assert intent_classifier.fast_classify("随便聊聊", threshold=1.01) is None
+    after = intent_classifier.get_stats()
+    assert after["hits"] == before["hits"] + 1
+    assert after["misses"] == before["misses"] + 1
+    print("✓ 命中/未命中计数")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_rule_business_requests,
+        test_rule_non_business_requests,
+        test_no_false_positive_business_rules,
+        test_rule_model_disagreement_defers_to_llm,
+        test_model_fallback,
+        test_fast_classify_counters,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
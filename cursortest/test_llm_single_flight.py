@@ -0,0 +1,141 @@
+"""
+测试LLM请求单飞合并
+
+用httpx MockTransport模拟OpenAI兼容接口，验证并发相同请求只调用一次上游、
+结果在TTL内缓存、流式调用同样合并、绑定工具的调用不合并、leader被取消时等待者自行调用
+"""
+
+import asyncio
+import json
+import os
+
+import httpx
+
+from backend_loader import load_backend_module
+
+
+llmconf = load_backend_module("agents.llmconf")
+
+
+class FakeProvider:
+    """模拟的OpenAI兼容接口，记录上游调用次数"""
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.calls = 0
+
+    async def handler(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        body = json.loads(request.content)
+        text = "回复:" + body["messages"][-1]["content"]
+        if body.get("stream"):
+            events = "".join(
+                "data: " + json.dumps({
+                    "id": "x", "object": "chat.completion.chunk", "created": 0, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}],
+                }) + "\n\n"
+                for part in (text[:3], text[3:])
+            ) + "data: [DONE]\n\n"
+            return httpx.Response(200, content=events.encode(), headers={"content-type": "text/event-stream"})
+        return httpx.Response(200, json={
+            "id": "x", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+
+def _make_llm(provider, ttl: float = 10):
+    os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+    registry = llmconf.LLMRegistry()
+    registry.single_flight = llmconf.LLMSingleFlight(ttl=ttl)
+    registry._http_client = httpx.AsyncClient(transport=httpx.MockTransport(provider.handler))
+    return registry, registry.get()
+
+
+def test_concurrent_identical_requests_coalesced():
+    """测试并发相同请求只调用一次上游，且TTL内复用结果"""
+    provider = FakeProvider()
+    registry, llm = _make_llm(provider)
+
+    async def run():
+        responses = await asyncio.gather(*[llm.ainvoke("你能做什么" if i % 2 else "你好") for i in range(10)])
+        cached = await llm.ainvoke("你好")
+        return responses, cached
+
+    responses, cached = asyncio.run(run())
+    assert provider.calls == 2
+    assert {response.content for response in responses} == {"回复:你好", "回复:你能做什么"}
+    # 共享的结果各自拥有独立的消息id
+    assert len({response.id for response in responses}) == len(responses)
+    assert cached.content == "回复:你好" and provider.calls == 2
+    stats = registry.single_flight.get_stats()
+    assert stats["upstream_calls"] == 2 and stats["coalesced"] == 8 and stats["cache_hits"] == 1
+    print("✓ 并发相同请求合并")
+
+
+def test_streaming_requests_coalesced():
+    """测试流式调用同样合并"""
+    provider = FakeProvider()
+    _, llm = _make_llm(provider, ttl=0)
+
+    async def stream(prompt):
+        return "".join([chunk.content async for chunk in llm.astream(prompt)])
+
+    async def run():
+        return await asyncio.gather(*[stream("流式") for _ in range(5)])
+
+    assert asyncio.run(run()) == ["回复:流式"] * 5
+    assert provider.calls == 1
+    print("✓ 流式请求合并")
+
+
+def test_tool_calls_not_coalesced():
+    """测试绑定工具的调用不合并"""
+    provider = FakeProvider()
+    _, llm = _make_llm(provider)
+    tool = {"type": "function", "function": {"name": "noop", "parameters": {"type": "object", "properties": {}}}}
+    bound = llm.bind_tools([tool])
+
+    async def run():
+        await asyncio.gather(*[bound.ainvoke("查询") for _ in range(3)])
+
+    asyncio.run(run())
+    assert provider.calls == 3
+    print("✓ 工具调用不合并")
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    """测试leader被取消时等待者自行调用"""
+    provider = FakeProvider(delay=0.2)
+    registry, llm = _make_llm(provider)
+
+    async def run():
+        leader = asyncio.create_task(llm.ainvoke("取消"))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(llm.ainvoke("取消"))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(run()).content == "回复:取消"
+    assert provider.calls == 2
+    assert registry.single_flight.get_stats()["abandoned"] == 1
+    print("✓ leader取消不影响等待者")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_concurrent_identical_requests_coalesced,
+        test_streaming_requests_coalesced,
+        test_tool_calls_not_coalesced,
+        test_cancelled_leader_does_not_cancel_followers,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+测试Supervisor计划缓存
+
+验证精确命中、近似命中（仅只读计划）、提示词版本隔离、TTL过期和LRU淘汰，
+包含相对日期/时间的请求不缓存
+"""
+
+import time
+
+from backend_loader import load_backend_module
+
+
+plan_cache_module = load_backend_module("agents.supervisor.plan_cache")
+PlanCache = plan_cache_module.PlanCache
+
+PROMPT = "plan prompt v1"
+QUERY_PLAN = {"summary": "查看任务", "steps": [{"agent": "task", "action": "query", "params": {}, "description": "查询任务"}]}
+CREATE_PLAN = {"summary": "创建任务", "steps": [{"agent": "task", "action": "create", "params": {"title": "买牛奶"}, "description": "创建任务"}]}
+
+
+def test_exact_hit_after_normalization():
+    """测试归一化后相同的请求精确命中"""
+    cache = PlanCache(max_entries=10, ttl_seconds=60, similarity_threshold=1.0, enabled=True)
+    cache.put("Show my tasks", PROMPT, QUERY_PLAN)
+    assert cache.get("  show   my tasks! ", PROMPT) == QUERY_PLAN
+    assert cache.get("show my notes", PROMPT) is None
+    stats = cache.get_stats()
+    assert stats["exact_hits"] == 1 and stats["misses"] == 1
+    print("✓ 精确命中")
+
+
+def test_prompt_version_isolation():
+    """测试提示词变化后不复用旧计划"""
+    cache = PlanCache(max_entries=10, ttl_seconds=60, similarity_threshold=1.0, enabled=True)
+    cache.put("查看我的任务", PROMPT, QUERY_PLAN)
+    assert cache.get("查看我的任务", "plan prompt v2") is None
+    print("✓ 提示词版本隔离")
+
+
+def test_similar_hit_only_for_read_only_plans():
+    """测试近似匹配只复用只读计划"""
+    cache = PlanCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.8, enabled=True)
+    cache.put("查看我的所有任务", PROMPT, QUERY_PLAN)
+    cache.put("添加任务：买牛奶", PROMPT, CREATE_PLAN)
+    assert cache.get("查看我的所有任务吧", PROMPT) == QUERY_PLAN
+    assert cache.get("添加任务：买牛奶吧", PROMPT) is None
+    assert cache.get_stats()["similar_hits"] == 1
+    print("✓ 近似命中仅限只读计划")
+
+
+def test_ttl_and_lru_eviction():
+    """测试TTL过期与LRU淘汰"""
+    cache = PlanCache(max_entries=2, ttl_seconds=60, similarity_threshold=1.0, enabled=True)
+    cache.put("a", PROMPT, QUERY_PLAN)
+    cache.put("b", PROMPT, QUERY_PLAN)
+    cache.get("a", PROMPT)
+    cache.put("c", PROMPT, QUERY_PLAN)
+    assert cache.get("b", PROMPT) is None
+    assert cache.get("a", PROMPT) is not None
+    assert cache.get_stats()["evictions"] == 1
+
+    short = PlanCache(max_entries=2, ttl_seconds=0.01, similarity_threshold=1.0, enabled=True)
+    short.put("a", PROMPT, QUERY_PLAN)
+    time.sleep(0.02)
+    assert short.get("a", PROMPT) is None
+    assert short.get_stats()["expirations"] == 1
+    print("✓ TTL过期与LRU淘汰")
+
+
+def test_cached_plan_is_isolated_copy():
+    """测试返回的计划是副本，修改不会污染缓存"""
+    cache = PlanCache(max_entries=10, ttl_seconds=60, similarity_threshold=1.0, enabled=True)
+    cache.put("查看我的任务", PROMPT, QUERY_PLAN)
+    cache.get("查看我的任务", PROMPT)["steps"].clear()
+    assert cache.get("查看我的任务", PROMPT) == QUERY_PLAN
+    print("✓ 缓存计划隔离")
+
+
+def test_relative_time_not_cached():
+    """测试包含相对日期/时间的请求既不缓存也不命中近似的已缓存计划"""
+    cache = PlanCache(max_entries=10, ttl_seconds=60, similarity_threshold=0.5, enabled=True)
+    for message in ("明天下午3点开会", "下周一提交周报", "3小时后提醒我喝水", "周末去爬山", "Remind me tomorrow"):
+        assert plan_cache_module.has_relative_time(message)
+        cache.put(message, PROMPT, CREATE_PLAN)
+        assert cache.get(message, PROMPT) is None
+    assert cache.get_stats()["size"] == 0
+
+    cache.put("查看我的任务", PROMPT, QUERY_PLAN)
+    assert cache.get("查看我今天的任务", PROMPT) is None
+    assert cache.get_stats()["uncacheable"] == 6
+
+    for message in ("查看我的任务", "写周报", "每周例会", "10月20日开会", "Show my tasks"):
+        assert not plan_cache_module.has_relative_time(message)
+    print("✓ 相对日期/时间不缓存")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_exact_hit_after_normalization,
+        test_prompt_version_isolation,
+        test_similar_hit_only_for_read_only_plans,
+        test_ttl_and_lru_eviction,
+        test_cached_plan_is_isolated_copy,
+        test_relative_time_not_cached,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
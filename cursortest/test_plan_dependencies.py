@@ -0,0 +1,143 @@
+"""
+测试计划步骤的依赖关系和并行执行顺序
+
+验证同一子agent的步骤即使给出 "depends_on": [] 也按顺序执行、显式依赖与同agent依赖合并、
+无效依赖被忽略，以及路由 + 并行执行时不同agent的步骤并发、同agent的步骤串行
+"""
+
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from backend_loader import load_backend_module
+
+
+graph_module = load_backend_module("agents.supervisor.graph")
+state_module = load_backend_module("agents.supervisor.state")
+
+
+def _step(agent, description, depends_on=None):
+    step = {"agent": agent, "action": "create", "params": {}, "description": description}
+    if depends_on is not None:
+        step["depends_on"] = depends_on
+    return step
+
+
+def test_same_agent_steps_always_chained():
+    """测试LLM给出空依赖时，同agent步骤仍依赖前一个同agent步骤"""
+    steps = [
+        _step("task", "创建任务X", []),
+        _step("note", "创建笔记", []),
+        _step("task", "把X标记为完成", []),
+        _step("schedule", "安排会议", []),
+    ]
+    assert graph_module._step_dependencies(steps) == [[], [], [0], []]
+    # 不给depends_on时同样按同agent顺序依赖
+    assert graph_module._step_dependencies([_step("task", "a"), _step("task", "b")]) == [[], [0]]
+    print("✓ 同agent步骤按顺序依赖")
+
+
+def test_explicit_dependencies_merged_and_validated():
+    """测试显式依赖与同agent依赖合并，自身、后续、越界和非整数依赖被忽略"""
+    steps = [
+        _step("task", "创建任务"),
+        _step("note", "记录任务", [0]),
+        _step("task", "完成任务", [1, 2, 3, -1, "0", True]),
+    ]
+    assert graph_module._step_dependencies(steps) == [[], [0], [0, 1]]
+    print("✓ 显式依赖合并与校验")
+
+
+def test_ready_steps_progression():
+    """测试每一轮可执行的步骤"""
+    steps = [
+        _step("task", "创建任务X", []),
+        _step("note", "创建笔记", []),
+        _step("task", "把X标记为完成", []),
+    ]
+    assert graph_module._ready_steps(steps, set()) == [0, 1]
+    assert graph_module._ready_steps(steps, {1}) == [0]
+    assert graph_module._ready_steps(steps, {0}) == [1, 2]
+    assert graph_module._ready_steps(steps, {0, 1}) == [2]
+    print("✓ 就绪步骤")
+
+
+class RecordingSubGraph:
+    """记录每个步骤开始/结束顺序的子agent graph"""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def ainvoke(self, state, config=None):
+        description = state["messages"][-1].content
+        self.events.append(("start", description))
+        await asyncio.sleep(0.02)
+        self.events.append(("end", description))
+        return {"messages": state["messages"] + [AIMessage(content=f"{description} 完成")]}
+
+
+async def _drive(state):
+    """按路由结果循环执行（单步走子agent + execute，多步走parallel_execute），返回执行批次"""
+    batches = []
+    while True:
+        update = await graph_module._route_node(state)
+        if not update.get("should_continue"):
+            return batches
+        batches.append(list(update["ready_steps"]))
+        if update["selected_agent"] == "parallel":
+            update = await graph_module._parallel_execute_node({**state, **update})
+        else:
+            result = await graph_module._run_step(state, update["current_step"])
+            update = {"execution_results": [result]}
+        state["execution_results"] = state_module.merge_execution_results(
+            state["execution_results"], update["execution_results"]
+        )
+
+
+def test_parallel_execution_order():
+    """测试不同agent的步骤并发执行，同agent的后续步骤在前一步结束后才开始"""
+    events = []
+    graph_module._sub_agent_graphs.clear()
+    graph_module._sub_agent_graphs.update({
+        "task": RecordingSubGraph(events),
+        "note": RecordingSubGraph(events),
+    })
+    state = {
+        "messages": [HumanMessage(content="创建任务X和一条笔记，然后把X标记为完成")],
+        "user_id": 1,
+        "plan": {"summary": "", "steps": [
+            _step("task", "创建任务X", []),
+            _step("note", "创建笔记", []),
+            _step("task", "把X标记为完成", []),
+        ]},
+        "execution_results": [],
+    }
+    try:
+        batches = asyncio.run(_drive(state))
+    finally:
+        graph_module._sub_agent_graphs.clear()
+
+    assert batches == [[0, 1], [2]]
+    # 步骤0和1并发（都在任一步结束前开始），步骤2在步骤0结束后才开始
+    assert events[:2] == [("start", "创建任务X"), ("start", "创建笔记")]
+    assert events.index(("start", "把X标记为完成")) > events.index(("end", "创建任务X"))
+    assert [r["step_index"] for r in state["execution_results"]] == [0, 1, 2]
+    assert all(r["success"] for r in state["execution_results"])
+    print("✓ 并行执行顺序")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_same_agent_steps_always_chained,
+        test_explicit_dependencies_merged_and_validated,
+        test_ready_steps_progression,
+        test_parallel_execution_order,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+测试批量任务服务和批量任务工具
+
+在内存SQLite上运行 TaskService.add_tasks / update_tasks / delete_tasks 和
+create_tasks_tool / update_tasks_tool / delete_tasks_tool，验证：
+按ID和筛选条件选择、没有条件时拒绝执行、按用户隔离（匿名调用只影响匿名任务）、
+标题筛选中的 % 和 _ 按字面匹配
+"""
+
+from backend_loader import load_backend_module
+from sqlite_session import SQLiteDatabase, run
+
+
+task_service_module = load_backend_module("services.task_service")
+task_tools_module = load_backend_module("agents.sub_agents.task.tools")
+TaskDB = load_backend_module("models.database_models").TaskDB
+
+SEED = [
+    {"id": 1, "title": "买菜", "is_complete": True, "user_id": 1},
+    {"id": 2, "title": "写周报", "is_complete": False, "user_id": 1},
+    {"id": 3, "title": "周报评审", "is_complete": True, "user_id": 1},
+    {"id": 4, "title": "别人的周报", "is_complete": True, "user_id": 2},
+    {"id": 5, "title": "匿名任务", "is_complete": True, "user_id": None},
+    {"id": 6, "title": "100% 完成率", "is_complete": False, "user_id": 1},
+]
+
+
+def _setup():
+    db = SQLiteDatabase(TaskDB)
+    db.insert(TaskDB, SEED)
+    db.install(task_service_module)
+    return db, task_service_module.TaskService()
+
+
+def _titles(db):
+    return {row.id: (row.title, row.is_complete, row.user_id) for row in db.rows(TaskDB)}
+
+
+def test_add_tasks_single_insert():
+    """测试批量创建只发一条INSERT，按id顺序返回"""
+    db, service = _setup()
+    tasks = run(service.add_tasks(["A", "B", "C"], user_id=1))
+
+    assert [task.title for task in tasks] == ["A", "B", "C"]
+    assert [statement.split()[0] for statement, _ in db.statements] == ["INSERT"]
+    assert all(_titles(db)[task.id][2] == 1 for task in tasks)
+    assert run(service.add_tasks([], user_id=1)) == []
+    print("✓ 批量创建")
+
+
+def test_update_and_delete_by_filters():
+    """测试按标题和完成状态筛选，只影响当前用户的任务"""
+    db, service = _setup()
+    updated = run(service.update_tasks(title_contains="周报", is_complete=True, user_id=1))
+    assert [task.id for task in updated] == [2, 3]
+    assert _titles(db)[4] == ("别人的周报", True, 2)
+
+    deleted = run(service.delete_tasks(is_complete=True, user_id=1))
+    assert [task.id for task in deleted] == [1, 2, 3]
+    assert sorted(_titles(db)) == [4, 5, 6]
+
+    # ID列表与筛选条件同时给出时取交集
+    assert run(service.update_tasks(task_ids=[4, 6], is_complete_filter=False, title="x", user_id=1))[0].id == 6
+    print("✓ 按条件批量更新/删除")
+
+
+def test_requires_filter():
+    """测试没有ID和筛选条件时拒绝执行，没有要更新的字段时不执行"""
+    db, service = _setup()
+    for call in (service.delete_tasks(user_id=1), service.update_tasks(is_complete=True, user_id=1)):
+        try:
+            run(call)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("没有筛选条件时应拒绝执行")
+    assert run(service.update_tasks(task_ids=[1], user_id=1)) == []
+    assert len(_titles(db)) == len(SEED)
+    print("✓ 没有条件时拒绝执行")
+
+
+def test_anonymous_scope_and_like_escaping():
+    """测试匿名调用只影响匿名任务（user_id IS NULL），% 和 _ 按字面匹配"""
+    db, service = _setup()
+    deleted = run(service.delete_tasks(is_complete=True, user_id=None))
+    assert [task.id for task in deleted] == [5]
+    assert sorted(_titles(db)) == [1, 2, 3, 4, 6]
+
+    assert [task.id for task in run(service.delete_tasks(title_contains="%", user_id=1))] == [6]
+    assert run(service.delete_tasks(title_contains="_", user_id=1)) == []
+    assert sorted(_titles(db)) == [1, 2, 3, 4]
+    print("✓ 匿名隔离与LIKE转义")
+
+
+def test_bulk_tools():
+    """测试三个批量工具的结果文本和结构化结果"""
+    db, service = _setup()
+    tools = task_tools_module.TaskTools(service)
+
+    content, artifact = run(tools._create_tasks_tool(["读书", " ", "跑步"], user_id=1))
+    assert artifact == {"mutation": True, "success": True}
+    assert "成功创建 2 个任务" in content
+
+    content, artifact = run(tools._update_tasks_tool(titleContains="周报", isComplete=True, user_id=1))
+    assert artifact["success"] and "成功更新 2 个任务" in content
+
+    content, artifact = run(tools._delete_tasks_tool(ids=[99], user_id=1))
+    assert not artifact["success"] and "没有找到符合条件" in content
+
+    content, artifact = run(tools._delete_tasks_tool(user_id=1))
+    assert not artifact["success"] and "请提供任务ID列表或筛选条件" in content
+
+    content, artifact = run(tools._update_tasks_tool(ids=[1], user_id=1))
+    assert not artifact["success"] and "没有提供要更新的字段" in content
+
+    content, artifact = run(tools._create_tasks_tool([], user_id=1))
+    assert not artifact["success"]
+    print("✓ 批量工具")
+
+
+def test_bulk_tools_refuse_anonymous_filters():
+    """测试未登录时批量工具不按条件执行，按ID仍只影响匿名任务"""
+    db, service = _setup()
+    tools = task_tools_module.TaskTools(service)
+
+    content, artifact = run(tools._delete_tasks_tool(isComplete=True, user_id=None))
+    assert not artifact["success"] and "未登录" in content
+    content, artifact = run(tools._update_tasks_tool(titleContains="周报", isComplete=True, user_id=None))
+    assert not artifact["success"] and "未登录" in content
+    assert len(_titles(db)) == len(SEED)
+
+    content, artifact = run(tools._delete_tasks_tool(ids=[1, 5], user_id=None))
+    assert artifact["success"] and "成功删除 1 个任务" in content
+    assert sorted(_titles(db)) == [1, 2, 3, 4, 6]
+    print("✓ 匿名批量工具")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_add_tasks_single_insert,
+        test_update_and_delete_by_filters,
+        test_requires_filter,
+        test_anonymous_scope_and_like_escaping,
+        test_bulk_tools,
+        test_bulk_tools_refuse_anonymous_filters,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+测试任务列表的keyset分页
+
+在内存SQLite上运行 TaskService.get_tasks_page / iter_tasks 和 GET /api/tasks，验证：
+按cursor逐页取回全部任务且不重复、筛选条件与cursor组合、最后一页没有 X-Next-Cursor、
+无效cursor返回400、stream=true输出与一次性查询相同的JSON数组
+"""
+
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend_loader import load_backend_module
+from sqlite_session import SQLiteDatabase, run
+
+
+task_service_module = load_backend_module("services.task_service")
+# routes.api 从 services 包导入服务类；测试加载的空包不执行 __init__，这里补上这两个名称
+services_package = sys.modules[task_service_module.__package__]
+services_package.TaskService = task_service_module.TaskService
+services_package.ConversationService = load_backend_module("services.conversation_service").ConversationService
+api_module = load_backend_module("routes.api")
+TaskDB = load_backend_module("models.database_models").TaskDB
+
+# 用户1有7个任务（id与创建时间交错排列其他用户的任务）
+SEED = [
+    {"id": 1, "title": "周报", "is_complete": False, "user_id": 1, "created_at": datetime(2024, 1, 1)},
+    {"id": 2, "title": "别人的任务", "is_complete": False, "user_id": 2, "created_at": datetime(2024, 1, 1)},
+    {"id": 3, "title": "买菜", "is_complete": True, "user_id": 1, "created_at": datetime(2024, 1, 2)},
+    {"id": 4, "title": "周会", "is_complete": True, "user_id": 1, "created_at": datetime(2024, 1, 3)},
+    {"id": 5, "title": "匿名任务", "is_complete": False, "user_id": None, "created_at": datetime(2024, 1, 3)},
+    {"id": 6, "title": "周报评审", "is_complete": False, "user_id": 1, "created_at": datetime(2024, 1, 4)},
+    {"id": 7, "title": "跑步", "is_complete": False, "user_id": 1, "created_at": datetime(2024, 1, 5)},
+    {"id": 8, "title": "周末计划", "is_complete": False, "user_id": 1, "created_at": datetime(2024, 1, 6)},
+    {"id": 9, "title": "别人的周报", "is_complete": False, "user_id": 2, "created_at": datetime(2024, 1, 6)},
+    {"id": 10, "title": "读书", "is_complete": True, "user_id": 1, "created_at": datetime(2024, 1, 7)},
+]
+USER_1_IDS = [1, 3, 4, 6, 7, 8, 10]
+
+
+def _setup():
+    db = SQLiteDatabase(TaskDB)
+    db.insert(TaskDB, SEED)
+    db.install(task_service_module)
+    return db, task_service_module.TaskService()
+
+
+def _pages(service, limit, **filters):
+    """按cursor逐页读取，返回每页的id列表"""
+    pages, cursor = [], None
+    while True:
+        tasks, next_cursor = run(service.get_tasks_page(1, limit=limit, cursor=cursor, **filters))
+        pages.append([task.id for task in tasks])
+        if next_cursor is None:
+            return pages
+        # 与接口一样经过编码/解码
+        cursor = task_service_module.decode_task_cursor(task_service_module.encode_task_cursor(next_cursor))
+
+
+def test_cursor_round_trip():
+    """测试逐页读取覆盖全部任务，不重复不遗漏，最后一页没有下一页cursor"""
+    db, service = _setup()
+    assert _pages(service, 3) == [[1, 3, 4], [6, 7, 8], [10]]
+    # 任务数正好是页大小的整数倍时，最后一页之后不会多出空页
+    assert _pages(service, 7) == [USER_1_IDS]
+
+    for task_id in (1, 10, 123456):
+        cursor = task_service_module.encode_task_cursor(task_id)
+        assert task_service_module.decode_task_cursor(cursor) == task_id
+    print("✓ cursor往返分页")
+
+
+def test_filters_with_cursor():
+    """测试筛选条件在每一页上都生效"""
+    db, service = _setup()
+    assert _pages(service, 2, is_complete=False) == [[1, 6], [7, 8]]
+    assert _pages(service, 2, title_prefix="周") == [[1, 4], [6, 8]]
+    assert _pages(service, 2, created_after=datetime(2024, 1, 3), created_before=datetime(2024, 1, 7)) == [[4, 6], [7, 8]]
+    assert _pages(service, 1, is_complete=False, title_prefix="周报") == [[1], [6]]
+
+    # 从中间的cursor继续，只返回cursor之后的任务
+    tasks, next_cursor = run(service.get_tasks_page(1, limit=10, cursor=6, title_prefix="周"))
+    assert [task.id for task in tasks] == [8] and next_cursor is None
+    print("✓ 筛选条件与cursor组合")
+
+
+def test_iter_tasks():
+    """测试流式读取与分页读取的结果一致"""
+    db, service = _setup()
+
+    async def collect(**filters):
+        return [task.id async for task in service.iter_tasks(1, batch_size=2, **filters)]
+
+    assert run(collect()) == USER_1_IDS
+    assert run(collect(is_complete=True)) == [3, 4, 10]
+    assert run(collect(title_prefix="周", created_before=datetime(2024, 1, 4))) == [1, 4]
+    print("✓ 流式读取")
+
+
+def test_malformed_cursor():
+    """测试无效cursor抛出ValueError"""
+    for cursor in ("not-a-cursor", "", "eyJ4IjogMX0", "bnVsbA"):
+        try:
+            task_service_module.decode_task_cursor(cursor)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"cursor {cursor!r} 应该无效")
+    print("✓ 无效cursor")
+
+
+def _client():
+    db, service = _setup()
+    app = FastAPI()
+    app.include_router(api_module.create_api_routes(service, None, None), prefix="/api")
+    app.dependency_overrides[api_module.get_optional_current_user] = lambda: SimpleNamespace(id=1)
+    return TestClient(app)
+
+
+def _get_all_pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        response = client.get("/api/tasks", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        pages.append([task["id"] for task in response.json()])
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            return pages
+
+
+def test_tasks_route_pagination():
+    """测试 GET /api/tasks 按 X-Next-Cursor 翻页，最后一页没有该响应头，筛选条件与cursor组合"""
+    client = _client()
+    assert _get_all_pages(client, limit=3) == [[1, 3, 4], [6, 7, 8], [10]]
+    assert _get_all_pages(client, limit=2, is_complete="false", title_prefix="周") == [[1, 6], [8]]
+    assert _get_all_pages(client, limit=2, created_after="2024-01-05T00:00:00") == [[7, 8], [10]]
+
+    # 不分页时返回全部任务，不带 X-Next-Cursor
+    response = client.get("/api/tasks")
+    assert [task["id"] for task in response.json()] == USER_1_IDS
+    assert "X-Next-Cursor" not in response.headers
+    print("✓ GET /api/tasks 分页")
+
+
+def test_tasks_route_malformed_cursor():
+    """测试无效cursor返回400"""
+    client = _client()
+    response = client.get("/api/tasks", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
+    print("✓ 无效cursor返回400")
+
+
+def test_tasks_route_stream():
+    """测试 stream=true 输出与一次性查询相同的JSON数组"""
+    client = _client()
+    streamed = client.get("/api/tasks", params={"stream": "true", "is_complete": "true"})
+    assert streamed.status_code == 200
+    assert streamed.json() == client.get("/api/tasks", params={"is_complete": "true"}).json()
+    assert [task["id"] for task in streamed.json()] == [3, 4, 10]
+    print("✓ 流式输出")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_cursor_round_trip,
+        test_filters_with_cursor,
+        test_iter_tasks,
+        test_malformed_cursor,
+        test_tasks_route_pagination,
+        test_tasks_route_malformed_cursor,
+        test_tasks_route_stream,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+测试文本检索
+
+- 没有 pg_trgm 时退回包含匹配（ILIKE）：在内存SQLite上运行 search_tasks / find_task_by_title 和搜索工具，
+  验证匹配、排序（包含匹配按标题长度、id排序）、用户隔离、通配符按字面匹配
+- 有 pg_trgm / search_vector 时生成的PostgreSQL条件和排序表达式
+- ensure_schema 在无法创建 pg_trgm 时记录错误并退回，索引无效时先删除再重建
+"""
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import asyncpg
+
+from backend_loader import load_backend_module
+from sqlite_session import SQLiteDatabase, run
+
+
+text_search_module = load_backend_module("services.text_search")
+task_service_module = load_backend_module("services.task_service")
+task_tools_module = load_backend_module("agents.sub_agents.task.tools")
+database_models = load_backend_module("models.database_models")
+TaskDB, NoteDB = database_models.TaskDB, database_models.NoteDB
+
+SEED = [
+    {"id": 1, "title": "写本周周报并发给经理", "is_complete": False, "user_id": 1},
+    {"id": 2, "title": "周报", "is_complete": True, "user_id": 1},
+    {"id": 3, "title": "买菜", "is_complete": False, "user_id": 1},
+    {"id": 4, "title": "整理周报模板", "is_complete": False, "user_id": 1},
+    {"id": 5, "title": "周报", "is_complete": False, "user_id": 2},
+    {"id": 6, "title": "完成率100%", "is_complete": False, "user_id": 1},
+    {"id": 7, "title": "完成率1000", "is_complete": False, "user_id": 1},
+]
+
+
+def _setup(trgm_available=False):
+    db = SQLiteDatabase(TaskDB)
+    db.insert(TaskDB, SEED)
+    db.install(text_search_module, task_service_module)
+    search = text_search_module.text_search
+    search.trgm_available = trgm_available
+    search.tsvector_available = False
+    search.ts_config = "simple"
+    return db, task_service_module.TaskService()
+
+
+def _sql(clause):
+    """按应用使用的 asyncpg 方言编译SQL"""
+    return str(clause.compile(dialect=asyncpg.dialect()))
+
+
+def test_fallback_search_and_ranking():
+    """测试没有 pg_trgm 时按包含匹配搜索：标题短的排前面，相同长度按id，按用户和完成状态筛选"""
+    db, service = _setup()
+    results = run(text_search_module.text_search.search_tasks("周报", user_id=1))
+    assert [(task.id, score) for task, score in results] == [(2, 1.0), (4, 1.0), (1, 1.0)]
+
+    assert [task.id for task in run(service.search_tasks("周报", user_id=1, limit=2))] == [2, 4]
+    assert [task.id for task in run(service.search_tasks("周报", user_id=1, is_complete=False))] == [4, 1]
+    assert [task.id for task in run(service.search_tasks("周报", user_id=2))] == [5]
+    assert run(service.search_tasks("不存在", user_id=1)) == []
+    assert run(service.search_tasks("   ", user_id=1)) == []
+    # 不使用 pg_trgm 时不设置相似度阈值
+    assert not any("set_config" in statement for statement, _ in db.statements)
+    print("✓ 退回包含匹配的搜索和排序")
+
+
+def test_fallback_escapes_wildcards():
+    """测试查询中的 % 和 _ 按字面匹配"""
+    db, service = _setup()
+    assert [task.id for task in run(service.search_tasks("100%", user_id=1))] == [6]
+    assert run(service.search_tasks("_", user_id=1)) == []
+    assert run(service.search_tasks("率1/", user_id=1)) == []
+    print("✓ 通配符转义")
+
+
+def test_find_task_by_title():
+    """测试按标题找最匹配的任务"""
+    db, service = _setup()
+    assert run(service.find_task_by_title("周报", user_id=1)).id == 2
+    assert run(service.find_task_by_title("周报模板", user_id=1)).id == 4
+    assert run(service.find_task_by_title("周报", user_id=2)).id == 5
+    assert run(service.find_task_by_title("健身", user_id=1)) is None
+    print("✓ 按标题查找任务")
+
+
+def test_search_and_delete_by_title_tools():
+    """测试搜索工具和按名称删除工具使用相似度检索"""
+    db, service = _setup()
+    tools = task_tools_module.TaskTools(service)
+
+    content = run(tools._search_tasks_tool("周报", user_id=1))
+    assert "找到 3 个" in content
+    assert content.index("- 2: 周报") < content.index("- 4: 整理周报模板") < content.index("- 1: 写本周周报")
+    assert "没有找到" in run(tools._search_tasks_tool("健身", user_id=1))
+
+    content, artifact = run(tools._delete_task_by_title_tool("周报模板", user_id=1))
+    assert artifact["success"] and '任务 "整理周报模板" 删除成功' in content
+    assert 4 not in {row.id for row in db.rows(TaskDB)}
+    print("✓ 搜索和按名称删除工具")
+
+
+def test_trgm_conditions_and_ranking():
+    """测试有 pg_trgm 时：包含匹配或 word_similarity 超过阈值都算匹配，包含匹配加1分后按相似度排序"""
+    search = text_search_module.TextSearch()
+    condition, score = search.title_match(TaskDB.title, "周报")
+    assert search.trgm_available is False
+    assert "<%" not in _sql(condition) and "word_similarity" not in _sql(score)
+
+    search.trgm_available = True
+    condition, score = search.title_match(TaskDB.title, "周报")
+    condition_sql, score_sql = _sql(condition), _sql(score)
+    assert "tasks.title ILIKE" in condition_sql and "ESCAPE '/'" in condition_sql
+    assert "<% tasks.title" in condition_sql
+    assert "CASE WHEN" in score_sql and "+ word_similarity(" in score_sql
+
+    statement = select(TaskDB.id).where(condition).order_by(score.desc(), TaskDB.id)
+    order_by = _sql(statement).split("ORDER BY")[1]
+    assert order_by.index("word_similarity") < order_by.index("tasks.id")
+    print("✓ pg_trgm 条件和排序")
+
+
+def test_similarity_threshold():
+    """测试只有 pg_trgm 可用时才在事务内设置相似度阈值"""
+
+    class RecordingSession:
+        def __init__(self):
+            self.calls = []
+
+        async def execute(self, statement, params=None):
+            self.calls.append((str(statement), params))
+
+    search = text_search_module.TextSearch()
+    session = RecordingSession()
+    run(search.set_similarity_threshold(session))
+    assert session.calls == []
+
+    search.trgm_available = True
+    run(search.set_similarity_threshold(session))
+    (statement, params), = session.calls
+    assert "pg_trgm.word_similarity_threshold" in statement and ", true)" in statement
+    assert params == {"threshold": str(text_search_module.TEXT_SEARCH_SIMILARITY_THRESHOLD)}
+    print("✓ 相似度阈值")
+
+
+def test_note_condition_and_rank():
+    """测试笔记条件：没有 search_vector 时只有包含匹配，有时加上全文检索和 ts_rank"""
+    search = text_search_module.TextSearch()
+    condition_sql, rank_sql = _sql(search.note_condition("周报")), _sql(search.note_rank("周报"))
+    assert condition_sql.count("ILIKE") == 2 and "@@" not in condition_sql
+    assert "word_similarity" not in rank_sql and "ts_rank" not in rank_sql
+
+    search.trgm_available = search.tsvector_available = True
+    search.ts_config = "chinese_zh"
+    condition_sql, rank_sql = _sql(search.note_condition("周报")), _sql(search.note_rank("周报"))
+    assert "notes.search_vector @@ websearch_to_tsquery('chinese_zh'::regconfig" in condition_sql
+    assert "word_similarity(" in rank_sql and "ts_rank(notes.search_vector, websearch_to_tsquery('chinese_zh'::regconfig" in rank_sql
+    print("✓ 笔记条件和排名")
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeConnection:
+    """按SQL片段返回预设结果，包含 failing 片段的语句抛出异常"""
+
+    def __init__(self, responses, failing=()):
+        self.responses = responses
+        self.failing = failing
+        self.statements = []
+
+    async def execution_options(self, **kwargs):
+        return self
+
+    async def execute(self, statement, params=None):
+        sql = " ".join(str(statement).split())
+        self.statements.append(sql)
+        if any(fragment in sql for fragment in self.failing):
+            raise Exception(f"permission denied: {sql}\nDETAIL: 测试")
+        for fragment, value in self.responses:
+            if fragment in sql:
+                return FakeResult(value)
+        return FakeResult(None)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+
+class FakeEngine:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def connect(self):
+        return self.connection
+
+
+SEARCH_VECTOR_EXPRESSION = "(setweight(to_tsvector('simple'::regconfig, COALESCE(title, ''::text)), 'A'::\"char\")"
+
+
+def test_ensure_schema_without_pg_trgm():
+    """测试无法创建 pg_trgm 时不创建三元组索引，记录错误，检索退回包含匹配"""
+    connection = FakeConnection(
+        responses=[("pg_get_expr", SEARCH_VECTOR_EXPRESSION), ("count(*)", 0)],
+        failing=("CREATE EXTENSION IF NOT EXISTS pg_trgm",),
+    )
+    search = text_search_module.TextSearch()
+    stats = run(search.ensure_schema(FakeEngine(connection)))
+
+    assert not any("gin_trgm_ops" in sql for sql in connection.statements)
+    assert any("ADD COLUMN IF NOT EXISTS search_vector" in sql for sql in connection.statements)
+    assert stats["trgm_available"] is False and stats["tsvector_available"] is True
+    assert stats["ts_config"] == "simple"
+    assert len(stats["schema_errors"]) == 1 and "pg_trgm" in stats["schema_errors"][0]
+    assert "<%" not in _sql(search.title_match(TaskDB.title, "周报")[0])
+    print("✓ 没有 pg_trgm 时的退回")
+
+
+def test_ensure_schema_rebuilds_invalid_index():
+    """测试 pg_trgm 可用时并发创建索引，无效索引先删除再重建，search_vector 已存在时不重写表"""
+    connection = FakeConnection(responses=[
+        ("indisvalid", False),
+        ("extname = 'pg_trgm'", 1),
+        ("pg_get_expr", SEARCH_VECTOR_EXPRESSION.replace("simple", "chinese_zh")),
+        ("SELECT 1 FROM pg_attribute", 1),
+    ])
+    search = text_search_module.TextSearch()
+    stats = run(search.ensure_schema(FakeEngine(connection)))
+
+    for name, _ in text_search_module.TRGM_INDEXES + [text_search_module.SEARCH_VECTOR_INDEX]:
+        drop = connection.statements.index(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        create = next(i for i, sql in enumerate(connection.statements)
+                      if sql.startswith(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "))
+        assert drop < create
+    assert not any("ADD COLUMN" in sql for sql in connection.statements)
+    assert stats["trgm_available"] is True and stats["tsvector_available"] is True
+    assert stats["ts_config"] == "chinese_zh" and stats["schema_errors"] == []
+    print("✓ 重建无效索引")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_fallback_search_and_ranking,
+        test_fallback_escapes_wildcards,
+        test_find_task_by_title,
+        test_search_and_delete_by_title_tools,
+        test_trgm_conditions_and_ranking,
+        test_similarity_threshold,
+        test_note_condition_and_rank,
+        test_ensure_schema_without_pg_trgm,
+        test_ensure_schema_rebuilds_invalid_index,
+    ]
+    for test in tests:
+        test()
+    print(f"\n🎉 所有测试通过 ({len(tests)}/{len(tests)})")
+
+
+if __name__ == "__main__":
+    main()